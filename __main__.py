@@ -1,3 +1,5 @@
 from vigobusapi import run
 
-run()
+if __name__ == "__main__":
+    # Guarded, since worker processes are spawned re-importing the main module
+    run()
@@ -0,0 +1,17 @@
+"""UNIT TEST HELPERS
+Helpers shared by the unit tests
+"""
+
+# # Native # #
+import asyncio
+
+__all__ = ("run",)
+
+
+def run(coro):
+    """Run the given coroutine until complete, on a new event loop (closed afterwards)."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
@@ -0,0 +1,76 @@
+"""UNIT TEST - Admin
+Test the runtime administration of the local caches (admin)
+"""
+
+# # Installed # #
+import pytest
+from fastapi import HTTPException
+
+# # Project # #
+from vigobusapi import admin
+from vigobusapi.vigobus_getters import cache
+from vigobusapi.entities import Bus, BusesResponse, Stop
+from vigobusapi.settings import settings
+
+
+@pytest.fixture
+def clean_caches():
+    for cache_object in admin.CACHES.values():
+        cache_object.clear()
+    yield
+    cache.stops_cache.resize(maxsize=settings.stops_cache_maxsize)
+    cache.stops_cache.set_ttl(settings.stops_cache_ttl)
+    for cache_object in admin.CACHES.values():
+        cache_object.clear()
+
+
+def test_configure_cache(clean_caches):
+    for stop_id in range(1, 6):
+        cache.save_stop(Stop(stop_id=stop_id, name="STOP"))
+
+    stats = admin.configure_cache("stops", maxsize=3, ttl=7200)
+    assert stats["items"] == 3
+    assert stats["maxsize"] == 3
+    assert stats["ttl"] == 7200
+    assert set(cache.stops_cache.keys()) == {3, 4, 5}
+
+    with pytest.raises(HTTPException) as ex:
+        admin.configure_cache("unknown", maxsize=3)
+    assert ex.value.status_code == 404
+    with pytest.raises(HTTPException) as ex:
+        admin.configure_cache("stops", maxsize=0)
+    assert ex.value.status_code == 400
+
+
+def test_invalidate_stop(clean_caches):
+    buses_result = BusesResponse(buses=[Bus(line="1", route="ROUTE", time=1)], more_buses_available=False)
+    for stop_id in (1, 2):
+        cache.save_stop(Stop(stop_id=stop_id, name="STOP"))
+        cache.save_buses(stop_id, False, buses_result)
+        cache.save_buses(stop_id, True, buses_result)
+
+    assert admin.invalidate_stop(1) == 1
+    assert cache.get_stop(1) is None
+    assert cache.get_buses(1, False) is not None
+
+    assert admin.invalidate_stop(2, all_entries=True) == 3
+    assert cache.get_buses(2, False) is None
+    assert cache.get_buses(2, True) is None
+
+
+def test_check_admin_key(monkeypatch):
+    class FakeRequest:
+        def __init__(self, key):
+            self.headers = {admin.ADMIN_KEY_HEADER: key} if key else {}
+
+    monkeypatch.setattr(settings, "admin_key", None)
+    with pytest.raises(HTTPException) as ex:
+        admin.check_admin_key(FakeRequest("secret"))
+    assert ex.value.status_code == 404
+
+    monkeypatch.setattr(settings, "admin_key", "secret")
+    admin.check_admin_key(FakeRequest("secret"))
+    for key in ("wrong", None):
+        with pytest.raises(HTTPException) as ex:
+            admin.check_admin_key(FakeRequest(key))
+        assert ex.value.status_code == 403
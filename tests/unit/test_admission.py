@@ -0,0 +1,119 @@
+"""UNIT TEST - Admission
+Test the admission control and load shedding of the requests, from vigobusapi.admission
+"""
+
+# # Native # #
+import time
+
+# # Installed # #
+import pytest
+from fastapi import Request
+
+# # Project # #
+from vigobusapi import admission
+from vigobusapi.admission import AdmissionLimiter, TokenBucket, get_request_class, CLASS_CACHE, CLASS_UPSTREAM
+from vigobusapi.app import app
+from vigobusapi.vigobus_getters import cache
+from vigobusapi.entities import Bus, BusesResponse, Stop
+from vigobusapi.exceptions import ServiceOverloaded
+from vigobusapi.settings import settings
+from tests.unit.helpers import run
+from tools.benchmark_utils import asgi_get
+
+CACHED_STOP_ID = 1
+UNCACHED_STOP_ID = 2
+
+
+@pytest.fixture
+def cached_stop():
+    cache.buses_cache.clear()
+    cache.stops_cache.clear()
+    cache.save_stop(Stop(stop_id=CACHED_STOP_ID, name="STOP"))
+    cache.save_buses(
+        CACHED_STOP_ID, False,
+        BusesResponse(buses=[Bus(line="1", route="ROUTE", time=1)], more_buses_available=False)
+    )
+    yield
+    cache.buses_cache.clear()
+    cache.stops_cache.clear()
+
+
+def build_request(path: str, query_string: str = "") -> Request:
+    return Request({
+        "type": "http", "method": "GET", "scheme": "http", "server": ("testserver", 80), "root_path": "",
+        "path": path, "query_string": query_string.encode(), "headers": []
+    })
+
+
+@pytest.mark.parametrize("path, query_string, expected_class", [
+    (f"/buses/{CACHED_STOP_ID}", "", CLASS_CACHE),
+    (f"/stop/{CACHED_STOP_ID}/buses", "", CLASS_CACHE),
+    (f"/buses/{CACHED_STOP_ID}/delta", "", CLASS_CACHE),
+    (f"/buses/{CACHED_STOP_ID}", "get_all_buses=true", CLASS_UPSTREAM),
+    (f"/buses/{UNCACHED_STOP_ID}", "", CLASS_UPSTREAM),
+    (f"/internal/buses/{UNCACHED_STOP_ID}", "", CLASS_UPSTREAM),
+    (f"/stop/{CACHED_STOP_ID}", "", CLASS_CACHE),
+    (f"/stop/{UNCACHED_STOP_ID}", "", CLASS_UPSTREAM),
+    ("/stops", "stop_id=1", CLASS_UPSTREAM),
+    ("/buses", "stop_id=1", CLASS_UPSTREAM),
+    (f"/buses/{CACHED_STOP_ID}/live", "", None),
+    ("/status", "", None),
+    ("/metrics", "", None)
+])
+def test_request_class(cached_stop, path, query_string, expected_class):
+    assert get_request_class(build_request(path, query_string)) == expected_class
+
+
+def test_limiter_queue_timeout(monkeypatch):
+    """Requests not admitted within the max queue time must be rejected"""
+    monkeypatch.setattr(settings, "admission_queue_timeout", 0.05)
+    limiter = AdmissionLimiter(concurrency=1)
+
+    async def _test():
+        await limiter.acquire()
+        with pytest.raises(ServiceOverloaded):
+            await limiter.acquire()
+        limiter.release()
+        await limiter.acquire()
+
+    run(_test())
+    stats = limiter.get_stats()
+    assert (stats["in_flight"], stats["queued"], stats["admitted"], stats["rejected"]) == (1, 0, 2, 1)
+    assert stats["queue_time"] >= 0.05
+
+
+def test_overloaded_response(monkeypatch):
+    """Requests rejected due to overload must return 503 with Retry-After"""
+    monkeypatch.setattr(settings, "admission_queue_timeout", 0.01)
+    monkeypatch.setitem(admission.limiters, CLASS_UPSTREAM, AdmissionLimiter(concurrency=0))
+
+    status_code, headers, _ = run(asgi_get(app, f"/buses/{UNCACHED_STOP_ID}"))
+    assert status_code == 503
+    assert headers["retry-after"] == str(settings.admission_retry_after)
+
+
+def test_token_bucket_refill():
+    bucket = TokenBucket(rate=20, burst=2)
+    assert bucket.consume() and bucket.consume()
+    assert not bucket.consume()
+
+    time.sleep(0.06)  # refills 1.2 tokens
+    assert bucket.consume()
+    assert not bucket.consume()
+
+
+def test_client_rate_limited(cached_stop, monkeypatch):
+    """Clients exceeding their rate must be rejected with 429, independently of other clients"""
+    monkeypatch.setattr(settings, "admission_client_rate", 0.1)
+    monkeypatch.setattr(settings, "admission_client_burst", 2)
+    monkeypatch.setattr(settings, "admission_client_header", "X-Client")
+    admission.clients_buckets.clear()
+
+    def request(client: str) -> int:
+        return run(asgi_get(app, f"/buses/{CACHED_STOP_ID}", headers={"X-Client": client}))[0]
+
+    try:
+        assert [request("a") for _ in range(3)] == [200, 200, 429]
+        assert request("b") == 200
+    finally:
+        admission.clients_buckets.clear()
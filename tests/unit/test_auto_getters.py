@@ -0,0 +1,181 @@
+"""UNIT TEST - Auto Getters
+Test functions from vigobus_getters.auto_getters
+"""
+
+# # Native # #
+import time
+from collections import Counter
+
+# # Installed # #
+import pytest
+
+# # Project # #
+from vigobusapi.vigobus_getters import auto_getters, cache
+from vigobusapi.vigobus_getters.auto_getters import bus_tier
+from vigobusapi.vigobus_getters.pipeline import KIND_CACHE, KIND_EXTERNAL
+from vigobusapi.entities import Bus, BusesResponse
+from vigobusapi.exceptions import StopNotExist
+from tests.unit.helpers import run
+
+CACHED_STOP_ID = 1
+UNCACHED_STOP_ID = 2
+NOT_EXISTING_STOP_ID = 3
+
+
+def buses_response(time: int) -> BusesResponse:
+    return BusesResponse(buses=[Bus(line="1", route="ROUTE", time=time)], more_buses_available=False)
+
+
+def bus_tiers(*external_getters):
+    """Return a Bus pipeline with the local cache followed by the given getters as external data sources"""
+    return (bus_tier(cache.get_buses, KIND_CACHE), *(bus_tier(getter, KIND_EXTERNAL) for getter in external_getters))
+
+
+@pytest.fixture
+def fake_bus_getter(monkeypatch):
+    """Replace the external Bus getters by a single getter, returning the Counter of calls per Stop ID."""
+    calls = Counter()
+
+    async def external_get_buses(stop_id: int, get_all_buses: bool):
+        calls[stop_id] += 1
+        if stop_id == NOT_EXISTING_STOP_ID:
+            raise StopNotExist()
+        return buses_response(time=stop_id)
+
+    monkeypatch.setattr(auto_getters, "BUS_TIERS", bus_tiers(external_get_buses))
+    cache.buses_cache.clear()
+    cache.stops_cache.clear()
+    cache.last_known_buses_cache.clear()
+    auto_getters.buses_sources_affinity.clear()
+    yield calls
+    cache.buses_cache.clear()
+    cache.last_known_buses_cache.clear()
+    auto_getters.buses_sources_affinity.clear()
+
+
+def test_get_buses_multiple(fake_bus_getter):
+    cache.save_buses(CACHED_STOP_ID, False, buses_response(time=0))
+    stops_ids = [UNCACHED_STOP_ID, NOT_EXISTING_STOP_ID, CACHED_STOP_ID, UNCACHED_STOP_ID]
+
+    results = run(auto_getters.get_buses_multiple(stops_ids, get_all_buses=False))
+
+    assert list(results.keys()) == [UNCACHED_STOP_ID, NOT_EXISTING_STOP_ID, CACHED_STOP_ID]
+    assert results[CACHED_STOP_ID].buses[0].time == 0
+    assert results[UNCACHED_STOP_ID].buses[0].time == UNCACHED_STOP_ID
+    assert isinstance(results[NOT_EXISTING_STOP_ID], StopNotExist)
+    assert fake_bus_getter == {UNCACHED_STOP_ID: 1, NOT_EXISTING_STOP_ID: 1}
+
+
+def test_get_buses_last_known(fake_bus_getter, monkeypatch):
+    """When all the getters fail, the last known buses must be returned, with their time decreased by the minutes
+    elapsed since they were fetched, and the buses that already arrived removed"""
+    fetched = BusesResponse(
+        buses=[Bus(line="1", route="ROUTE", time=time) for time in (1, 3, 10)],
+        more_buses_available=False
+    )
+    fetched_time = time.time() - 150
+    cache.last_known_buses_cache[(UNCACHED_STOP_ID, False)] = (fetched, fetched_time)
+    cache.last_known_buses_cache[(NOT_EXISTING_STOP_ID, False)] = (fetched, fetched_time)
+
+    async def failing_get_buses(stop_id: int, get_all_buses: bool):
+        if stop_id == NOT_EXISTING_STOP_ID:
+            raise StopNotExist()
+        raise ConnectionError()
+
+    monkeypatch.setattr(auto_getters, "BUS_TIERS", bus_tiers(failing_get_buses))
+    result = run(auto_getters.get_buses(UNCACHED_STOP_ID, get_all_buses=False))
+
+    assert result.source == cache.EXTRAPOLATED_SOURCE
+    assert result.age == 150
+    assert [bus.time for bus in result.buses] == [1, 8]
+
+    with pytest.raises(StopNotExist):
+        run(auto_getters.get_buses(NOT_EXISTING_STOP_ID, get_all_buses=False))
+    with pytest.raises(ConnectionError):
+        run(auto_getters.get_buses(CACHED_STOP_ID, get_all_buses=False))
+
+
+def test_get_buses_last_known_too_large(fake_bus_getter):
+    """Buses larger than the bytes budget of the last known cache must not be saved on it, but still returned"""
+    cache.last_known_buses_cache.resize(maxbytes=100)
+    try:
+        result = run(auto_getters.get_buses(UNCACHED_STOP_ID, get_all_buses=True))
+    finally:
+        cache.last_known_buses_cache.resize(maxbytes=0)
+
+    assert result.buses[0].time == UNCACHED_STOP_ID
+    assert (UNCACHED_STOP_ID, True) not in cache.last_known_buses_cache
+    assert cache.get_buses(UNCACHED_STOP_ID, True) is not None
+
+
+def test_get_buses_source_affinity(fake_bus_getter, monkeypatch):
+    """The source that last returned the buses of a stop must be called first on the next requests for the stop,
+    until it fails"""
+    calls = list()
+    failing_stops_ids = {UNCACHED_STOP_ID}
+
+    async def first_get_buses(stop_id: int, get_all_buses: bool):
+        calls.append("first")
+        if stop_id in failing_stops_ids:
+            raise ConnectionError()
+        return buses_response(time=1)
+
+    async def second_get_buses(stop_id: int, get_all_buses: bool):
+        calls.append("second")
+        return buses_response(time=2)
+
+    first_tier, second_tier = bus_tier(first_get_buses, KIND_EXTERNAL), bus_tier(second_get_buses, KIND_EXTERNAL)
+    monkeypatch.setattr(auto_getters, "BUS_TIERS", (first_tier, second_tier))
+
+    assert run(auto_getters.get_buses(UNCACHED_STOP_ID, get_all_buses=False)).buses[0].time == 2
+    assert calls == ["first", "second"]
+
+    calls.clear()
+    assert run(auto_getters.get_buses(UNCACHED_STOP_ID, get_all_buses=False)).buses[0].time == 2
+    assert run(auto_getters.get_buses(CACHED_STOP_ID, get_all_buses=False)).buses[0].time == 1
+    assert calls == ["second", "first"]
+
+    # When the preferred source fails, the next source that returns the buses is preferred
+    async def failing_second_get_buses(stop_id: int, get_all_buses: bool):
+        calls.append("second")
+        raise ConnectionError()
+
+    failing_second_tier = bus_tier(failing_second_get_buses, KIND_EXTERNAL)
+    monkeypatch.setattr(auto_getters, "BUS_TIERS", (first_tier, failing_second_tier))
+    auto_getters.buses_sources_affinity[UNCACHED_STOP_ID] = (failing_second_tier, 0)
+    failing_stops_ids.clear()
+    calls.clear()
+    assert run(auto_getters.get_buses(UNCACHED_STOP_ID, get_all_buses=False)).buses[0].time == 1
+    assert calls == ["second", "first"]
+    assert auto_getters.buses_sources_affinity[UNCACHED_STOP_ID][0] is first_tier
+
+
+def test_get_buses_empty_fallthrough(fake_bus_getter, monkeypatch):
+    """When a source returns no buses, the next sources must be tried, returning the empty list only if no other
+    source returns any buses"""
+    calls = list()
+
+    async def empty_get_buses(stop_id: int, get_all_buses: bool):
+        calls.append("empty")
+        return BusesResponse(buses=[], more_buses_available=False)
+
+    async def second_get_buses(stop_id: int, get_all_buses: bool):
+        calls.append("second")
+        if stop_id == UNCACHED_STOP_ID:
+            raise ConnectionError()
+        return buses_response(time=2)
+
+    cache_tier, empty_tier, second_tier = bus_tiers(empty_get_buses, second_get_buses)
+    monkeypatch.setattr(auto_getters, "BUS_TIERS", (cache_tier, empty_tier, second_tier))
+
+    result = run(auto_getters.get_buses(CACHED_STOP_ID, get_all_buses=False))
+    assert result.buses[0].time == 2
+    assert calls == ["empty", "second"]
+
+    calls.clear()
+    auto_getters.buses_sources_affinity[UNCACHED_STOP_ID] = (empty_tier, 0)
+    result = run(auto_getters.get_buses(UNCACHED_STOP_ID, get_all_buses=False))
+    assert result.buses == []
+    assert result.source == empty_tier.name
+    assert calls == ["empty", "second"]
+    assert UNCACHED_STOP_ID not in auto_getters.buses_sources_affinity
@@ -0,0 +1,124 @@
+"""UNIT TEST - Cancellation
+Test the single fetch of concurrent requests, and its cancellation when their clients disconnect
+"""
+
+# # Native # #
+import asyncio
+
+# # Installed # #
+import pytest
+from requests_async import RequestException
+
+# # Project # #
+from vigobusapi.cancellation import SingleFlight, client_disconnected, current_fetch, check_cancelled, \
+    record_upstream_request
+from vigobusapi.services import http_requester
+from vigobusapi.exceptions import ClientDisconnected, FetchCancelled
+from vigobusapi.metrics import FETCHES_ABANDONED, UPSTREAM_WASTED_REQUESTS
+from tests.unit.helpers import run
+
+
+async def _request(flight: SingleFlight, fetcher, disconnected: asyncio.Event):
+    """Run the fetch as a request whose client disconnects when the given event is set"""
+    client_disconnected.set(disconnected)
+    return await flight.run("key", fetcher)
+
+
+class FakeFetcher:
+    """Fetcher performing the given count of upstream requests, one per step (each step waits for an event)"""
+
+    def __init__(self, steps: int):
+        self.steps = [asyncio.Event() for _ in range(steps)]
+        self.calls = 0
+        self.completed_steps = 0
+
+    async def __call__(self):
+        self.calls += 1
+        for step in self.steps:
+            check_cancelled()
+            record_upstream_request()
+            await step.wait()
+            self.completed_steps += 1
+        return "result"
+
+
+def test_concurrent_requests_share_fetch():
+    async def _test():
+        flight = SingleFlight()
+        fetcher = FakeFetcher(steps=1)
+        requests = [asyncio.ensure_future(_request(flight, fetcher, asyncio.Event())) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert len(flight) == 1
+
+        fetcher.steps[0].set()
+        assert await asyncio.gather(*requests) == ["result"] * 3
+        assert fetcher.calls == 1
+        assert len(flight) == 0
+
+    run(_test())
+
+
+def test_fetch_cancelled_when_client_disconnects():
+    """When the only client waiting for a fetch disconnects, the fetch must stop on the next step, counting the
+    upstream requests it performed as wasted"""
+    async def _test():
+        flight = SingleFlight()
+        fetcher = FakeFetcher(steps=3)
+        disconnected = asyncio.Event()
+        abandoned_before = FETCHES_ABANDONED.labels().value
+        wasted_before = UPSTREAM_WASTED_REQUESTS.labels().value
+
+        request = asyncio.ensure_future(_request(flight, fetcher, disconnected))
+        await asyncio.sleep(0)
+        disconnected.set()
+        with pytest.raises(ClientDisconnected):
+            await request
+
+        # The step in progress completes, but the next one is not started
+        fetch_task = next(iter(flight._fetches.values())).task
+        fetcher.steps[0].set()
+        with pytest.raises(FetchCancelled):
+            await fetch_task
+
+        assert fetcher.completed_steps == 1
+        assert FETCHES_ABANDONED.labels().value == abandoned_before + 1
+        assert UPSTREAM_WASTED_REQUESTS.labels().value == wasted_before + 1
+        assert len(flight) == 0
+
+    run(_test())
+
+
+def test_fetch_not_cancelled_while_other_client_waits():
+    async def _test():
+        flight = SingleFlight()
+        fetcher = FakeFetcher(steps=2)
+        disconnected = asyncio.Event()
+
+        leaving_request = asyncio.ensure_future(_request(flight, fetcher, disconnected))
+        staying_request = asyncio.ensure_future(_request(flight, fetcher, asyncio.Event()))
+        await asyncio.sleep(0)
+        disconnected.set()
+        with pytest.raises(ClientDisconnected):
+            await leaving_request
+
+        for step in fetcher.steps:
+            step.set()
+        assert await staying_request == "result"
+        assert fetcher.completed_steps == 2
+
+    run(_test())
+
+
+def test_peer_requests_not_counted_as_upstream(monkeypatch):
+    """Requests to other nodes of the API must not be counted as upstream requests of the fetch"""
+    async def failing_request(**_kwargs):
+        raise RequestException()
+
+    async def fetcher():
+        for upstream in (True, False):
+            with pytest.raises(RequestException):
+                await http_requester.http_request("http://test", retries=2, upstream=upstream)
+        return current_fetch.get().upstream_requests
+
+    monkeypatch.setattr(http_requester, "request", failing_request)
+    assert run(SingleFlight().run("key", fetcher)) == 2
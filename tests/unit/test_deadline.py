@@ -0,0 +1,75 @@
+"""UNIT TEST - Deadline
+Test the per-request deadline (deadline), and its propagation to the HTTP requests and getters
+"""
+
+# # Native # #
+import asyncio
+
+# # Installed # #
+import pytest
+from requests_async import Timeout
+
+# # Project # #
+from vigobusapi.deadline import start_deadline, get_remaining_time, clamp_timeout
+from vigobusapi.services import http_requester
+from vigobusapi.vigobus_getters import auto_getters
+from vigobusapi.vigobus_getters.pipeline import GetterTier, KIND_EXTERNAL
+from vigobusapi.exceptions import DeadlineExceeded
+from tests.unit.helpers import run
+
+
+def test_deadline_nested():
+    """A nested deadline can not extend the deadline of the outer context"""
+    assert get_remaining_time() is None
+    assert clamp_timeout(10) == 10
+
+    with start_deadline(1):
+        with start_deadline(100):
+            assert 0.9 < get_remaining_time() <= 1
+        with start_deadline(0.5):
+            assert clamp_timeout(10) <= 0.5
+
+    assert get_remaining_time() is None
+
+
+def test_http_request_timeout_clamped(monkeypatch):
+    """The timeout of the HTTP requests must be limited to the time left, not retrying once the deadline exceeded"""
+    timeouts = list()
+
+    async def fake_request(timeout: float, **_kwargs):
+        timeouts.append(timeout)
+        await asyncio.sleep(timeout)
+        raise Timeout()
+
+    async def request():
+        with start_deadline(0.15):
+            await http_requester.http_request("http://test", timeout=0.1, retries=5)
+
+    monkeypatch.setattr(http_requester, "request", fake_request)
+    with pytest.raises(Timeout):
+        run(request())
+
+    assert len(timeouts) == 2
+    assert timeouts[0] == 0.1
+    assert timeouts[1] <= 0.05
+
+
+def test_getter_skipped():
+    """Getters whose estimated duration exceeds the time left must be skipped"""
+    calls = list()
+
+    async def slow_getter(stop_id: int):
+        calls.append(stop_id)
+        await asyncio.sleep(0.05)
+        return stop_id
+
+    slow_tier = GetterTier(slow_getter, KIND_EXTERNAL)
+
+    async def request():
+        with start_deadline(0.02):
+            return await auto_getters._call_getter("stop", slow_tier, 2)
+
+    assert run(auto_getters._call_getter("stop", slow_tier, 1)) == 1
+    with pytest.raises(DeadlineExceeded):
+        run(request())
+    assert calls == [1]
@@ -0,0 +1,84 @@
+"""UNIT TEST - Deltas
+Test the delta responses of Buses, from vigobusapi.deltas
+"""
+
+# # Installed # #
+import pytest
+
+# # Project # #
+from vigobusapi import deltas
+from vigobusapi.deltas import get_buses_delta, get_keyed_buses
+from vigobusapi.entities import Bus, BusesResponse, BusesDelta
+
+STOP_ID = 1
+
+
+def buses_response(*buses) -> BusesResponse:
+    """Return a BusesResponse with the given Buses, given as tuples (line, route, time)"""
+    return BusesResponse(
+        buses=[Bus(line=line, route=route, time=time) for line, route, time in buses],
+        more_buses_available=False,
+        source="fake"
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_versions():
+    deltas.buses_versions.clear()
+    deltas.deltas_memo.clear()
+    yield
+    deltas.buses_versions.clear()
+    deltas.deltas_memo.clear()
+
+
+def apply_delta(buses: dict, delta: dict) -> dict:
+    """Apply a delta to the given Buses (by key), as a client would"""
+    if delta.get("unchanged"):
+        return buses
+    buses = dict(buses) if "base_version" in delta else dict()
+    for key in delta["removed"]:
+        buses.pop(key)
+    for delta_bus in delta["added"] + delta["changed"]:
+        buses[delta_bus["key"]] = (delta_bus["line"], delta_bus["route"], delta_bus["time"])
+    return buses
+
+
+def test_keyed_buses_repeated_bus_id():
+    buses = buses_response(("1", "A", 2), ("1", "A", 12), ("2", "B", 5)).buses
+    keyed_buses = get_keyed_buses(buses)
+
+    assert list(keyed_buses.values()) == buses
+    assert list(keyed_buses.keys()) == [f"{buses[0].bus_id}:0", f"{buses[0].bus_id}:1", f"{buses[2].bus_id}:0"]
+
+
+def test_delta_since_unknown_version_returns_all_buses():
+    delta = get_buses_delta(STOP_ID, False, buses_response(("1", "A", 2), ("2", "B", 5)), since="unknown")
+
+    assert "base_version" not in delta
+    assert [bus["time"] for bus in delta["added"]] == [2, 5]
+    assert delta["changed"] == delta["removed"] == []
+    BusesDelta(**delta)
+
+
+def test_delta_unchanged():
+    first = get_buses_delta(STOP_ID, False, buses_response(("1", "A", 2)), since=None)
+    delta = get_buses_delta(STOP_ID, False, buses_response(("1", "A", 2)), since=first["version"])
+
+    assert delta == {"version": first["version"], "unchanged": True}
+
+
+def test_delta_changes():
+    """Applying the delta to the previous version of the Buses must result on the current version"""
+    previous = buses_response(("1", "A", 1), ("1", "A", 10), ("2", "B", 5))
+    current = buses_response(("1", "A", 9), ("2", "B", 4), ("3", "C", 20))
+
+    first = get_buses_delta(STOP_ID, False, previous, since=None)
+    client_buses = apply_delta(dict(), first)
+    delta = get_buses_delta(STOP_ID, False, current, since=first["version"])
+    client_buses = apply_delta(client_buses, delta)
+
+    assert delta["base_version"] == first["version"]
+    assert len(delta["added"]) == 1 and len(delta["changed"]) == 2 and len(delta["removed"]) == 1
+    assert sorted(client_buses.values(), key=lambda bus: bus[2]) == [("2", "B", 4), ("1", "A", 9), ("3", "C", 20)]
+    assert delta["source"] == "fake"
+    BusesDelta(**delta)
@@ -0,0 +1,37 @@
+"""UNIT TEST - Hash Ring
+Test the consistent hashing ring used to distribute the Stops between the peer nodes
+"""
+
+# # Native # #
+from collections import Counter
+
+# # Project # #
+from vigobusapi.vigobus_getters.peers.hash_ring import HashRing
+
+NODES = ["http://10.0.0.1:5000", "http://10.0.0.2:5000", "http://10.0.0.3:5000"]
+KEYS = range(1, 10001)
+
+
+def test_ring_deterministic():
+    """Rings with the same nodes (in any order) must return the same node for each key"""
+    ring1 = HashRing(NODES)
+    ring2 = HashRing(reversed(NODES))
+    assert all(ring1.get_node(key) == ring2.get_node(key) for key in KEYS)
+
+
+def test_ring_distribution():
+    """Keys must be distributed between all the nodes, none owning more than twice its fair share"""
+    ring = HashRing(NODES)
+    owners = Counter(ring.get_node(key) for key in KEYS)
+    assert set(owners) == set(NODES)
+    assert max(owners.values()) < 2 * len(KEYS) / len(NODES)
+
+
+def test_ring_node_removed():
+    """When a node is removed, only the keys it owned must move to other nodes"""
+    ring = HashRing(NODES)
+    ring_without_node = HashRing(NODES[:-1])
+    for key in KEYS:
+        owner = ring.get_node(key)
+        if owner != NODES[-1]:
+            assert ring_without_node.get_node(key) == owner
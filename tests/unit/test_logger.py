@@ -0,0 +1,83 @@
+"""UNIT TEST - Logger
+Test the lazy payloads and per-request debug sampling of the logger
+"""
+
+# # Native # #
+import io
+import contextvars
+
+# # Installed # #
+import pytest
+
+# # Project # #
+from vigobusapi.logger import logger, lazy_bind, sample_request_debug, configure_logger
+from vigobusapi.vigobus_getters.html.html_parser import clear_duplicated_buses
+from vigobusapi.entities import Bus
+from vigobusapi.settings import settings
+
+
+@pytest.fixture
+def log_output(monkeypatch):
+    """Configure the logger to write to a buffer, with the settings patched by the test. Return a function that
+    configures it and returns the buffer."""
+    def _configure(**patched_settings) -> io.StringIO:
+        for key, value in patched_settings.items():
+            monkeypatch.setattr(settings, key, value)
+        output = io.StringIO()
+        configure_logger(sink=output)
+        return output
+
+    yield _configure
+    monkeypatch.undo()
+    configure_logger()
+
+
+def test_lazy_bind_not_evaluated_below_level(log_output):
+    output = log_output(log_level="info")
+    calls = list()
+
+    def payload():
+        calls.append(1)
+        return "PAYLOAD"
+
+    lazy_bind(payload=payload).debug("Debug record")
+    assert calls == []
+    assert output.getvalue() == ""
+
+    lazy_bind(payload=payload).info("Info record")
+    assert calls == [1]
+    assert "PAYLOAD" in output.getvalue()
+
+
+def test_debug_sampled_per_request(log_output):
+    """Debug records of requests not sampled must be discarded (with their lazy payloads not evaluated),
+    keeping the records of higher levels"""
+    output = log_output(log_level="debug", log_debug_sample_rate=0)
+    calls = list()
+
+    def request():
+        assert not sample_request_debug()
+        lazy_bind(payload=lambda: calls.append(1)).debug("Debug record")
+        logger.info("Info record")
+
+    contextvars.Context().run(request)
+    logger.debug("Debug record out of requests")
+
+    assert calls == []
+    assert "Debug record |" not in output.getvalue()
+    assert "Info record" in output.getvalue()
+    assert "Debug record out of requests" in output.getvalue()
+
+
+@pytest.mark.parametrize("log_level", ["debug", "info"])
+def test_buses_payload_only_on_debug_record(log_output, log_level):
+    """The buses must be bound to the debug record of the parser only, not to the context of other records"""
+    output = log_output(log_level=log_level)
+    buses = [Bus(line="1", route="ROUTE", time=1), Bus(line="1", route="ROUTE", time=1)]
+
+    clear_duplicated_buses(buses)
+    logger.info("Info record")
+
+    lines = output.getvalue().splitlines()
+    assert [("Cleared 1 duplicated buses" in line, "'buses':" in line) for line in lines] == \
+        ([(True, True)] if log_level == "debug" else []) + [(False, False)]
@@ -0,0 +1,48 @@
+"""UNIT TEST - Loop Monitor
+Test the blocking detector of the event loop (loop_monitor)
+"""
+
+# # Native # #
+import time
+import asyncio
+
+# # Project # #
+from vigobusapi import loop_monitor
+from vigobusapi.metrics import LOOP_BLOCKING_CALLS
+from vigobusapi.logger import logger
+
+
+def test_blocking_detector():
+    """Callbacks blocking the loop longer than the threshold must be reported with their stack and logger context;
+    and not after disabling the detector"""
+    records = list()
+    sink_id = logger.add(records.append, level="WARNING")
+
+    async def request(request_id: str, blocking_time: float):
+        with logger.contextualize(request_id=request_id):
+            await asyncio.sleep(0)
+            time.sleep(blocking_time)
+
+    async def main():
+        loop_monitor.enable_blocking_detector(threshold=0.05)
+        assert loop_monitor.is_blocking_detector_enabled()
+        await asyncio.gather(request("blocking", 0.1), request("not_blocking", 0.01))
+
+        loop_monitor.toggle_blocking_detector()
+        assert not loop_monitor.is_blocking_detector_enabled()
+        await request("not_detected", 0.1)
+
+    blocking_calls_before = LOOP_BLOCKING_CALLS.labels().sum
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop_monitor.disable_blocking_detector()
+        loop.close()
+        logger.remove(sink_id)
+
+    extras = [record.record["extra"] for record in records if "blocking_duration" in record.record["extra"]]
+    assert [extra["request_id"] for extra in extras] == ["blocking"]
+    assert extras[0]["blocking_duration"] >= 0.1
+    assert "time.sleep(blocking_time)" in extras[0]["blocking_stack"]
+    assert LOOP_BLOCKING_CALLS.labels().sum - blocking_calls_before >= 0.1
@@ -0,0 +1,36 @@
+"""UNIT TEST - Metrics
+Test functions from metrics
+"""
+
+# # Project # #
+from vigobusapi.metrics import Counter, Histogram, _metrics
+
+
+def test_counter_render():
+    counter = Counter("test_counter_total", "Test counter", labelnames=("label",))
+    _metrics.remove(counter)
+    counter.labels("a").inc()
+    counter.labels("a").inc(2)
+    counter.labels('"b"').inc()
+
+    assert list(counter.render()) == [
+        "# HELP test_counter_total Test counter",
+        "# TYPE test_counter_total counter",
+        'test_counter_total{label="a"} 3',
+        'test_counter_total{label="\\"b\\""} 1'
+    ]
+
+
+def test_histogram_render():
+    histogram = Histogram("test_histogram", "Test histogram", buckets=(1, 5))
+    _metrics.remove(histogram)
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+
+    assert list(histogram.render())[2:] == [
+        'test_histogram_bucket{le="1"} 2',
+        'test_histogram_bucket{le="5"} 3',
+        'test_histogram_bucket{le="+Inf"} 4',
+        "test_histogram_sum 14.5",
+        "test_histogram_count 4"
+    ]
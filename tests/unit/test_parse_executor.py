@@ -0,0 +1,48 @@
+"""UNIT TEST - Parse Executor
+Test running the parsing functions on the parse executor (services.parse_executor)
+"""
+
+# # Native # #
+import threading
+
+# # Installed # #
+import pytest
+
+# # Project # #
+from vigobusapi.services import parse_executor, run_parser, shutdown_parse_executor
+from vigobusapi.vigobus_getters.string_fixes import fix_stop_name
+from vigobusapi.tracing import start_trace, span
+from vigobusapi.settings import settings
+from tests.unit.helpers import run
+
+
+@pytest.fixture
+def executor(request, monkeypatch):
+    monkeypatch.setattr(settings, "parse_executor", request.param)
+    yield request.param
+    shutdown_parse_executor()
+
+
+@pytest.mark.parametrize("executor", [None, "thread", "process"], indirect=True)
+def test_run_parser(executor):
+    """The parser must return the same result on any executor"""
+    assert run(run_parser(fix_stop_name, "RUA DE PROBA- 1")) == fix_stop_name("RUA DE PROBA- 1")
+    assert (parse_executor._executor is None) == (executor is None)
+
+
+@pytest.mark.parametrize("executor", ["thread"], indirect=True)
+def test_run_parser_thread_context(executor, monkeypatch):
+    """On the thread executor, the parser must run out of the event loop thread, keeping the trace of the request"""
+    def parser():
+        with span("parse.test"):
+            return threading.current_thread()
+
+    async def traced_request():
+        with start_trace("1" * 32, "request") as trace:
+            thread = await run_parser(parser)
+            return thread, trace
+
+    monkeypatch.setattr(settings, "tracing_server_timing", True)
+    thread, trace = run(traced_request())
+    assert thread is not threading.current_thread()
+    assert "parse.test" in [span.name for span in trace.spans]
@@ -0,0 +1,72 @@
+"""UNIT TEST - Parse Memo
+Test the reuse of the results parsed from identical upstream responses (vigobus_getters.parse_memo)
+"""
+
+# # Native # #
+import json
+import importlib
+
+# # Project # #
+from vigobusapi.vigobus_getters.parse_memo import ParseMemo
+from vigobusapi.metrics import PARSE_MEMO_LOOKUPS
+from tests.unit.helpers import run
+
+# "from vigobusapi.vigobus_getters.http import http" would import the getter function instead of the module
+http_module = importlib.import_module("vigobusapi.vigobus_getters.http.http")
+
+
+def test_memo_digest():
+    memo = ParseMemo("test", maxsize=10)
+    memo.set(1, memo.get_digest("body"), "result")
+
+    assert memo.get(1, memo.get_digest("body")) == "result"
+    assert memo.get(1, memo.get_digest(b"body")) == "result"
+    assert memo.get(1, memo.get_digest("other body")) is None
+    assert memo.get(2, memo.get_digest("body")) is None
+
+
+def test_memo_disabled():
+    memo = ParseMemo("test", maxsize=0)
+    memo.set(1, memo.get_digest("body"), "result")
+    assert memo.get(1, memo.get_digest("body")) is None
+
+
+def test_http_getter_memo(monkeypatch):
+    """Identical responses of the HTTP data source for the same Stop must be parsed once"""
+    body = {"estimaciones": [{"linea": "C1", "ruta": "PLAZA DE ESPAÑA", "minutos": 5}]}
+    parsed = list()
+
+    class FakeResponse:
+        @property
+        def content(self):
+            return json.dumps(body).encode()
+
+        def json(self):
+            return body
+
+    async def fake_http_request(**_kwargs):
+        return FakeResponse()
+
+    original_parse = http_module.parse_http_response
+
+    def counting_parse(*args, **kwargs):
+        parsed.append(args or kwargs)
+        return original_parse(*args, **kwargs)
+
+    monkeypatch.setattr(http_module, "http_request", fake_http_request)
+    monkeypatch.setattr(http_module, "parse_http_response", counting_parse)
+    monkeypatch.setattr(http_module, "parse_memo", ParseMemo("http_test", maxsize=10))
+    hits = PARSE_MEMO_LOOKUPS.labels("http_test", "hit")
+
+    first = run(http_module.get_buses(1))
+    first.source = "http"
+    second = run(http_module.get_buses(1))
+    assert len(parsed) == 1
+    assert hits.value == 1
+    assert second.buses == first.buses
+    assert second.source is None
+
+    body["estimaciones"][0]["minutos"] = 4
+    third = run(http_module.get_buses(1))
+    assert len(parsed) == 2
+    assert third.buses[0].time == 4
@@ -0,0 +1,88 @@
+"""UNIT TEST - Peers
+Test the Buses getter from the owner nodes and the internal endpoint used by them, on peer mode
+"""
+
+# # Installed # #
+import pytest
+
+# # Project # #
+from vigobusapi.app import app
+from vigobusapi.vigobus_getters import auto_getters, cache, peers
+from vigobusapi.vigobus_getters.auto_getters import bus_tier
+from vigobusapi.vigobus_getters.pipeline import KIND_CACHE, KIND_EXTERNAL
+from vigobusapi.entities import Bus, BusesResponse
+from vigobusapi.settings import settings
+from tests.unit.helpers import run
+from tools.benchmark_utils import asgi_get
+
+STOP_ID = 1
+OWNER_NODE = "http://owner"
+
+
+def buses_response() -> BusesResponse:
+    return BusesResponse(buses=[Bus(line="1", route="ROUTE", time=1)], more_buses_available=False)
+
+
+class FakeResponse:
+    def __init__(self, headers: dict):
+        self.status_code = 200
+        self.headers = headers
+
+    @staticmethod
+    def json():
+        return buses_response().dict()
+
+
+@pytest.fixture
+def owner_node(monkeypatch):
+    """Run on peer mode, with every Stop owned by another node, returning the headers of its responses."""
+    response_headers = dict()
+
+    async def fake_http_request(**_kwargs):
+        return FakeResponse(response_headers)
+
+    monkeypatch.setattr(settings, "peers", OWNER_NODE)
+    monkeypatch.setattr(settings, "peers_self", "http://self")
+    monkeypatch.setattr(peers.peers, "_ring", None)
+    monkeypatch.setattr(peers.peers, "http_request", fake_http_request)
+    cache.buses_cache.clear()
+    cache.last_known_buses_cache.clear()
+    yield response_headers
+    cache.buses_cache.clear()
+    cache.last_known_buses_cache.clear()
+
+
+@pytest.mark.parametrize("cache_control, expected_ttl", [("max-age=3", 3), ("max-age=0", None), (None, None)])
+def test_buses_cached_for_owner_ttl(owner_node, cache_control, expected_ttl):
+    """Buses from the owner node must be cached for the TTL they have left on the owner node (if cached by it)"""
+    if cache_control:
+        owner_node["Cache-Control"] = cache_control
+
+    buses_result = run(auto_getters.get_buses(STOP_ID, get_all_buses=False))
+    assert buses_result.source == "peers"
+
+    ttl = cache.get_buses_ttl(STOP_ID, False)
+    if expected_ttl is None:
+        assert ttl is None
+    else:
+        assert expected_ttl - 1 < ttl <= expected_ttl
+    assert cache.get_last_known_buses(STOP_ID, False) is not None
+
+
+def test_internal_endpoint_returns_remaining_ttl(monkeypatch):
+    async def external_get_buses(stop_id: int, get_all_buses: bool):
+        return buses_response()
+
+    monkeypatch.setattr(auto_getters, "BUS_TIERS", (
+        bus_tier(cache.get_buses, KIND_CACHE),
+        bus_tier(external_get_buses, KIND_EXTERNAL)
+    ))
+    cache.buses_cache.clear()
+
+    try:
+        cache.save_buses(STOP_ID, False, buses_response(), ttl=5)
+        status_code, headers, _ = run(asgi_get(app, f"/internal/buses/{STOP_ID}"))
+        assert status_code == 200
+        assert headers["cache-control"] == "max-age=4"
+    finally:
+        cache.buses_cache.clear()
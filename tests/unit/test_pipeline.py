@@ -0,0 +1,42 @@
+"""UNIT TEST - Pipeline
+Test the tiers of the getters pipelines (vigobus_getters.pipeline)
+"""
+
+# # Project # #
+from vigobusapi.vigobus_getters.pipeline import GetterTier, KIND_EXTERNAL
+from tests.unit.helpers import run
+
+
+def test_tier_call_sync_and_async():
+    def sync_getter(stop_id: int):
+        return stop_id
+
+    async def async_getter(stop_id: int):
+        return stop_id * 2
+
+    assert run(GetterTier(sync_getter, KIND_EXTERNAL).call(1)) == 1
+    assert run(GetterTier(async_getter, KIND_EXTERNAL).call(1)) == 2
+
+
+def test_tier_name():
+    """The tier name must default to the module name of the getter"""
+    def getter():
+        pass
+
+    assert GetterTier(getter, KIND_EXTERNAL).name == "test_pipeline"
+    assert GetterTier(getter, KIND_EXTERNAL, name="custom").name == "custom"
+
+
+def test_tier_write_back():
+    """All the write-back hooks (sync or async) must be called in order with the given args"""
+    saved = list()
+
+    def sync_hook(stop_id: int, value):
+        saved.append(("sync", stop_id, value))
+
+    async def async_hook(stop_id: int, value):
+        saved.append(("async", stop_id, value))
+
+    tier = GetterTier(lambda stop_id: stop_id, KIND_EXTERNAL, write_back=(sync_hook, async_hook))
+    run(tier.save(1, "value"))
+    assert saved == [("sync", 1, "value"), ("async", 1, "value")]
@@ -0,0 +1,161 @@
+"""UNIT TEST - Prefetch
+Test the popularity tracking and background refresh of the most requested Stops (prefetch)
+"""
+
+# # Native # #
+import asyncio
+
+# # Project # #
+from vigobusapi import prefetch
+from vigobusapi.prefetch import StopsPopularity
+from vigobusapi.admission import TokenBucket
+from vigobusapi.vigobus_getters import auto_getters, cache
+from vigobusapi.vigobus_getters.pipeline import KIND_CACHE, KIND_EXTERNAL
+from vigobusapi.entities import Bus, BusesResponse
+from vigobusapi.settings import settings
+from vigobusapi.cancellation import record_upstream_request
+from tests.unit.helpers import run
+
+
+def test_popularity_top():
+    popularity = StopsPopularity(half_life=600, max_size=100)
+    for stop_id, requests in ((1, 3), (2, 5), (3, 1)):
+        for _ in range(requests):
+            popularity.record(stop_id, False)
+
+    assert popularity.get_top(2) == [(2, False), (1, False)]
+
+
+def test_popularity_decay(monkeypatch):
+    """Old requests must count less than recent ones"""
+    now = 1000
+    monkeypatch.setattr(prefetch.time, "monotonic", lambda: now)
+    popularity = StopsPopularity(half_life=10, max_size=100)
+    for _ in range(3):
+        popularity.record(1, False)
+
+    now += 20  # two half-lives: 3 old requests count as 0.75
+    popularity.record(2, False)
+    assert popularity.get_top(2) == [(2, False), (1, False)]
+
+
+def test_popularity_max_size():
+    """When exceeding the max size, the least popular Stops must be discarded"""
+    popularity = StopsPopularity(half_life=600, max_size=10)
+    for stop_id in range(1, 11):
+        for _ in range(stop_id):
+            popularity.record(stop_id, False)
+    popularity.record(11, False)
+
+    assert len(popularity) == 5
+    assert popularity.get_top(10) == [(stop_id, False) for stop_id in (10, 9, 8, 7, 6)]
+
+
+def run_prefetch(monkeypatch, external_get_buses):
+    """Run the prefetch for a while, with top 3 stops and a budget with a burst of 2 upstream requests.
+    Stop 1 is cached, and stop 4 is not on the top."""
+    monkeypatch.setattr(auto_getters, "BUS_TIERS", (
+        auto_getters.bus_tier(cache.get_buses, KIND_CACHE),
+        auto_getters.bus_tier(external_get_buses, KIND_EXTERNAL)
+    ))
+    monkeypatch.setattr(prefetch, "popularity", StopsPopularity(half_life=600, max_size=100))
+    monkeypatch.setattr(settings, "prefetch_top_stops", 3)
+    monkeypatch.setattr(settings, "prefetch_interval", 0.01)
+    monkeypatch.setattr(settings, "prefetch_budget", 12)  # burst of 2 upstream requests
+    cache.buses_cache.clear()
+    cache.stops_cache.clear()
+
+    for stop_id, requests in ((1, 4), (2, 3), (3, 2), (4, 1)):
+        for _ in range(requests):
+            prefetch.record_request(stop_id, False)
+    cache.save_buses(1, False, BusesResponse(buses=[], more_buses_available=False), ttl=3600)
+
+    async def _run():
+        prefetch.start_prefetch()
+        await asyncio.sleep(0.1)
+        prefetch.stop_prefetch()
+
+    try:
+        run(_run())
+    finally:
+        cache.buses_cache.clear()
+
+
+def test_prefetch_refresh(monkeypatch):
+    """The top Stops not cached or about to expire must be refreshed, within the budget"""
+    refreshed = list()
+
+    async def external_get_buses(stop_id: int, get_all_buses: bool):
+        refreshed.append(stop_id)
+        record_upstream_request()
+        return BusesResponse(buses=[Bus(line="1", route="ROUTE", time=1)], more_buses_available=False)
+
+    run_prefetch(monkeypatch, external_get_buses)
+    # The budget allows 2 refreshes of 1 upstream request each
+    assert refreshed == [2, 3]
+
+
+def test_prefetch_budget_per_upstream_request(monkeypatch):
+    """Every upstream request performed by a refresh after the first one (e.g. retries, extra pages) must be charged
+    to the budget"""
+    async def external_get_buses(stop_id: int, get_all_buses: bool):
+        for _ in range(3):
+            record_upstream_request()
+        return BusesResponse(buses=[Bus(line="1", route="ROUTE", time=1)], more_buses_available=False)
+
+    monkeypatch.setattr(auto_getters, "BUS_TIERS", (auto_getters.bus_tier(external_get_buses, KIND_EXTERNAL),))
+    budget = TokenBucket(rate=0, burst=5)
+    assert budget.consume()
+
+    try:
+        run(prefetch._refresh(2, False, budget))
+        assert budget.tokens == 2
+
+        # The upstream requests exceeding the budget get it into debt
+        assert budget.consume()
+        run(prefetch._refresh(3, False, budget))
+        assert budget.tokens == -1
+        assert not budget.consume()
+    finally:
+        cache.buses_cache.clear()
+
+
+def test_prefetch_budget_shared_fetches(monkeypatch):
+    """The upstream requests of a fetch must be charged to the budget only if started by a refresh: a refresh joining
+    the fetch of a request costs nothing, while a refresh starting a fetch is charged even if requests join it"""
+    events = dict()
+
+    async def external_get_buses(stop_id: int, get_all_buses: bool):
+        events["started"].set()
+        record_upstream_request()
+        await events["release"].wait()
+        record_upstream_request()
+        return BusesResponse(buses=[Bus(line="1", route="ROUTE", time=1)], more_buses_available=False)
+
+    monkeypatch.setattr(auto_getters, "BUS_TIERS", (auto_getters.bus_tier(external_get_buses, KIND_EXTERNAL),))
+
+    async def refresh_and_request(refresh_first: bool) -> float:
+        events.update(started=asyncio.Event(), release=asyncio.Event())
+        budget = TokenBucket(rate=0, burst=5)
+        assert budget.consume()
+
+        starters = [
+            lambda: prefetch._refresh(2, False, budget),
+            lambda: auto_getters.get_buses(2, False, skip_caches=True)
+        ]
+        if not refresh_first:
+            starters.reverse()
+
+        first = asyncio.ensure_future(starters[0]())
+        await events["started"].wait()
+        second = asyncio.ensure_future(starters[1]())
+        await asyncio.sleep(0)
+        events["release"].set()
+        await asyncio.gather(first, second)
+        return budget.tokens
+
+    try:
+        assert run(refresh_and_request(refresh_first=False)) == 5
+        assert run(refresh_and_request(refresh_first=True)) == 3
+    finally:
+        cache.buses_cache.clear()
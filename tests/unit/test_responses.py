@@ -0,0 +1,123 @@
+"""UNIT TEST - Responses
+Test the fast JSON responses, and the ETag and conditional GET support of the endpoints, from vigobusapi.responses
+"""
+
+# # Native # #
+import json
+import datetime
+
+# # Installed # #
+import pytest
+from fastapi import FastAPI, Request, Response
+
+# # Project # #
+from vigobusapi.app import app
+from vigobusapi.responses import FastJSONResponse, json_response, get_etag, conditional_json_response
+from vigobusapi.settings import settings
+from vigobusapi.vigobus_getters import auto_getters, cache
+from vigobusapi.vigobus_getters.pipeline import KIND_CACHE, KIND_EXTERNAL
+from vigobusapi.entities import Bus, BusesResponse, Stop
+from tests.unit.helpers import run
+from tools.benchmark_utils import asgi_get
+
+STOP = Stop(stop_id=1, name="STOP")
+ETAG = get_etag(STOP)
+OPAQUE_TAG = ETAG[2:]
+
+content_getter_calls = list()
+etag_app = FastAPI()
+
+
+@etag_app.get("/stop/fast", response_model=Stop)
+async def endpoint_test_stop_fast(response: Response):
+    # Field not declared on the response_model: kept only if the content is not validated against it
+    return json_response({**STOP.dict(), "undeclared": True}, response=response, headers={"X-Test": "1"})
+
+
+def test_json_response_fast(monkeypatch):
+    monkeypatch.setattr(settings, "api_fast_json", True)
+    created = datetime.datetime(2021, 1, 2, 3, 4, 5)
+    response = json_response({"created": created}, headers={"X-Test": "1"})
+
+    assert isinstance(response, FastJSONResponse)
+    assert json.loads(response.body) == {"created": "2021-01-02T03:04:05"}
+    assert response.headers["x-test"] == "1"
+
+
+@pytest.mark.parametrize("fast_json", [True, False])
+def test_json_response_validation(monkeypatch, fast_json):
+    """The content must not be validated again against the response_model of the endpoint on fast JSON mode"""
+    monkeypatch.setattr(settings, "api_fast_json", fast_json)
+    status_code, headers, body = run(asgi_get(etag_app, "/stop/fast"))
+
+    assert status_code == 200
+    assert headers["x-test"] == "1"
+    assert ("undeclared" in json.loads(body)) is fast_json
+
+
+def test_openapi_schema_keeps_response_models():
+    schema = app.openapi()["paths"]["/buses/{stop_id}"]["get"]["responses"]["200"]["content"]["application/json"]
+    assert schema["schema"]["$ref"].endswith("/BusesResponse")
+
+
+@etag_app.get("/stop")
+async def endpoint_test_stop(request: Request, response: Response):
+    def content_getter():
+        content_getter_calls.append(1)
+        return STOP.dict()
+
+    return conditional_json_response(request, response, etag=ETAG, max_age=30, content_getter=content_getter)
+
+
+@pytest.mark.parametrize("if_none_match", [None, 'W/"other"', '"other", W/"another"'])
+def test_etag_not_matching(if_none_match):
+    content_getter_calls.clear()
+    headers = {"If-None-Match": if_none_match} if if_none_match else None
+    status_code, response_headers, body = run(asgi_get(etag_app, "/stop", headers=headers))
+
+    assert status_code == 200
+    assert json.loads(body) == STOP.dict()
+    assert response_headers["etag"] == ETAG
+    assert response_headers["cache-control"] == "public, max-age=30"
+    assert content_getter_calls == [1]
+
+
+@pytest.mark.parametrize("if_none_match", [ETAG, OPAQUE_TAG, f'"other", {ETAG}', f'W/"other",{OPAQUE_TAG}', "*"])
+def test_etag_matching(if_none_match):
+    """A matching If-None-Match (weak comparison) must return a 304 without body, keeping the validator and caching
+    headers, and without building the content"""
+    content_getter_calls.clear()
+    status_code, response_headers, body = run(asgi_get(etag_app, "/stop", headers={"If-None-Match": if_none_match}))
+
+    assert status_code == 304
+    assert body == b""
+    assert response_headers["etag"] == ETAG
+    assert response_headers["cache-control"] == "public, max-age=30"
+    assert content_getter_calls == []
+
+
+def test_buses_endpoint_conditional(monkeypatch):
+    """The buses endpoint must return the remaining TTL of the cached buses as max-age, and 304 if not changed"""
+    async def external_get_buses(stop_id: int, get_all_buses: bool):
+        return BusesResponse(buses=[Bus(line="1", route="ROUTE", time=1)], more_buses_available=False)
+
+    monkeypatch.setattr(auto_getters, "BUS_TIERS", (
+        auto_getters.bus_tier(cache.get_buses, KIND_CACHE),
+        auto_getters.bus_tier(external_get_buses, KIND_EXTERNAL)
+    ))
+    cache.buses_cache.clear()
+
+    try:
+        status_code, headers, _ = run(asgi_get(app, "/buses/1"))
+        assert status_code == 200
+        max_age = int(headers["cache-control"].split("max-age=")[1])
+        assert 0 < max_age <= cache.buses_cache.ttl
+
+        status_code, not_modified_headers, body = run(asgi_get(
+            app, "/buses/1", headers={"If-None-Match": headers["etag"]}
+        ))
+        assert status_code == 304
+        assert body == b""
+        assert not_modified_headers["etag"] == headers["etag"]
+    finally:
+        cache.buses_cache.clear()
@@ -0,0 +1,59 @@
+"""UNIT TEST - Shared Cache
+Test functions from vigobus_getters.shared_cache
+"""
+
+# # Installed # #
+import pytest
+
+# # Project # #
+from vigobusapi.vigobus_getters import cache, shared_cache
+from vigobusapi.vigobus_getters.shared_cache import backends
+from vigobusapi.entities import Bus, BusesResponse
+from vigobusapi.settings import settings
+from tests.unit.helpers import run
+
+STOP_ID = 1
+
+
+@pytest.fixture
+def sqlite_backend(monkeypatch, tmp_path):
+    backend = backends.SQLiteSharedCache(path=str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(backends, "_backend", backend)
+    cache.buses_cache.clear()
+    yield backend
+    cache.buses_cache.clear()
+    backend._executor.shutdown(wait=True)
+
+
+def test_sqlite_backend_ttl(sqlite_backend):
+    sqlite_backend.set("key", b"value", ttl=10)
+    sqlite_backend.set("expired key", b"value", ttl=-1)
+
+    value, ttl = run(sqlite_backend.get("key"))
+    assert value == b"value"
+    assert 0 < ttl <= 10
+    assert run(sqlite_backend.get("expired key")) is None
+    assert run(sqlite_backend.get("missing key")) is None
+
+
+def test_get_buses_limited(sqlite_backend):
+    buses = [Bus(line=str(i), route="ROUTE", time=i) for i in range(settings.buses_normal_limit + 1)]
+    shared_cache.save_buses(STOP_ID, True, BusesResponse(buses=buses, more_buses_available=False))
+
+    buses_result = run(shared_cache.get_buses(STOP_ID, get_all_buses=False))
+    assert len(buses_result.buses) == settings.buses_normal_limit
+    assert buses_result.more_buses_available
+
+    # The full list is saved on the local cache, with the TTL left on the shared cache
+    assert len(cache.buses_cache[(STOP_ID, True)].buses) == settings.buses_normal_limit + 1
+    assert cache.get_buses_ttl(STOP_ID, True) <= settings.buses_cache_ttl
+
+
+def test_backend_missing_methods():
+    """Backends not implementing every method of the base class must fail when created, not on first use"""
+    class GetOnlyBackend(backends.SharedCacheBackend):
+        async def get(self, key: str):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnlyBackend()
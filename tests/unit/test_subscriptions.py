@@ -0,0 +1,96 @@
+"""UNIT TEST - Subscriptions
+Test the live Buses subscriptions, from vigobusapi.subscriptions
+"""
+
+# # Native # #
+import asyncio
+
+# # Installed # #
+import pytest
+
+# # Project # #
+from vigobusapi import subscriptions
+from vigobusapi.vigobus_getters import cache
+from vigobusapi.entities import Bus, BusesResponse
+from vigobusapi.settings import settings
+from tests.unit.helpers import run
+
+STOP_ID = 1
+
+
+def buses_response(time: int) -> BusesResponse:
+    return BusesResponse(buses=[Bus(line="1", route="ROUTE", time=time)], more_buses_available=False)
+
+
+@pytest.fixture
+def clear_cache():
+    cache.buses_cache.clear()
+    yield
+    cache.buses_cache.clear()
+
+
+def test_poll_interval_follows_cache_expiration(clear_cache):
+    poller = subscriptions.BusesPoller(STOP_ID, get_all_buses=False)
+    assert poller._get_poll_interval() == settings.buses_cache_ttl
+
+    cache.save_buses(STOP_ID, False, buses_response(time=1), ttl=3)
+    assert 3 < poller._get_poll_interval() <= 3 + subscriptions.POLL_EXPIRATION_MARGIN
+
+    cache.save_buses(STOP_ID, False, buses_response(time=1), ttl=0.1)
+    assert poller._get_poll_interval() == subscriptions.POLL_MIN_INTERVAL
+
+
+def test_poller_fan_out(monkeypatch):
+    """A single poller must push the changes to all the subscribers of a Stop, and stop when the last one leaves"""
+    calls = list()
+
+    async def fake_get_buses(stop_id: int, get_all_buses: bool):
+        calls.append(stop_id)
+        # Buses change every 2 polls
+        return buses_response(time=len(calls) // 2)
+
+    monkeypatch.setattr(subscriptions, "get_buses", fake_get_buses)
+    monkeypatch.setattr(subscriptions.BusesPoller, "_get_poll_interval", lambda _self: 0.01)
+
+    async def _test():
+        queues = [subscriptions.subscribe(STOP_ID, False) for _ in range(2)]
+        assert subscriptions.get_subscriptions_stats() == {"pollers": 1, "subscribers": 2}
+        poller = subscriptions._pollers[(STOP_ID, False)]
+
+        events = [[await queue.get() for queue in queues] for _ in range(2)]
+        assert [[data["buses"][0]["time"] for _, data in poll_events] for poll_events in events] == [[0, 0], [1, 1]]
+
+        for queue in queues:
+            subscriptions.unsubscribe(STOP_ID, False, queue)
+        await asyncio.sleep(0)
+        assert subscriptions.get_subscriptions_stats() == {"pollers": 0, "subscribers": 0}
+        assert poller._task.cancelled()
+
+        polls = len(calls)
+        await asyncio.sleep(0.05)
+        assert len(calls) == polls
+
+    run(_test())
+
+
+def test_poller_stopped_during_fetch(monkeypatch):
+    """A poller stopped while fetching the buses must end, without publishing any event"""
+    fetch_started = asyncio.Event()
+
+    async def slow_get_buses(stop_id: int, get_all_buses: bool):
+        fetch_started.set()
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(subscriptions, "get_buses", slow_get_buses)
+
+    async def _test():
+        queue = subscriptions.subscribe(STOP_ID, False)
+        poller = subscriptions._pollers[(STOP_ID, False)]
+        await fetch_started.wait()
+
+        subscriptions.unsubscribe(STOP_ID, False, queue)
+        await asyncio.wait_for(asyncio.wait({poller._task}), timeout=1)
+        assert poller._task.cancelled()
+        assert poller.last_event is None
+
+    run(_test())
@@ -0,0 +1,37 @@
+"""UNIT TEST - Tracing
+Test functions from tracing
+"""
+
+# # Project # #
+from vigobusapi.tracing import start_trace, span
+from vigobusapi.settings import settings
+
+
+def test_spans_server_timing(monkeypatch):
+    monkeypatch.setattr(settings, "tracing_server_timing", True)
+    with start_trace("0" * 32, "root") as trace:
+        with span("parent") as parent_span:
+            with span("child"):
+                pass
+            with span("child"):
+                pass
+
+    assert trace.finished
+    assert [s.name for s in trace.spans] == ["child", "child", "parent", "root"]
+    assert trace.spans[0].parent_id == parent_span.span_id
+    assert trace.spans[-1].parent_id is None
+
+    server_timing = trace.get_server_timing()
+    assert server_timing.startswith("child;dur=")
+    assert 'desc="x2"' in server_timing
+    assert "parent;dur=" in server_timing
+
+
+def test_span_without_trace():
+    with span("span") as _span:
+        assert _span is None
+
+
+def test_trace_disabled_by_default():
+    with start_trace("0" * 32, "root") as trace:
+        assert trace is None
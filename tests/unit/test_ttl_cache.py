@@ -0,0 +1,104 @@
+"""UNIT TEST - TTL Cache
+Test functions from vigobus_getters.cache.ttl_cache
+"""
+
+# # Project # #
+from vigobusapi.vigobus_getters.cache.ttl_cache import ExtendedTTLCache
+from vigobusapi.vigobus_getters.cache.memory import get_deep_size
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_remaining_ttl():
+    timer = FakeTimer()
+    cache = ExtendedTTLCache(maxsize=10, ttl=15, timer=timer)
+    cache["key"] = "value"
+
+    timer.now = 5
+    assert cache.get_remaining_ttl("key") == 10
+    assert cache.get_remaining_ttl("missing key") is None
+
+    timer.now = 15
+    assert cache.get_remaining_ttl("key") is None
+
+
+def test_evictions_expirations():
+    timer = FakeTimer()
+    cache = ExtendedTTLCache(maxsize=2, ttl=15, timer=timer)
+    cache["key1"] = "value"
+    cache["key2"] = "value"
+    cache["key3"] = "value"
+    assert cache.evictions == 1
+    assert cache.expirations == 0
+
+    timer.now = 20
+    cache.expire()
+    assert cache.evictions == 1
+    assert cache.expirations == 2
+
+
+def test_maxbytes():
+    """When the size of the items exceeds maxbytes, the least recently used items must be evicted"""
+    cache = ExtendedTTLCache(maxsize=100, ttl=15, maxbytes=get_deep_size("x" * 100) * 2)
+    cache["key1"] = "x" * 100
+    cache["key2"] = "y" * 100
+    assert cache.currsize == cache.maxbytes
+
+    cache.get("key1")
+    cache["key3"] = "z" * 100
+    assert set(cache.keys()) == {"key1", "key3"}
+    assert cache.evictions == 1
+
+    # Items larger than the cache are not cached
+    cache.set("key4", "x" * 1000)
+    assert "key4" not in cache
+    assert set(cache.keys()) == {"key1", "key3"}
+
+
+def test_maxsize_with_sizes():
+    """The count of items must be limited by maxsize, while their size in bytes is measured"""
+    cache = ExtendedTTLCache(maxsize=2, ttl=15)
+    for i in range(3):
+        cache[f"key{i}"] = "x" * 100
+
+    assert len(cache) == cache.maxsize == 2
+    assert cache.currsize == get_deep_size("x" * 100) * 2
+
+
+def test_resize():
+    cache = ExtendedTTLCache(maxsize=10, ttl=15)
+    for i in range(5):
+        cache[f"key{i}"] = "value"
+    cache.get("key0")
+
+    cache.resize(maxsize=3)
+    assert set(cache.keys()) == {"key0", "key3", "key4"}
+    assert cache.maxsize == 3
+
+    cache.resize(maxbytes=get_deep_size("value"))
+    assert set(cache.keys()) == {"key0"}
+    cache.resize(maxbytes=0)
+    assert cache.maxbytes is None
+
+
+def test_set_ttl():
+    timer = FakeTimer()
+    cache = ExtendedTTLCache(maxsize=10, ttl=15, timer=timer)
+    cache["key1"] = "value"
+    timer.now = 10
+    cache["key2"] = "value"
+
+    cache.set_ttl(30)
+    assert cache.ttl == 30
+    assert cache.get_remaining_ttl("key1") == 20
+    assert cache.get_remaining_ttl("key2") == 30
+
+    cache.set_ttl(5)
+    assert "key1" not in cache
+    assert cache.get_remaining_ttl("key2") == 5
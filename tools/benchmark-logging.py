@@ -0,0 +1,120 @@
+"""BENCHMARK LOGGING Script
+Measure the overhead of the logging on the hot paths:
+
+1. Cost per call of logging expensive payloads on debug records while the log level is info,
+   binding them eagerly (as done before) vs. lazily (lazy_bind).
+2. Mean time of a /buses request that misses the cache and parses an upstream HTTP response (mocked),
+   with different logging configurations (log level, debug sampling, sync vs. enqueued sink).
+
+Usage (from cwd = repository root)
+$ python tools/benchmark-logging.py [requests per configuration]
+"""
+
+import os
+import sys
+import json
+import timeit
+import importlib
+
+from benchmark_utils import asgi_get, run_timed, summarize, fake_buses_response
+
+from vigobusapi.settings import settings
+from vigobusapi.logger import logger, lazy_bind, configure_logger
+from vigobusapi.vigobus_getters import cache
+
+app_module = importlib.import_module("vigobusapi.app")
+http_module = importlib.import_module("vigobusapi.vigobus_getters.http.http")
+
+UPSTREAM_BUSES = 40
+UPSTREAM_BODY = json.dumps({
+    "parada": [{"nombre": "Rua de Proba"}],
+    "estimaciones": [
+        {"linea": str(i % 30), "ruta": f"\"A\" ROUTE {i % 30} por CENTRO", "minutos": i}
+        for i in range(UPSTREAM_BUSES)
+    ]
+})
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def benchmark_call_sites(calls: int = 20000):
+    response = FakeResponse(UPSTREAM_BODY.encode() * 10)
+    buses_response = fake_buses_response(UPSTREAM_BUSES)
+
+    call_sites = (
+        (
+            "http_request response_body",
+            lambda: logger.bind(response_body=response.text).debug("Response received"),
+            lambda: lazy_bind(response_body=lambda: response.text).debug("Response received")
+        ),
+        (
+            "BusesResponse dict",
+            lambda: logger.bind(buses_response_data=buses_response.dict()).debug("Generated BusesResponse"),
+            lambda: lazy_bind(buses_response_data=buses_response.dict).debug("Generated BusesResponse")
+        ),
+    )
+
+    print(f"Call sites at info level ({calls} calls each)")
+    for name, eager, lazy in call_sites:
+        eager_us = timeit.timeit(eager, number=calls) / calls * 1e6
+        lazy_us = timeit.timeit(lazy, number=calls) / calls * 1e6
+        print(f"  {name:<28} | eager {eager_us:8.2f}us/call | lazy {lazy_us:8.2f}us/call")
+
+
+def patch_upstream():
+    async def _http_request(*_args, **_kwargs):
+        return FakeResponse(UPSTREAM_BODY.encode())
+
+    http_module.http_request = _http_request
+
+
+async def request_buses_uncached():
+    cache.buses_cache.clear()
+    return await asgi_get(app_module.app, "/buses/1", "get_all_buses=true")
+
+
+CONFIGURATIONS = (
+    # log_level, log_debug_sample_rate, log_enqueue
+    ("info", 1, False),
+    ("info", 1, True),
+    ("debug", 1, False),
+    ("debug", 0.1, False),
+    ("debug", 0.1, True),
+)
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    patch_upstream()
+    null_sink = open(os.devnull, "w")
+
+    settings.log_level, settings.log_debug_sample_rate, settings.log_enqueue = "info", 1, False
+    configure_logger(null_sink)
+    benchmark_call_sites()
+
+    print(f"/buses/{{id}} requests, cache miss + HTTP source parsing {UPSTREAM_BUSES} buses ({requests} requests each)")
+    for log_level, sample_rate, enqueue in CONFIGURATIONS:
+        settings.log_level, settings.log_debug_sample_rate, settings.log_enqueue = log_level, sample_rate, enqueue
+        configure_logger(null_sink)
+
+        times, elapsed = run_timed(request_buses_uncached, requests=requests)
+        print(f"  level={log_level:<5} sample_rate={sample_rate:<3} enqueue={str(enqueue):<5} | "
+              f"{summarize(times, elapsed)}")
+
+    logger.remove()
+
+
+if __name__ == "__main__":
+    main()
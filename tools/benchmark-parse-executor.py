@@ -0,0 +1,89 @@
+"""BENCHMARK PARSE EXECUTOR Script
+Measure the latency of cache hits on /buses/{stop_id} while other requests fetch and parse all the pages of the
+HTML data source (get_all_buses=true), with the parsing running on the event loop, a thread pool or a process pool
+(parse_executor setting). The HTML data source is replaced by fake pages, returned after a fixed latency.
+Requests are performed in-process against the ASGI app (see benchmark_utils).
+
+Usage (from cwd = repository root)
+$ python tools/benchmark-parse-executor.py [cache hit requests] [concurrent HTML requests]
+"""
+
+import sys
+import asyncio
+import importlib
+import itertools
+
+from benchmark_utils import asgi_get, silence_logger, summarize, fake_buses_html, fake_buses_response
+from vigobusapi.vigobus_getters import auto_getters, cache, html
+from vigobusapi.vigobus_getters.pipeline import KIND_CACHE, KIND_EXTERNAL
+from vigobusapi.services import shutdown_parse_executor
+from vigobusapi.settings import settings
+
+app = importlib.import_module("vigobusapi.app").app
+html_module = importlib.import_module("vigobusapi.vigobus_getters.html.html")
+
+CACHED_STOP_ID = 1
+HTML_PAGES = 4
+BUSES_PER_PAGE = 10
+UPSTREAM_LATENCY = 0.005
+
+
+async def fake_request_html(stop_id: int, page=None, extra_params=None) -> str:
+    await asyncio.sleep(UPSTREAM_LATENCY)
+    return fake_buses_html(stop_id, page=page or 1, pages=HTML_PAGES, buses_count=BUSES_PER_PAGE)
+
+
+async def run_scenario(cache_hit_requests: int, html_concurrency: int):
+    uncached_stops_ids = itertools.count(CACHED_STOP_ID + 1)
+    stop_load = asyncio.Event()
+
+    async def html_load():
+        # Each request asks for a new stop, so it is never served from the cache
+        while not stop_load.is_set():
+            status, _, _ = await asgi_get(app, f"/buses/{next(uncached_stops_ids)}", "get_all_buses=true")
+            assert status == 200, status
+
+    load_tasks = [asyncio.ensure_future(html_load()) for _ in range(html_concurrency)]
+    await asyncio.sleep(0.5)  # warm-up (e.g. start the pool)
+
+    times = list()
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    for _ in range(cache_hit_requests):
+        request_start = loop.time()
+        status, _, _ = await asgi_get(app, f"/buses/{CACHED_STOP_ID}")
+        assert status == 200, status
+        times.append(loop.time() - request_start)
+        await asyncio.sleep(0.001)
+    elapsed = loop.time() - start
+
+    stop_load.set()
+    await asyncio.gather(*load_tasks)
+    return times, elapsed
+
+
+def main():
+    cache_hit_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    html_concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    silence_logger()
+    html_module.request_html = fake_request_html
+    auto_getters.BUS_TIERS = (
+        auto_getters.bus_tier(cache.get_buses, KIND_CACHE),
+        auto_getters.bus_tier(html.get_buses, KIND_EXTERNAL)
+    )
+    cache.save_buses(CACHED_STOP_ID, False, fake_buses_response(5), ttl=3600)
+    settings.buses_cache_ttl = 0.1  # buses of the HTML load expire soon, not filling the cache
+
+    print(f"{cache_hit_requests} cache hits while {html_concurrency} concurrent requests parse "
+          f"{HTML_PAGES} HTML pages each")
+    loop = asyncio.get_event_loop()
+    for parse_executor in (None, "thread", "process"):
+        settings.parse_executor = parse_executor
+        times, elapsed = loop.run_until_complete(run_scenario(cache_hit_requests, html_concurrency))
+        shutdown_parse_executor()
+        print(f"parse_executor={parse_executor or 'disabled':8} | cache hits: {summarize(times, elapsed)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""BENCHMARK RESPONSES Script
+Measure the throughput of each data endpoint, with and without the 'api_fast_json' setting enabled
+(orjson-encoded responses, skipping the re-validation against the endpoint response_model).
+The getters used by the endpoints are replaced by functions returning static data, so only the cost of
+building & encoding the responses is measured.
+
+Usage (from cwd = repository root)
+$ python tools/benchmark-responses.py [requests per endpoint]
+"""
+
+import sys
+import importlib
+
+from benchmark_utils import asgi_get, run_timed, summarize, silence_logger, fake_stop, fake_buses_response
+
+from vigobusapi.settings import settings
+
+app_module = importlib.import_module("vigobusapi.app")  # the package exports the FastAPI instance as "app"
+
+STOPS_COUNT = 100
+BUSES_COUNT = 40
+BUSES_NORMAL_COUNT = 5
+
+
+def patch_getters():
+    stops = [fake_stop(stop_id) for stop_id in range(1, STOPS_COUNT + 1)]
+    stop = stops[0]
+    all_buses = fake_buses_response(BUSES_COUNT)
+    normal_buses = fake_buses_response(BUSES_NORMAL_COUNT)
+
+    async def _get_stops(*_args, **_kwargs):
+        return stops
+
+    async def _get_stop(*_args, **_kwargs):
+        return stop
+
+    async def _get_buses(_stop_id, get_all_buses):
+        return all_buses if get_all_buses else normal_buses
+
+    app_module.get_stops = _get_stops
+    app_module.search_stops = _get_stops
+    app_module.get_stop = _get_stop
+    app_module.get_buses = _get_buses
+
+
+ENDPOINTS = (
+    ("/stop/{id}", "/stop/1", ""),
+    (f"/stops ({STOPS_COUNT} stops)", "/stops", "stop_name=proba"),
+    (f"/buses/{{id}} ({BUSES_NORMAL_COUNT} buses)", "/buses/1", ""),
+    (f"/buses/{{id}} ({BUSES_COUNT} buses)", "/buses/1", "get_all_buses=true"),
+)
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    silence_logger()
+    patch_getters()
+
+    for endpoint_name, path, query_string in ENDPOINTS:
+        print(endpoint_name)
+        for fast_json in (False, True):
+            settings.api_fast_json = fast_json
+            times, elapsed = run_timed(
+                lambda: asgi_get(app_module.app, path, query_string),
+                requests=requests
+            )
+            print(f"  api_fast_json={str(fast_json):<5} | {summarize(times, elapsed)}")
+
+
+if __name__ == "__main__":
+    main()
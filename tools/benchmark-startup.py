@@ -0,0 +1,84 @@
+"""BENCHMARK STARTUP Script
+Measure the cold start of the API:
+- Time to import the vigobusapi package on a fresh interpreter, and the heavy modules it imports.
+- Time since the server process starts until /status responds, with the MongoDB indexes created before accepting
+  requests and on background (mongo_init_background setting).
+By default MongoDB is not reachable (so the indexes can not be created, like when MongoDB is slow or down);
+set the MONGO_URI env variable to measure against a running MongoDB instead.
+
+Usage (from cwd = repository root)
+$ python tools/benchmark-startup.py [import runs]
+"""
+
+import os
+import sys
+import time
+import statistics
+import subprocess
+import urllib.request
+from typing import Optional
+
+PORT = 5090
+STARTUP_TIMEOUT = 15
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=5000")
+HEAVY_MODULES = ("bs4", "motor", "pymongo", "roman")
+
+IMPORT_CODE = f"""
+import sys, time
+start = time.perf_counter()
+import vigobusapi
+print(time.perf_counter() - start)
+print(",".join(module for module in {HEAVY_MODULES} if module in sys.modules))
+"""
+
+
+def measure_import():
+    output = subprocess.run([sys.executable, "-c", IMPORT_CODE], stdout=subprocess.PIPE, check=True, cwd=os.getcwd())
+    elapsed, heavy_modules = output.stdout.decode().splitlines()
+    return float(elapsed), heavy_modules
+
+
+def measure_time_to_status(mongo_init_background: bool) -> Optional[float]:
+    """Start the server and return the seconds until /status responds, or None if it did not start."""
+    env = dict(
+        os.environ,
+        api_port=str(PORT),
+        api_log_level="warning",
+        mongo_uri=MONGO_URI,
+        mongo_init_background=str(mongo_init_background).lower()
+    )
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "."], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    try:
+        while time.perf_counter() - start < STARTUP_TIMEOUT and process.poll() is None:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{PORT}/status", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        return None
+
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    results = [measure_import() for _ in range(runs)]
+    print(f"Import vigobusapi: median {round(statistics.median(r[0] for r in results) * 1000, 1)}ms ({runs} runs); "
+          f"heavy modules imported: {results[0][1] or 'none'}")
+
+    for mongo_init_background in (False, True):
+        elapsed = measure_time_to_status(mongo_init_background)
+        result = f"{round(elapsed * 1000)}ms" if elapsed is not None else "did not start (startup failed or timed out)"
+        print(f"Time to /status (mongo_init_background={mongo_init_background}): {result}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""BENCHMARK UTILS
+Helpers shared by the benchmark scripts on this directory (the ASGI requests helper is used by the unit tests too).
+Requests are performed in-process against the ASGI app (no HTTP server nor network involved),
+so the results measure the cost of the app itself.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import statistics
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import vigobusapi
+except ModuleNotFoundError:
+    sys.path.append(os.getcwd())
+    import vigobusapi
+
+from vigobusapi.entities import Stop, Bus, BusesResponse
+
+ASGIResult = Tuple[int, Dict[str, str], bytes]
+
+
+async def asgi_get(app, path: str, query_string: str = "", headers: Optional[Dict[str, str]] = None) -> ASGIResult:
+    """Perform a GET request against the given ASGI app. Return (status code, response headers, response body)."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string.encode(),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or dict()).items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("benchmark", 80),
+    }
+    request_sent = False
+    disconnected = asyncio.Event()
+    status_code = None
+    response_headers = dict()
+    body = bytearray()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            response_headers.update({k.decode(): v.decode() for k, v in message.get("headers", [])})
+        elif message["type"] == "http.response.body":
+            body.extend(message.get("body", b""))
+
+    await app(scope, receive, send)
+    disconnected.set()
+    return status_code, response_headers, bytes(body)
+
+
+def run_timed(coro_factory: Callable, requests: int, concurrency: int = 1) -> Tuple[List[float], float]:
+    """Run the coroutines returned by coro_factory the given number of times, with the given concurrency.
+    Return the list of elapsed times (seconds) of each coroutine, and the total elapsed time (seconds)."""
+    async def _worker(count: int, times: List[float]):
+        for _ in range(count):
+            start = time.perf_counter()
+            await coro_factory()
+            times.append(time.perf_counter() - start)
+
+    async def _run():
+        times = list()
+        per_worker = max(requests // concurrency, 1)
+        start = time.perf_counter()
+        await asyncio.gather(*[_worker(per_worker, times) for _ in range(concurrency)])
+        return times, time.perf_counter() - start
+
+    return asyncio.get_event_loop().run_until_complete(_run())
+
+
+def percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    index = min(int(round(pct / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def summarize(times: List[float], total_elapsed: float) -> str:
+    """Return a line with the throughput & latency stats of the given list of elapsed times (seconds)."""
+    return "{rps:>9.1f} req/s | mean {mean:.3f}ms | p50 {p50:.3f}ms | p99 {p99:.3f}ms".format(
+        rps=len(times) / total_elapsed,
+        mean=statistics.mean(times) * 1000,
+        p50=percentile(times, 50) * 1000,
+        p99=percentile(times, 99) * 1000
+    )
+
+
+def silence_logger():
+    """Remove the loguru sinks, so the log output does not interfere with the benchmark results."""
+    from vigobusapi.logger import logger
+    logger.remove()
+
+
+def fake_stop(stop_id: int) -> Stop:
+    return Stop(
+        stop_id=stop_id,
+        name=f"Rua de Proba, {stop_id}",
+        original_name=f"RUA DE PROBA- {stop_id}",
+        lat=42.2328,
+        lon=-8.7226
+    )
+
+
+def fake_buses_response(buses_count: int) -> BusesResponse:
+    buses = [
+        Bus(line=str(i % 30), route=f"ROUTE {i % 30} por CENTRO", time=i)
+        for i in range(buses_count)
+    ]
+    return BusesResponse(buses=buses, more_buses_available=False)
+
+
+def fake_buses_html(stop_id: int, page: int, pages: int, buses_count: int) -> str:
+    """Return a page of the HTML data source with the given buses, similar in structure & size to the real ones."""
+    rows = "".join(
+        '<tr style="{style}"><td>{line}</td><td>ROUTE {line} por CENTRO</td><td>{time}</td></tr>'.format(
+            style="color:#333333;background-color:#F7F6F3;" if i % 2 else "color:#284775;background-color:White;",
+            line=(page * buses_count + i) % 30,
+            time=page * buses_count + i
+        )
+        for i in range(buses_count)
+    )
+    pages_row = ""
+    if pages > 1:
+        pages_row = '<tr align="center" style="color:White;background-color:#284775;"><td><table><tr>{}</tr></table>' \
+                    '</td></tr>'.format("".join(
+                        f"<td><span>{n}</span></td>" if n == page else f'<td><a style="color:White;">{n}</a></td>'
+                        for n in range(1, pages + 1)
+                    ))
+    hidden_inputs = "".join(
+        f'<input type="hidden" id="{key}" value="{key}{"x" * 4000}"/>'
+        for key in ("__VIEWSTATE", "__VIEWSTATEGENERATOR", "__EVENTVALIDATION")
+    )
+    return f"""<html><body><form>{hidden_inputs}
+<span id="lblParada">{stop_id}</span><span id="lblNombre">RUA DE PROBA- {stop_id}</span>
+<table id="GridView1"><tr><th>Línea</th><th>Ruta</th><th>Minutos</th></tr>{rows}{pages_row}</table>
+</form></body></html>"""
+
@@ -0,0 +1,174 @@
+"""CRAWL STOPS Script
+Discover the Stops by scanning ranges of Stop IDs on the HTML data source, and save the found Stops on MongoDB
+(inserted, or updated keeping the fields not returned by the HTML data source, like the location).
+Stop IDs are requested concurrently, limited by a max rate of requests per second. IDs are processed in chunks;
+after each chunk, the found Stops are upserted on MongoDB with a single bulk write, and a checkpoint file is saved
+with the progress on each range, the IDs that do not exist, and the IDs that failed (retried when resuming).
+Running the script again with the same checkpoint file and ranges resumes the crawl where it stopped.
+MongoDB is configured by the same settings as the API (mongo_uri, mongo_stops_db, mongo_stops_collection).
+
+Usage (from cwd = repository root)
+$ python tools/crawl-stops.py [--ranges 1-20000] [--rate 10] [--concurrency 5] [--chunk-size 100]
+                              [--checkpoint crawl-stops.checkpoint.json] [--dry-run]
+Ranges are given as comma-separated "first-last" IDs (both included), e.g. --ranges 1-3000,5000-20000
+With --dry-run, the Stops found are printed (as NDJSON, like tools/stops.ndjson) instead of saved on MongoDB.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import List, Tuple, Dict
+
+try:
+    import vigobusapi
+except ModuleNotFoundError:
+    sys.path.append(os.getcwd())
+
+from vigobusapi.vigobus_getters import html
+from vigobusapi.vigobus_getters.helpers import add_stop_created_timestamp
+from vigobusapi.vigobus_getters.mongo import upsert_stops
+from vigobusapi.services import MongoDB
+from vigobusapi.entities import Stop
+from vigobusapi.exceptions import StopNotExist
+from vigobusapi.admission import TokenBucket
+
+Range = Tuple[int, int]
+
+
+def parse_ranges(ranges: str) -> List[Range]:
+    parsed = list()
+    for chunk in ranges.split(","):
+        first, _, last = chunk.strip().partition("-")
+        first, last = int(first), int(last or first)
+        if first > last:
+            raise ValueError(f"Invalid range {chunk}")
+        parsed.append((first, last))
+    return parsed
+
+
+class Checkpoint:
+    """Progress of the crawl, saved on a JSON file after each chunk of IDs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.next_ids: Dict[str, int] = dict()
+        """Next Stop ID to crawl on each range, by range ("first-last")"""
+        self.not_exist: List[int] = list()
+        self.failed: List[int] = list()
+        self.found = 0
+
+        if os.path.exists(path):
+            with open(path) as file:
+                data = json.load(file)
+            self.next_ids = data["next_ids"]
+            self.not_exist = data["not_exist"]
+            self.failed = data["failed"]
+            self.found = data["found"]
+
+    def save(self):
+        data = dict(next_ids=self.next_ids, not_exist=sorted(set(self.not_exist)), failed=sorted(set(self.failed)),
+                    found=self.found)
+        # Write to a temp file and rename, so the checkpoint is never left half-written
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(data, file)
+        os.replace(temp_path, self.path)
+
+
+class Crawler:
+    def __init__(self, checkpoint: Checkpoint, rate: float, concurrency: int, dry_run: bool):
+        self.checkpoint = checkpoint
+        self.dry_run = dry_run
+        self._bucket = TokenBucket(rate=rate, burst=max(1, int(rate)))
+        self._rate = rate
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def _wait_rate(self):
+        while not self._bucket.consume():
+            await asyncio.sleep(1 / self._rate)
+
+    async def _get_stop(self, stop_id: int):
+        """Return the Stop, or the exception raised by the getter."""
+        async with self._semaphore:
+            await self._wait_rate()
+            try:
+                return await html.get_stop(stop_id)
+            except Exception as ex:
+                return ex
+
+    async def crawl_ids(self, stops_ids: List[int]):
+        """Crawl the given Stop IDs concurrently, save the found Stops and record the rest on the checkpoint
+        (without saving it)."""
+        results = await asyncio.gather(*[self._get_stop(stop_id) for stop_id in stops_ids])
+        stops = list()
+        for stop_id, result in zip(stops_ids, results):
+            if isinstance(result, StopNotExist):
+                self.checkpoint.not_exist.append(stop_id)
+            elif isinstance(result, Exception):
+                print(f"Stop {stop_id} failed: {result!r}", file=sys.stderr)
+                self.checkpoint.failed.append(stop_id)
+            else:
+                stops.append(add_stop_created_timestamp(result))
+
+        await self._save_stops(stops)
+        self.checkpoint.found += len(stops)
+
+    async def _save_stops(self, stops: List[Stop]):
+        if not stops:
+            return
+        if self.dry_run:
+            for stop in stops:
+                print(json.dumps(stop.get_mongo_dict(), default=str))
+            return
+        await upsert_stops(*stops)
+
+    async def crawl(self, ranges: List[Range], chunk_size: int):
+        # Retry the IDs that failed on previous runs
+        failed = self.checkpoint.failed
+        self.checkpoint.failed = list()
+        for i in range(0, len(failed), chunk_size):
+            await self.crawl_ids(failed[i:i + chunk_size])
+            self.checkpoint.save()
+
+        for first, last in ranges:
+            range_key = f"{first}-{last}"
+            next_id = self.checkpoint.next_ids.get(range_key, first)
+            while next_id <= last:
+                chunk_last = min(next_id + chunk_size - 1, last)
+                start = time.monotonic()
+                await self.crawl_ids(list(range(next_id, chunk_last + 1)))
+
+                next_id = chunk_last + 1
+                self.checkpoint.next_ids[range_key] = next_id
+                self.checkpoint.save()
+                print(f"Crawled {range_key} up to {chunk_last} in {round(time.monotonic() - start, 1)}s "
+                      f"({self.checkpoint.found} found, {len(set(self.checkpoint.not_exist))} not exist, "
+                      f"{len(self.checkpoint.failed)} failed)", file=sys.stderr)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Discover the Stops on the HTML data source and save them on MongoDB")
+    parser.add_argument("--ranges", default="1-20000", help="Stop IDs ranges, e.g. 1-3000,5000-20000")
+    parser.add_argument("--rate", type=float, default=10, help="Max requests per second to the data source")
+    parser.add_argument("--concurrency", type=int, default=5, help="Max concurrent requests to the data source")
+    parser.add_argument("--chunk-size", type=int, default=100, help="Stop IDs crawled between checkpoints")
+    parser.add_argument("--checkpoint", default="crawl-stops.checkpoint.json", help="Checkpoint file path")
+    parser.add_argument("--dry-run", action="store_true", help="Print the Stops found instead of saving them")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    if not args.dry_run:
+        await MongoDB.initialize()
+
+    crawler = Crawler(Checkpoint(args.checkpoint), rate=args.rate, concurrency=args.concurrency,
+                      dry_run=args.dry_run)
+    await crawler.crawl(parse_ranges(args.ranges), chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(main())
@@ -0,0 +1,116 @@
+"""LOAD TEST PREFETCH Script
+Measure the ratio of Buses requests served from the cache (overall and for the most popular Stops), and their
+latency, with the prefetch of the most popular Stops disabled and enabled.
+Stops are requested randomly, a few of them being much more popular (Zipf-like).
+Each scenario runs on a new process with the app in-process (ASGI), with the external Bus getters replaced by a fake
+getter that counts the requests and takes a fixed time to respond.
+
+Usage (from cwd = repository root)
+$ python tools/loadtest-prefetch.py [seconds per scenario] [top stops prefetched]
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import importlib
+import multiprocessing
+
+STOPS_COUNT = 300
+REQUESTS_PER_SECOND = 100
+UPSTREAM_LATENCY = 0.1
+BUSES_CACHE_TTL = 5
+WARMUP = BUSES_CACHE_TTL  # seconds not measured at the start of each scenario
+
+
+def run_scenario(duration: float, prefetch_top_stops: int, top_stops: int, results):
+    # Settings are read when the package is imported, so they must be set before
+    os.environ["buses_cache_ttl"] = str(BUSES_CACHE_TTL)
+    os.environ["prefetch_top_stops"] = str(prefetch_top_stops)
+    os.environ["prefetch_budget"] = "1200"
+    os.environ["prefetch_margin"] = "2"
+
+    from benchmark_utils import asgi_get, silence_logger, fake_buses_response, percentile
+    from vigobusapi.vigobus_getters import auto_getters, cache
+    from vigobusapi.vigobus_getters.pipeline import KIND_CACHE, KIND_EXTERNAL
+    from vigobusapi import prefetch
+    app_module = importlib.import_module("vigobusapi.app")
+    silence_logger()
+
+    upstream_requests = 0
+
+    async def upstream_get_buses(*_args, **_kwargs):
+        nonlocal upstream_requests
+        upstream_requests += 1
+        await asyncio.sleep(UPSTREAM_LATENCY)
+        return fake_buses_response(5)
+
+    auto_getters.BUS_TIERS = (
+        auto_getters.bus_tier(cache.get_buses, KIND_CACHE),
+        auto_getters.bus_tier(upstream_get_buses, KIND_EXTERNAL)
+    )
+    stops_ids = list(range(1, STOPS_COUNT + 1))
+    stops_weights = [1 / stop_id for stop_id in stops_ids]
+    sources = list()
+    top_sources = list()
+    times = list()
+
+    async def request(measured: bool):
+        stop_id = random.choices(stops_ids, weights=stops_weights)[0]
+        start = time.perf_counter()
+        status, _, body = await asgi_get(app_module.app, f"/buses/{stop_id}")
+        assert status == 200, status
+        if not measured:
+            return
+
+        times.append(time.perf_counter() - start)
+        from_cache = b'"source":"bus_cache"' in body
+        sources.append(from_cache)
+        if stop_id <= top_stops:  # stops are ranked by popularity
+            top_sources.append(from_cache)
+
+    async def main():
+        prefetch.start_prefetch()
+        tasks = list()
+        measure_time = time.monotonic() + WARMUP
+        end_time = measure_time + duration
+        while time.monotonic() < end_time:
+            tasks.append(asyncio.ensure_future(request(measured=time.monotonic() >= measure_time)))
+            await asyncio.sleep(1 / REQUESTS_PER_SECOND)
+        await asyncio.gather(*tasks)
+        prefetch.stop_prefetch()
+
+    asyncio.get_event_loop().run_until_complete(main())
+    results.update(
+        requests=len(sources),
+        hit_rate=sum(sources) / len(sources),
+        top_hit_rate=sum(top_sources) / len(top_sources),
+        p50=percentile(times, 50),
+        p99=percentile(times, 99),
+        upstream_requests=upstream_requests
+    )
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    top_stops = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    print(f"{REQUESTS_PER_SECOND} req/s, {duration}s (after {WARMUP}s warm-up), {STOPS_COUNT} stops, "
+          f"buses cache TTL {BUSES_CACHE_TTL}s, upstream latency {UPSTREAM_LATENCY}s")
+    context = multiprocessing.get_context("spawn")
+    for scenario_name, prefetch_top_stops in (("prefetch disabled", 0), (f"prefetch top {top_stops}", top_stops)):
+        with context.Manager() as manager:
+            results = manager.dict()
+            process = context.Process(target=run_scenario, args=(duration, prefetch_top_stops, top_stops, results))
+            process.start()
+            process.join()
+            print(f"{scenario_name}: {results['requests']} requests, "
+                  f"{round(results['hit_rate'] * 100, 1)}% served from cache "
+                  f"({round(results['top_hit_rate'] * 100, 1)}% for the top {top_stops} stops), "
+                  f"p50 {round(results['p50'] * 1000, 1)}ms, p99 {round(results['p99'] * 1000, 1)}ms, "
+                  f"{results['upstream_requests']} upstream requests")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""LOAD TEST SHARED CACHE Script
+Measure the requests performed to the external data sources by multiple workers serving the same load,
+with and without the shared cache (SQLite backend) enabled.
+Each worker is simulated by a process running the app in-process (ASGI), with the external Bus getters replaced by
+a fake getter that counts the requests (shared between processes) and takes a fixed time to respond.
+Every worker requests the buses of random stops (a few of them being much more popular), for the given duration.
+With the shared cache enabled, the buses fetched by a worker are reused by the rest of them until the cache expires.
+
+Usage (from cwd = repository root)
+$ python tools/loadtest-shared-cache.py [workers] [seconds per scenario]
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+import importlib
+import multiprocessing
+
+STOPS_COUNT = 50
+REQUESTS_PER_SECOND = 100  # per worker
+UPSTREAM_LATENCY = 0.05
+BUSES_CACHE_TTL = 2
+
+
+def worker(upstream_requests, served_requests, duration: float, shared_cache_backend: str, shared_cache_path: str):
+    # Settings are read when the package is imported, so they must be set before
+    os.environ["buses_cache_ttl"] = str(BUSES_CACHE_TTL)
+    os.environ["shared_cache_backend"] = shared_cache_backend
+    os.environ["shared_cache_path"] = shared_cache_path
+
+    from benchmark_utils import asgi_get, silence_logger, fake_buses_response
+    from vigobusapi.vigobus_getters import auto_getters, cache, shared_cache
+    from vigobusapi.vigobus_getters.pipeline import KIND_CACHE, KIND_EXTERNAL
+    app_module = importlib.import_module("vigobusapi.app")
+    silence_logger()
+
+    async def upstream_get_buses(*_args, **_kwargs):
+        with upstream_requests.get_lock():
+            upstream_requests.value += 1
+        await asyncio.sleep(UPSTREAM_LATENCY)
+        return fake_buses_response(5)
+
+    auto_getters.BUS_TIERS = (
+        auto_getters.bus_tier(cache.get_buses, KIND_CACHE),
+        auto_getters.bus_tier(shared_cache.get_buses, KIND_CACHE),
+        auto_getters.bus_tier(upstream_get_buses, KIND_EXTERNAL)
+    )
+    stops_ids = list(range(1, STOPS_COUNT + 1))
+    stops_weights = [1 / stop_id for stop_id in stops_ids]  # Zipf-like popularity
+
+    async def request():
+        stop_id = random.choices(stops_ids, weights=stops_weights)[0]
+        status, _, _ = await asgi_get(app_module.app, f"/buses/{stop_id}")
+        assert status == 200, status
+        with served_requests.get_lock():
+            served_requests.value += 1
+
+    async def main():
+        tasks = list()
+        end_time = time.monotonic() + duration
+        while time.monotonic() < end_time:
+            tasks.append(asyncio.ensure_future(request()))
+            await asyncio.sleep(1 / REQUESTS_PER_SECOND)
+        await asyncio.gather(*tasks)
+
+    asyncio.get_event_loop().run_until_complete(main())
+
+
+def run_scenario(workers_count: int, duration: float, shared_cache_backend: str):
+    context = multiprocessing.get_context("spawn")
+    upstream_requests = context.Value("i", 0)
+    served_requests = context.Value("i", 0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        shared_cache_path = os.path.join(tmp_dir, "cache.sqlite3")
+        processes = [
+            context.Process(
+                target=worker,
+                args=(upstream_requests, served_requests, duration, shared_cache_backend, shared_cache_path)
+            )
+            for _ in range(workers_count)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+    return served_requests.value, upstream_requests.value
+
+
+def main():
+    workers_count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    print(f"{workers_count} workers, {REQUESTS_PER_SECOND} req/s per worker, {duration}s, "
+          f"{STOPS_COUNT} stops, buses cache TTL {BUSES_CACHE_TTL}s")
+    results = dict()
+    for scenario_name, backend in (("local caches only", ""), ("shared cache (sqlite)", "sqlite")):
+        served, upstream = run_scenario(workers_count, duration, backend)
+        results[scenario_name] = upstream
+        print(f"{scenario_name}: {served} requests served, {upstream} upstream requests "
+              f"({round(upstream / served * 100, 1)}%)")
+
+    without_shared, with_shared = results.values()
+    print(f"Upstream requests reduction: {round((1 - with_shared / without_shared) * 100, 1)}%")
+
+
+if __name__ == '__main__':
+    main()
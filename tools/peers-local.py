@@ -0,0 +1,104 @@
+"""PEERS LOCAL Script
+Run multiple API nodes as local processes in peer mode, and verify that the Buses of each Stop are only fetched from
+the external data sources by its owner node, while the rest of nodes get them from the owner.
+Then one node is stopped, verifying that the other nodes fall back to fetch its Stops themselves.
+Each node runs the app with uvicorn (without lifespan, so MongoDB is not required), with the external Bus getters
+replaced by a fake getter that counts the requests (shared between processes).
+
+Usage (from cwd = repository root)
+$ python tools/peers-local.py [nodes]
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import importlib
+import multiprocessing
+
+from requests_async import request
+
+BASE_PORT = 5100
+STOPS_COUNT = 30
+REQUESTS_COUNT = 300
+CONCURRENCY = 10
+
+
+def node(port: int, peers: str, upstream_requests):
+    # Settings are read when the package is imported, so they must be set before
+    os.environ["peers"] = peers
+    os.environ["peers_self"] = f"http://127.0.0.1:{port}"
+    os.environ["buses_cache_ttl"] = "600"
+
+    import uvicorn
+    from benchmark_utils import silence_logger, fake_buses_response
+    from vigobusapi.vigobus_getters import auto_getters, cache, shared_cache, peers as peers_getter
+    from vigobusapi.vigobus_getters.pipeline import KIND_CACHE, KIND_PEER, KIND_EXTERNAL
+    app_module = importlib.import_module("vigobusapi.app")
+    silence_logger()
+
+    async def upstream_get_buses(*_args, **_kwargs):
+        with upstream_requests.get_lock():
+            upstream_requests.value += 1
+        return fake_buses_response(5)
+
+    auto_getters.BUS_TIERS = (
+        auto_getters.bus_tier(cache.get_buses, KIND_CACHE),
+        auto_getters.bus_tier(shared_cache.get_buses, KIND_CACHE),
+        auto_getters.bus_tier(peers_getter.get_buses, KIND_PEER),
+        auto_getters.bus_tier(upstream_get_buses, KIND_EXTERNAL)
+    )
+    uvicorn.run(app_module.app, host="127.0.0.1", port=port, lifespan="off", log_level="warning")
+
+
+async def request_random_stops(nodes_urls, stops_ids):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def _request(stop_id: int):
+        async with semaphore:
+            response = await request("GET", f"{random.choice(nodes_urls)}/buses/{stop_id}")
+            return response.status_code
+
+    statuses = await asyncio.gather(*[_request(random.choice(stops_ids)) for _ in range(REQUESTS_COUNT)])
+    return sum(status == 200 for status in statuses)
+
+
+def main():
+    nodes_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    context = multiprocessing.get_context("spawn")
+    upstream_requests = context.Value("i", 0)
+    nodes_urls = [f"http://127.0.0.1:{BASE_PORT + i}" for i in range(nodes_count)]
+    peers = ",".join(nodes_urls)
+
+    processes = [
+        context.Process(target=node, args=(BASE_PORT + i, peers, upstream_requests), daemon=True)
+        for i in range(nodes_count)
+    ]
+    for process in processes:
+        process.start()
+    time.sleep(3)
+
+    try:
+        loop = asyncio.get_event_loop()
+        stops_ids = list(range(1, STOPS_COUNT + 1))
+        successful = loop.run_until_complete(request_random_stops(nodes_urls, stops_ids))
+        print(f"{nodes_count} nodes, {STOPS_COUNT} stops: {successful}/{REQUESTS_COUNT} successful requests, "
+              f"{upstream_requests.value} upstream requests (without peer mode, up to {STOPS_COUNT * nodes_count})")
+
+        # Stop the last node, and request new stops to the rest of nodes
+        processes[-1].terminate()
+        processes[-1].join()
+        upstream_requests.value = 0
+        stops_ids = list(range(STOPS_COUNT + 1, STOPS_COUNT * 2 + 1))
+        successful = loop.run_until_complete(request_random_stops(nodes_urls[:-1], stops_ids))
+        print(f"Last node stopped, {STOPS_COUNT} new stops: {successful}/{REQUESTS_COUNT} successful requests, "
+              f"{upstream_requests.value} upstream requests")
+
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    main()
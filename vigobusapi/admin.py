@@ -0,0 +1,139 @@
+"""ADMIN
+Runtime administration of the local caches: statistics, live changes of their size and TTL, invalidation of the
+entries of a Stop, and priming of Stops through the getters chain.
+Each worker process has its own local caches, so changes only apply to the worker serving the admin request.
+"""
+
+# # Native # #
+import asyncio
+import secrets
+from typing import Optional, Dict, List
+
+# # Installed # #
+from fastapi import Request, HTTPException
+
+# # Project # #
+from vigobusapi.vigobus_getters import get_stop, get_buses_multiple
+from vigobusapi.vigobus_getters.cache import stops_cache, buses_cache, last_known_buses_cache
+from vigobusapi.vigobus_getters.cache.ttl_cache import ExtendedTTLCache
+from vigobusapi.exceptions import StopNotExist
+from vigobusapi.settings import settings
+from vigobusapi.metrics import CACHE_LOOKUPS
+from vigobusapi.logger import logger
+
+__all__ = (
+    "ADMIN_KEY_HEADER", "CACHES", "check_admin_key",
+    "get_caches_stats", "configure_cache", "invalidate_stop", "prime_stops"
+)
+
+ADMIN_KEY_HEADER = "X-Admin-Key"
+
+CACHES: Dict[str, ExtendedTTLCache] = {
+    "stops": stops_cache,
+    "buses": buses_cache,
+    "last_known_buses": last_known_buses_cache
+}
+"""Local caches that can be administered, by name (the same used on the metrics)"""
+
+
+def check_admin_key(request: Request):
+    """Verify that the request includes the 'admin_key' setting on the X-Admin-Key header.
+    If the setting is not set, the admin endpoints are disabled (404)."""
+    if not settings.admin_key:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(request.headers.get(ADMIN_KEY_HEADER, ""), settings.admin_key):
+        raise HTTPException(status_code=403, detail="Invalid admin key")
+
+
+def _get_cache_stats(cache_name: str, cache: ExtendedTTLCache) -> dict:
+    cache.expire()
+    hits = CACHE_LOOKUPS.labels(cache_name, "hit").value
+    misses = CACHE_LOOKUPS.labels(cache_name, "miss").value
+    return {
+        "items": len(cache),
+        "maxsize": cache.maxsize,
+        "bytes": cache.currsize,
+        "maxbytes": cache.maxbytes,
+        "ttl": cache.ttl,
+        "evictions": cache.evictions,
+        "expirations": cache.expirations,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else None
+    }
+
+
+def get_caches_stats() -> dict:
+    """Return the occupancy (items and approximate bytes, and their limits), TTL and lookups of each local cache."""
+    return {cache_name: _get_cache_stats(cache_name, cache) for cache_name, cache in CACHES.items()}
+
+
+def configure_cache(
+        cache_name: str,
+        maxsize: Optional[int] = None,
+        maxbytes: Optional[int] = None,
+        ttl: Optional[float] = None
+) -> dict:
+    """Change the max items, max bytes (0 = unlimited) and/or TTL of the given cache, keeping its entries
+    (the least recently used are evicted if the cache exceeds the new limits). Return the stats of the cache.
+    Raise HTTPException 404 if the cache does not exist, or 400 if any value is not valid."""
+    cache = CACHES.get(cache_name)
+    if cache is None:
+        raise HTTPException(status_code=404, detail=f"Cache {cache_name} not found")
+    if (maxsize is not None and maxsize < 1) or (maxbytes is not None and maxbytes < 0) or \
+            (ttl is not None and ttl <= 0):
+        raise HTTPException(status_code=400, detail="Invalid cache limits")
+
+    cache.resize(maxsize=maxsize, maxbytes=maxbytes)
+    if ttl is not None:
+        cache.set_ttl(ttl)
+
+    logger.bind(cache_name=cache_name, cache_maxsize=cache.maxsize, cache_maxbytes=cache.maxbytes, cache_ttl=cache.ttl)\
+        .info("Cache configuration changed")
+    return _get_cache_stats(cache_name, cache)
+
+
+def invalidate_stop(stop_id: int, all_entries: bool = False) -> int:
+    """Remove the given Stop from the Stops cache; and if all_entries=True, its Buses from the Buses caches too.
+    Return the count of entries removed."""
+    keys_by_cache = [(stops_cache, stop_id)]
+    if all_entries:
+        for cache in (buses_cache, last_known_buses_cache):
+            keys_by_cache.extend((cache, (stop_id, get_all_buses)) for get_all_buses in (False, True))
+
+    removed = sum(cache.pop(key, None) is not None for cache, key in keys_by_cache)
+    logger.bind(stop_id=stop_id, all_entries=all_entries, removed_entries=removed).info("Stop invalidated on caches")
+    return removed
+
+
+async def prime_stops(stops_ids: List[int], buses: bool = False, get_all_buses: bool = False) -> dict:
+    """Get the given Stops (and their Buses, if buses=True) through the getters chain, so they get cached.
+    Up to 'buses_batch_concurrency' Stops are fetched at the same time.
+    Return the count of Stops found, not existing or failed (and the same for the Buses, if requested)."""
+    stops_ids = list(dict.fromkeys(stops_ids))
+    semaphore = asyncio.Semaphore(settings.buses_batch_concurrency)
+
+    async def _get_stop_limited(stop_id: int):
+        async with semaphore:
+            return await get_stop(stop_id)
+
+    stops_results = await asyncio.gather(*[_get_stop_limited(stop_id) for stop_id in stops_ids], return_exceptions=True)
+    result = {"stops": _count_results(stops_results)}
+    if buses:
+        buses_results = await get_buses_multiple(stops_ids, get_all_buses=get_all_buses)
+        result["buses"] = _count_results(buses_results.values())
+
+    logger.bind(stops_count=len(stops_ids), prime_result=result).info("Stops primed")
+    return result
+
+
+def _count_results(results) -> dict:
+    counts = {"found": 0, "not_exist": 0, "error": 0}
+    for result in results:
+        if isinstance(result, StopNotExist):
+            counts["not_exist"] += 1
+        elif isinstance(result, Exception):
+            counts["error"] += 1
+        else:
+            counts["found"] += 1
+    return counts
@@ -0,0 +1,224 @@
+"""ADMISSION
+Admission control of the requests, used by the request handler middleware.
+Data requests are classified as cache-servable (the data is available on the local caches) or upstream-bound
+(the data might be fetched from external data sources), and each class has its own limit of requests in flight.
+Requests exceeding the limit wait on queue; if they can not be admitted within the max queue time, they are rejected.
+Optionally, each client can be limited to a requests rate, using a token bucket per client.
+"""
+
+# # Native # #
+import re
+import time
+import asyncio
+from typing import Optional, Dict
+
+# # Installed # #
+from cachetools import TTLCache
+from fastapi import Request
+
+# # Project # #
+from vigobusapi.vigobus_getters import cache
+from vigobusapi.exceptions import ServiceOverloaded, ClientRateLimited
+from vigobusapi.settings import settings
+from vigobusapi.metrics import (
+    add_collect_hook, ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_REQUESTS, CLIENTS_RATE_LIMITED
+)
+from vigobusapi.logger import logger
+
+__all__ = ("admit_request", "get_admission_stats", "TokenBucket", "limiters", "CLASS_CACHE", "CLASS_UPSTREAM")
+
+BUSES_PATH_REGEX = re.compile(r"^/(?:buses/(\d+)(?:/delta)?|stop/(\d+)/buses(?:/delta)?|internal/buses/(\d+))$")
+STOP_PATH_REGEX = re.compile(r"^/stop/(\d+)$")
+UPSTREAM_PATHS = ("/stops", "/buses", "/admin/prime")
+TRUE_VALUES = ("1", "true", "on", "yes")
+
+CLASS_CACHE = "cache"
+CLASS_UPSTREAM = "upstream"
+
+
+class AdmissionLimiter:
+    """Limit of requests in flight for a class of requests, with statistics."""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_time = 0.0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self):
+        """Wait until the request can be admitted. If it can not be admitted within the 'admission_queue_timeout',
+        ServiceOverloaded is raised."""
+        if self._semaphore is None:
+            # Semaphore created lazily, since it must be created within the event loop (Python < 3.10)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        if self._semaphore.locked():
+            self.queued += 1
+            start_time = time.monotonic()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=settings.admission_queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise ServiceOverloaded()
+            finally:
+                self.queued -= 1
+                self.queue_time += time.monotonic() - start_time
+        else:
+            await self._semaphore.acquire()
+
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def get_stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_time": round(self.queue_time, 5)
+        }
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_time = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_time) * self.rate)
+        self.last_time = now
+
+    def consume(self) -> bool:
+        """Try to consume one token. Return True if consumed, False if no tokens are available."""
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def charge(self):
+        """Consume one token even if not available, for costs known once incurred. The bucket may get into debt
+        (negative tokens), so no tokens can be consumed until it refills."""
+        self._refill()
+        self.tokens -= 1
+
+    def refund(self):
+        """Give back one token consumed for a cost that was not incurred (without exceeding the burst)."""
+        self._refill()
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+limiters: Dict[str, AdmissionLimiter] = {
+    CLASS_CACHE: AdmissionLimiter(concurrency=settings.admission_cache_concurrency),
+    CLASS_UPSTREAM: AdmissionLimiter(concurrency=settings.admission_upstream_concurrency)
+}
+"""Limiters by class of request"""
+
+clients_buckets = TTLCache(
+    maxsize=settings.admission_clients_maxsize,
+    ttl=settings.admission_client_burst / settings.admission_client_rate if settings.admission_client_rate else 1
+)
+"""Token buckets by client. Buckets not used for the time they take to get full again are discarded"""
+
+clients_rate_limited = 0
+"""Count of requests rejected due to client rate limits"""
+
+
+def get_request_class(request: Request) -> Optional[str]:
+    """Return the class of the given request (CLASS_CACHE or CLASS_UPSTREAM), depending on the endpoint requested,
+    and the data currently available on the local caches. Return None if the request is not subject to admission
+    control (requests not acquiring data: status, documentation, stats, live subscriptions...)."""
+    path = request.url.path
+
+    match = BUSES_PATH_REGEX.match(path)
+    if match:
+        stop_id = int(next(group for group in match.groups() if group))
+        get_all_buses = request.query_params.get("get_all_buses", "").lower() in TRUE_VALUES
+        return CLASS_CACHE if cache.get_buses_ttl(stop_id, get_all_buses) is not None else CLASS_UPSTREAM
+
+    match = STOP_PATH_REGEX.match(path)
+    if match:
+        return CLASS_CACHE if int(match.group(1)) in cache.stops_cache else CLASS_UPSTREAM
+
+    if path in UPSTREAM_PATHS:
+        return CLASS_UPSTREAM
+    return None
+
+
+def get_client_id(request: Request) -> str:
+    if settings.admission_client_header:
+        header_value = request.headers.get(settings.admission_client_header)
+        if header_value:
+            # Take the first value (e.g. on X-Forwarded-For, the original client)
+            return header_value.split(",")[0].strip()
+    return request.client.host if request.client else ""
+
+
+def check_client_rate(request: Request):
+    """Consume a token from the bucket of the client performing the request. Raise ClientRateLimited if the
+    client has no tokens left."""
+    global clients_rate_limited
+    client_id = get_client_id(request)
+
+    bucket = clients_buckets.get(client_id)
+    if bucket is None:
+        bucket = TokenBucket(rate=settings.admission_client_rate, burst=settings.admission_client_burst)
+    clients_buckets[client_id] = bucket  # (re)set the bucket to refresh its TTL
+
+    if not bucket.consume():
+        clients_rate_limited += 1
+        logger.bind(client_id=client_id).warning("Request rejected due to client rate limit")
+        raise ClientRateLimited()
+
+
+async def admit_request(request: Request) -> Optional[AdmissionLimiter]:
+    """Wait until the given request is admitted. Return the limiter that admitted the request, which must be released
+    when the request ends; or None if the request is not subject to admission control.
+    :raises: exceptions.ServiceOverloaded | exceptions.ClientRateLimited
+    """
+    request_class = get_request_class(request)
+    if request_class is None:
+        return None
+
+    if settings.admission_client_rate:
+        check_client_rate(request)
+
+    limiter = limiters[request_class]
+    try:
+        await limiter.acquire()
+    except ServiceOverloaded:
+        logger.bind(request_class=request_class).warning("Request rejected due to overload")
+        raise
+    return limiter
+
+
+def get_admission_stats() -> dict:
+    """Return the admission statistics of each class of requests, and the count of requests rejected due to
+    client rate limits."""
+    return {
+        **{request_class: limiter.get_stats() for request_class, limiter in limiters.items()},
+        "clients_rate_limited": clients_rate_limited
+    }
+
+
+def _collect_metrics():
+    for request_class, limiter in limiters.items():
+        ADMISSION_IN_FLIGHT.labels(request_class).set(limiter.in_flight)
+        ADMISSION_QUEUED.labels(request_class).set(limiter.queued)
+        ADMISSION_REQUESTS.labels(request_class, "admitted").set(limiter.admitted)
+        ADMISSION_REQUESTS.labels(request_class, "rejected").set(limiter.rejected)
+    CLIENTS_RATE_LIMITED.labels().set(clients_rate_limited)
+
+
+add_collect_hook(_collect_metrics)
@@ -3,18 +3,32 @@ Module with all the available endpoints and the FastAPI initialization.
 """
 
 # # Native # #
-from typing import Optional, Set
+import secrets
+from typing import Optional, Set, List
 
 # # Installed # #
-import uvicorn
-from fastapi import FastAPI, Response, Query, HTTPException
+from fastapi import FastAPI, Request, Response, Query, HTTPException
+from fastapi.responses import StreamingResponse
 
 # # Project # #
-from vigobusapi.entities import Stop, Stops, BusesResponse
+from vigobusapi.entities import Stop, Stops, BusesResponse, BusesDelta, StopsBusesResults
 from vigobusapi.request_handler import request_handler
+from vigobusapi.cancellation import DisconnectMiddleware
+from vigobusapi.error_handler import handle_exception_as_error
+from vigobusapi.responses import json_response, get_etag, conditional_json_response
 from vigobusapi.settings import settings
-from vigobusapi.vigobus_getters import get_stop, get_stops, get_buses, search_stops
-from vigobusapi.services import MongoDB
+from vigobusapi.vigobus_getters import get_stop, get_stops, get_buses, get_buses_multiple, search_stops
+from vigobusapi.vigobus_getters.cache import get_buses_ttl
+from vigobusapi.vigobus_getters.peers import serving_peer, PEERS_KEY_HEADER
+from vigobusapi.deltas import get_buses_delta
+from vigobusapi.subscriptions import stream_buses, get_subscriptions_stats
+from vigobusapi.admission import get_admission_stats
+from vigobusapi.admin import check_admin_key, get_caches_stats, configure_cache, invalidate_stop, prime_stops
+from vigobusapi.metrics import render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from vigobusapi.loop_monitor import start_loop_monitor, stop_loop_monitor
+from vigobusapi.prefetch import start_prefetch, stop_prefetch, record_request
+from vigobusapi.runner import run_server, log_worker_started
+from vigobusapi.services import MongoDB, shutdown_parse_executor
 from vigobusapi.logger import logger
 
 __all__ = ("app", "run")
@@ -23,6 +37,8 @@ app = FastAPI(
     title=settings.api_name
 )
 app.middleware("http")(request_handler)
+# Outermost middleware: detects the client disconnecting while the request is being handled
+app.add_middleware(DisconnectMiddleware)
 
 
 @app.on_event("startup")
@@ -30,6 +46,17 @@ async def app_setup():
     """This function runs when FastAPI starts, before accepting requests."""
     # Initialize MongoDB
     await MongoDB.initialize()
+    start_loop_monitor()
+    start_prefetch()
+    log_worker_started()
+
+
+@app.on_event("shutdown")
+async def app_shutdown():
+    """This function runs when FastAPI stops."""
+    stop_loop_monitor()
+    stop_prefetch()
+    shutdown_parse_executor()
 
 
 @app.get("/status")
@@ -43,6 +70,8 @@ async def endpoint_status():
 
 @app.get("/stops", response_model=Stops)
 async def endpoint_get_stops(
+        request: Request,
+        response: Response,
         stop_name: Optional[str] = Query(None),
         limit: Optional[int] = Query(None),
         stops_ids: Optional[Set[int]] = Query(None, alias="stop_id")
@@ -53,49 +82,205 @@ async def endpoint_get_stops(
 
     - stop_name: search by a single string in stop names. "limit" can be used for limiting results size.
     - stop_id: repeatable param for getting multiple stops by id on a single request. Not found errors are ignored.
+
+    Supports conditional requests (ETag / If-None-Match).
     """
-    with logger.contextualize(**locals()):
+    with logger.contextualize(stop_name=stop_name, limit=limit, stops_ids=stops_ids):
         if stop_name is not None:
             stops = await search_stops(stop_name=stop_name, limit=limit)
         elif stops_ids:
             stops = await get_stops(stops_ids)
         else:
             raise HTTPException(status_code=400, detail="No filters given")
-        return [stop.dict() for stop in stops]
+
+        return conditional_json_response(
+            request=request,
+            response=response,
+            etag=get_etag(*stops),
+            max_age=settings.stops_cache_ttl,
+            content_getter=lambda: [stop.dict() for stop in stops]
+        )
 
 
 @app.get("/stop/{stop_id}", response_model=Stop)
-async def endpoint_get_stop(stop_id: int):
-    """Endpoint to get information of a Stop giving the Stop ID
+async def endpoint_get_stop(request: Request, response: Response, stop_id: int):
+    """Endpoint to get information of a Stop giving the Stop ID.
+    Supports conditional requests (ETag / If-None-Match).
     """
-    with logger.contextualize(**locals()):
+    with logger.contextualize(stop_id=stop_id):
         stop = await get_stop(stop_id)
-        return stop.dict()
+        return conditional_json_response(
+            request=request,
+            response=response,
+            etag=get_etag(stop),
+            max_age=settings.stops_cache_ttl,
+            content_getter=stop.dict
+        )
 
 
 @app.get("/buses/{stop_id}", response_model=BusesResponse)
 @app.get("/stop/{stop_id}/buses", response_model=BusesResponse)
-async def endpoint_get_buses(stop_id: int, get_all_buses: bool = False):
+async def endpoint_get_buses(request: Request, response: Response, stop_id: int, get_all_buses: bool = False):
     """Endpoint to get a list of Buses coming to a Stop giving the Stop ID.
-    By default the shortest available list of buses is returned, unless 'get_all_buses' param is True
+    By default the shortest available list of buses is returned, unless 'get_all_buses' param is True.
+    Supports conditional requests (ETag / If-None-Match); the response can be cached until the buses cache expires.
     """
-    with logger.contextualize(**locals()):
+    with logger.contextualize(stop_id=stop_id, get_all_buses=get_all_buses):
+        record_request(stop_id, get_all_buses)
         buses_result = await get_buses(stop_id, get_all_buses=get_all_buses)
-        return buses_result.dict()
+        return conditional_json_response(
+            request=request,
+            response=response,
+            etag=get_etag(buses_result),
+            max_age=get_buses_ttl(stop_id, get_all_buses),
+            content_getter=buses_result.dict
+        )
 
 
-def run():
-    """Run the API using Uvicorn
+@app.get("/buses/{stop_id}/delta", response_model=BusesDelta)
+@app.get("/stop/{stop_id}/buses/delta", response_model=BusesDelta)
+async def endpoint_get_buses_delta(stop_id: int, get_all_buses: bool = False, since: Optional[str] = None):
+    """Endpoint to get the changes on the list of Buses coming to a Stop giving the Stop ID, for polling clients.
+    Each response includes the 'version' of the Buses, to be sent as 'since' param on the next request: then, only
+    the Buses added, changed and removed since that version are returned (identified by their 'key'), or just
+    'unchanged' if the Buses did not change. The Buses must be sorted by time again after applying the changes.
+    """
+    with logger.contextualize(stop_id=stop_id, get_all_buses=get_all_buses, since=since):
+        record_request(stop_id, get_all_buses)
+        buses_result = await get_buses(stop_id, get_all_buses=get_all_buses)
+        return json_response(get_buses_delta(stop_id, get_all_buses, buses_result, since))
+
+
+@app.get("/internal/buses/{stop_id}", response_model=BusesResponse, include_in_schema=False)
+async def endpoint_get_buses_internal(request: Request, response: Response, stop_id: int, get_all_buses: bool = False):
+    """Internal endpoint used on peer mode by the other nodes, to get the Buses of the Stops owned by this node.
+    The Buses are fetched by this node, never requested to other nodes.
+    The seconds left until the Buses expire on the cache of this node are returned as Cache-Control max-age, so the
+    other nodes do not cache them for longer.
+    If the 'peers_key' setting is set, the request must include it on the X-Peers-Key header.
+    """
+    if settings.peers_key and not secrets.compare_digest(request.headers.get(PEERS_KEY_HEADER, ""), settings.peers_key):
+        raise HTTPException(status_code=403, detail="Invalid peers key")
+
+    with logger.contextualize(stop_id=stop_id, get_all_buses=get_all_buses, serving_peer=True):
+        serving_peer.set(True)
+        buses_result = await get_buses(stop_id, get_all_buses=get_all_buses)
+        max_age = max(int(get_buses_ttl(stop_id, get_all_buses) or 0), 0)
+        return json_response(buses_result.dict(), response=response, headers={"Cache-Control": f"max-age={max_age}"})
+
+
+@app.get("/buses/{stop_id}/live")
+@app.get("/stop/{stop_id}/buses/live")
+async def endpoint_get_buses_live(stop_id: int, get_all_buses: bool = False):
+    """Endpoint to subscribe to the list of Buses coming to a Stop giving the Stop ID, as a Server-Sent Events stream.
+    A "buses" event is sent with the BusesResponse when subscribing and every time the list changes.
+    If the buses could not be fetched, an "error" event is sent with the error status code & detail.
     """
-    logger.info("Running the app with uvicorn")
+    with logger.contextualize(**locals()):
+        return StreamingResponse(
+            stream_buses(stop_id, get_all_buses=get_all_buses),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"}
+        )
+
+
+@app.get("/subscriptions")
+async def endpoint_get_subscriptions_stats():
+    """Endpoint to get the count of live Buses subscribers, and running pollers (one per Stop being watched)."""
+    return get_subscriptions_stats()
+
+
+@app.get("/admission")
+async def endpoint_get_admission_stats():
+    """Endpoint to get the admission control statistics: requests in flight, queued, admitted and rejected,
+    for each class of requests (cache-servable and upstream-bound); and requests rejected by client rate limits."""
+    return get_admission_stats()
+
 
-    uvicorn.run(
-        app,
-        host=settings.api_host,
-        port=settings.api_port,
-        log_level=settings.api_log_level
+@app.get("/metrics")
+async def endpoint_get_metrics():
+    """Endpoint to get the runtime metrics of the API (requests, getters, caches, external data sources, MongoDB,
+    event loop lag...), in the Prometheus text exposition format."""
+    return Response(
+        content=render_metrics(),
+        media_type=METRICS_CONTENT_TYPE
     )
 
 
+@app.get("/admin/caches", include_in_schema=False)
+async def endpoint_admin_get_caches(request: Request):
+    """Admin endpoint to get the occupancy, limits, TTL and hit rate of the local caches."""
+    check_admin_key(request)
+    return get_caches_stats()
+
+
+@app.post("/admin/caches/{cache_name}", include_in_schema=False)
+async def endpoint_admin_configure_cache(
+        request: Request,
+        cache_name: str,
+        maxsize: Optional[int] = None,
+        maxbytes: Optional[int] = None,
+        ttl: Optional[float] = None
+):
+    """Admin endpoint to change the max items, max bytes (0 = unlimited) and/or TTL of a local cache, keeping its
+    entries. Returns the stats of the cache."""
+    check_admin_key(request)
+    return configure_cache(cache_name, maxsize=maxsize, maxbytes=maxbytes, ttl=ttl)
+
+
+@app.delete("/admin/caches/stops/{stop_id}", include_in_schema=False)
+async def endpoint_admin_invalidate_stop(request: Request, stop_id: int, all_entries: bool = False):
+    """Admin endpoint to remove a Stop from the local caches; with all_entries=true, its Buses are removed too."""
+    check_admin_key(request)
+    return {"removed": invalidate_stop(stop_id, all_entries=all_entries)}
+
+
+@app.post("/admin/prime", include_in_schema=False)
+async def endpoint_admin_prime(
+        request: Request,
+        stops_ids: List[int] = Query(..., alias="stop_id"),
+        buses: bool = False,
+        get_all_buses: bool = False
+):
+    """Admin endpoint to get multiple Stops (stop_id is a repeatable param), and their Buses if buses=true,
+    through the getters chain, so they get cached. Returns the count of Stops/Buses found, not existing or failed."""
+    check_admin_key(request)
+    return await prime_stops(stops_ids, buses=buses, get_all_buses=get_all_buses)
+
+
+@app.get("/buses", response_model=StopsBusesResults)
+async def endpoint_get_buses_multiple(
+        stops_ids: List[int] = Query(..., alias="stop_id"),
+        get_all_buses: bool = False
+):
+    """Endpoint to get the lists of Buses coming to multiple Stops on a single request, giving the Stop IDs
+    (stop_id is a repeatable param). Returns 400 if more than 'buses_batch_max_stops' different stops are given.
+    The result of each Stop is returned independently, in the same order as given. If the buses of a Stop could not
+    be fetched, the error (status code & detail) is returned for that Stop, instead of failing the whole request.
+    """
+    with logger.contextualize(**locals()):
+        if len(set(stops_ids)) > settings.buses_batch_max_stops:
+            raise HTTPException(status_code=400, detail=f"Too many stops given (max {settings.buses_batch_max_stops})")
+
+        for stop_id in set(stops_ids):
+            record_request(stop_id, get_all_buses)
+        results = list()
+        for stop_id, buses_result in (await get_buses_multiple(stops_ids, get_all_buses=get_all_buses)).items():
+            if isinstance(buses_result, Exception):
+                with logger.contextualize(stop_id=stop_id):
+                    status_code, detail = handle_exception_as_error(buses_result)
+                results.append({"stop_id": stop_id, "error": {"status_code": status_code, "detail": detail}})
+            else:
+                results.append({"stop_id": stop_id, "result": buses_result.dict()})
+
+        return json_response(results)
+
+
+def run():
+    """Run the API using Uvicorn
+    """
+    run_server()
+
+
 if __name__ == '__main__':
     run()
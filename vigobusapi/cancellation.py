@@ -0,0 +1,176 @@
+"""CANCELLATION
+Detection of clients disconnecting, and cooperative cancellation of the upstream fetches nobody waits for.
+- DisconnectMiddleware watches each HTTP request for the client disconnecting, setting the event kept on the
+  client_disconnected context variable (so it is visible to the endpoints and the getters).
+- SingleFlight runs a single fetch for concurrent requests of the same key (e.g. the Buses of a Stop), as a
+  background task that the requests wait for. When the last waiting request leaves (its client disconnected, or
+  it timed out), the fetch is flagged as cancelled.
+- Cancelled fetches stop on the next safe point (check_cancelled(): before calling a getter, performing an HTTP
+  request or requesting extra pages), so the responses already arriving are still parsed and saved on the caches.
+  The upstream requests performed by fetches that were cancelled are counted as wasted.
+- Other components can follow the upstream requests performed on their context with the upstream_request_hook
+  context variable (e.g. the prefetch, to charge them to its budget).
+"""
+
+# # Native # #
+import asyncio
+import contextvars
+from typing import Optional, Dict, Hashable, Callable, Awaitable
+
+# # Project # #
+from vigobusapi.exceptions import ClientDisconnected, FetchCancelled
+from vigobusapi.metrics import FETCHES_ABANDONED, UPSTREAM_WASTED_REQUESTS
+from vigobusapi.logger import logger
+
+__all__ = (
+    "DisconnectMiddleware", "SingleFlight", "client_disconnected", "upstream_request_hook",
+    "check_cancelled", "record_upstream_request"
+)
+
+client_disconnected = contextvars.ContextVar("client_disconnected", default=None)
+"""Event set when the client of the current request disconnects; None if not serving a request"""
+
+upstream_request_hook = contextvars.ContextVar("upstream_request_hook", default=None)
+"""Function (without args) called on each upstream request performed by the current context (including the fetches
+started from it); None if not set"""
+
+current_fetch = contextvars.ContextVar("current_fetch", default=None)
+"""Fetch being run by the current context (SingleFlight task); None if not running a fetch"""
+
+
+class DisconnectMiddleware:
+    """ASGI middleware that reads the messages received from the client on background, passing them to the app,
+    so the client disconnecting is detected while the app is still processing the request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        disconnected = asyncio.Event()
+        messages = asyncio.Queue()
+        response_complete = False
+
+        async def read_messages():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not response_complete:
+                        disconnected.set()
+                    return
+
+        async def app_receive():
+            if disconnected.is_set() and messages.empty():
+                return {"type": "http.disconnect"}
+            return await messages.get()
+
+        async def app_send(message):
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        token = client_disconnected.set(disconnected)
+        reader = asyncio.ensure_future(read_messages())
+        try:
+            await self.app(scope, app_receive, app_send)
+        finally:
+            reader.cancel()
+            client_disconnected.reset(token)
+
+
+class _Fetch:
+    __slots__ = ("key", "task", "waiters", "cancelled", "upstream_requests")
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.task: Optional[asyncio.Future] = None
+        self.waiters = 0
+        self.cancelled = False
+        self.upstream_requests = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._fetches: Dict[Hashable, _Fetch] = dict()
+
+    def __len__(self):
+        return len(self._fetches)
+
+    async def run(self, key: Hashable, fetcher: Callable[[], Awaitable]):
+        """Return the result of the fetch running for the given key, starting it with the given fetcher (async
+        function without args) if not running. The fetch runs on a copy of the context of the request starting it.
+        :raises: the exception raised by the fetch | exceptions.ClientDisconnected (the client of the current request
+                 disconnected while waiting)
+        """
+        fetch = self._fetches.get(key)
+        if fetch is None:
+            fetch = self._fetches[key] = _Fetch(key)
+            context = contextvars.copy_context()
+            context.run(current_fetch.set, fetch)
+            fetch.task = context.run(asyncio.ensure_future, self._run_fetch(fetch, fetcher))
+            # Abandoned fetches may end with an exception nobody retrieves
+            fetch.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        else:
+            # A request joining a fetch flagged as cancelled (but still running) resumes it
+            fetch.cancelled = False
+
+        fetch.waiters += 1
+        try:
+            return await _wait_fetch(fetch.task)
+        finally:
+            fetch.waiters -= 1
+            if fetch.waiters == 0 and not fetch.task.done():
+                fetch.cancelled = True
+                logger.debug("No requests waiting for the fetch, cancelling it")
+
+    async def _run_fetch(self, fetch: _Fetch, fetcher: Callable[[], Awaitable]):
+        try:
+            return await fetcher()
+        finally:
+            if self._fetches.get(fetch.key) is fetch:
+                del self._fetches[fetch.key]
+            if fetch.cancelled:
+                FETCHES_ABANDONED.inc()
+                UPSTREAM_WASTED_REQUESTS.inc(fetch.upstream_requests)
+
+
+async def _wait_fetch(task: asyncio.Future):
+    """Wait for the given fetch task without cancelling it if the waiter is cancelled (like asyncio.shield), and
+    stop waiting if the client of the current request disconnects."""
+    disconnected: Optional[asyncio.Event] = client_disconnected.get()
+    if disconnected is None:
+        return await asyncio.shield(task)
+
+    disconnected_waiter = asyncio.ensure_future(disconnected.wait())
+    try:
+        await asyncio.wait((task, disconnected_waiter), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnected_waiter.cancel()
+
+    if task.done():
+        return task.result()
+    logger.info("Client disconnected while waiting for the fetch")
+    raise ClientDisconnected()
+
+
+def check_cancelled():
+    """Safe point of a fetch: raise FetchCancelled if the fetch run by the current context was cancelled."""
+    fetch: Optional[_Fetch] = current_fetch.get()
+    if fetch is not None and fetch.cancelled:
+        raise FetchCancelled()
+
+
+def record_upstream_request():
+    """Count an upstream request (to an external data source, not to other nodes of the API) performed by the fetch
+    run by the current context (if any), and call the upstream_request_hook (if set)."""
+    fetch: Optional[_Fetch] = current_fetch.get()
+    if fetch is not None:
+        fetch.upstream_requests += 1
+
+    hook: Optional[Callable[[], None]] = upstream_request_hook.get()
+    if hook is not None:
+        hook()
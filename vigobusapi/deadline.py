@@ -0,0 +1,59 @@
+"""DEADLINE
+Per-request deadline, shared by all the getters and HTTP requests performed while serving a request.
+The deadline is kept on a context variable, so it is propagated to the tasks started within the request.
+"""
+
+# # Native # #
+import time
+import contextlib
+import contextvars
+from typing import Optional
+
+# # Project # #
+from vigobusapi.exceptions import DeadlineExceeded
+
+__all__ = ("start_deadline", "get_remaining_time", "clamp_timeout", "has_time_for")
+
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+"""Deadline of the current context (request), as time.monotonic() value; None if there is no deadline"""
+
+
+@contextlib.contextmanager
+def start_deadline(timeout: float):
+    """Context manager that sets a deadline for the code within it, after the given timeout (seconds).
+    If a deadline was already set and is sooner, it is kept."""
+    deadline = time.monotonic() + timeout
+    current = current_deadline.get()
+    token = current_deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        current_deadline.reset(token)
+
+
+def get_remaining_time() -> Optional[float]:
+    """Return the seconds left until the deadline of the current context (negative if exceeded),
+    or None if there is no deadline."""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def clamp_timeout(timeout: float) -> float:
+    """Return the given timeout, limited to the time left until the deadline of the current context.
+    :raises: exceptions.DeadlineExceeded (if the deadline is exceeded)
+    """
+    remaining = get_remaining_time()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    return min(timeout, remaining)
+
+
+def has_time_for(duration: float) -> bool:
+    """Return True if there is time left for an operation taking the given duration (seconds) before the deadline
+    of the current context (or there is no deadline)."""
+    remaining = get_remaining_time()
+    return remaining is None or remaining >= duration
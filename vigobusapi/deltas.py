@@ -0,0 +1,116 @@
+"""DELTAS
+Delta responses of the Buses of a Stop, for clients polling them frequently.
+Each version of the Buses is identified by a hash of their content (the same used for the ETag). The Buses of the
+versions returned to the clients are remembered for a while, so when a client sends the version it has, only the
+Buses added, changed and removed since that version are returned (or just "unchanged" if the version is the current).
+"""
+
+# # Native # #
+from collections import Counter
+from typing import Optional, Dict, Iterable, Tuple
+
+# # Installed # #
+from cachetools import TTLCache, LRUCache
+
+# # Project # #
+from vigobusapi.entities import Bus, BusesResponse
+from vigobusapi.responses import get_content_hash
+from vigobusapi.settings import settings
+from vigobusapi.metrics import BUSES_DELTAS
+
+__all__ = ("get_buses_delta", "get_keyed_buses")
+
+KeyedBuses = Dict[str, Bus]
+
+buses_versions = TTLCache(maxsize=settings.buses_versions_maxsize, ttl=settings.buses_versions_ttl)
+"""Buses of the versions returned to the clients. Key: tuple (Stop ID, get_all_buses, version).
+Value: dict of Buses by their key (see get_keyed_buses())"""
+
+deltas_memo = LRUCache(maxsize=settings.buses_versions_maxsize)
+"""Deltas already computed, shared by the clients polling the same Stop. Key: tuple (Stop ID, get_all_buses,
+base version, version). Value: BusesDelta content, without the source"""
+
+
+def get_keyed_buses(buses: Iterable[Bus]) -> KeyedBuses:
+    """Return the given Buses by their key: "<bus_id>:<occurrence of the bus_id on the list>"."""
+    occurrences = Counter()
+    keyed_buses = dict()
+    for bus in buses:
+        keyed_buses[f"{bus.bus_id}:{occurrences[bus.bus_id]}"] = bus
+        occurrences[bus.bus_id] += 1
+    return keyed_buses
+
+
+def _get_delta_bus(key: str, bus: Bus) -> dict:
+    return {**bus.dict(), "key": key}
+
+
+def _diff_buses(base_buses: KeyedBuses, buses: KeyedBuses) -> Tuple[list, list, list]:
+    """Return the Buses added and changed (as DeltaBus contents) and the keys of the Buses removed."""
+    added, changed = list(), list()
+    for key, bus in buses.items():
+        base_bus = base_buses.get(key)
+        if base_bus is None:
+            added.append(_get_delta_bus(key, bus))
+        elif base_bus != bus:
+            changed.append(_get_delta_bus(key, bus))
+
+    removed = [key for key in base_buses if key not in buses]
+    return added, changed, removed
+
+
+def _add_age(delta: dict, buses_result: BusesResponse):
+    if buses_result.age is not None:
+        delta["age"] = buses_result.age
+
+
+def get_buses_delta(stop_id: int, get_all_buses: bool, buses_result: BusesResponse, since: Optional[str]) -> dict:
+    """Return the content of a BusesDelta with the changes of the given Buses of a Stop since the given version.
+    If the version is not given, or it is not remembered anymore, all the Buses are returned as added.
+    :param stop_id: Stop ID
+    :param get_all_buses: if the Buses are the full list of Buses of the Stop
+    :param buses_result: the current Buses of the Stop
+    :param since: version of the Buses known by the client
+    """
+    version = get_content_hash(buses_result)
+    if since == version:
+        BUSES_DELTAS.labels("unchanged").inc()
+        return {"version": version, "unchanged": True}
+
+    version_key = (stop_id, get_all_buses, version)
+    keyed_buses = buses_versions.get(version_key)
+    if keyed_buses is None:
+        keyed_buses = buses_versions[version_key] = get_keyed_buses(buses_result.buses)
+
+    base_buses = buses_versions.get((stop_id, get_all_buses, since)) if since else None
+    if base_buses is None:
+        BUSES_DELTAS.labels("full").inc()
+        delta = {
+            "version": version,
+            "added": [_get_delta_bus(key, bus) for key, bus in keyed_buses.items()],
+            "changed": [],
+            "removed": [],
+            "more_buses_available": buses_result.more_buses_available
+        }
+        _add_age(delta, buses_result)
+
+    else:
+        BUSES_DELTAS.labels("delta").inc()
+        delta_key = (stop_id, get_all_buses, since, version)
+        delta = deltas_memo.get(delta_key)
+        if delta is None:
+            added, changed, removed = _diff_buses(base_buses, keyed_buses)
+            delta = deltas_memo[delta_key] = {
+                "version": version,
+                "base_version": since,
+                "added": added,
+                "changed": changed,
+                "removed": removed,
+                "more_buses_available": buses_result.more_buses_available
+            }
+            _add_age(delta, buses_result)
+
+    # The source is not part of the version, so it is not memoized with the delta
+    if buses_result.source is not None:
+        delta = {**delta, "source": buses_result.source}
+    return delta
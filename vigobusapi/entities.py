@@ -13,10 +13,15 @@ import pydantic
 # # Package # #
 from vigobusapi.exceptions import StopNotExist
 
-__all__ = ("Stop", "Stops", "OptionalStop", "StopOrNotExist", "Bus", "Buses", "BusesResponse")
+__all__ = (
+    "Stop", "Stops", "OptionalStop", "StopOrNotExist", "Bus", "Buses", "BusesResponse", "DeltaBus", "BusesDelta",
+    "StopBusesError", "StopBusesResult", "StopsBusesResults"
+)
 
 
 class BaseModel(pydantic.BaseModel):
+    __slots__ = ("__weakref__",)  # allow weak references to entities (used for memoizing their ETag)
+
     def dict(self, *args, skip_none=True, **kwargs):
         # if kwargs.get("skip_defaults") is None:
         #     kwargs["skip_defaults"] = True
@@ -45,6 +50,44 @@ class BusesResponse(BaseModel):
     buses: List[Bus]
     more_buses_available: bool
     source: Optional[str]
+    age: Optional[int]
+    """Seconds since the buses were fetched, only set when the buses are extrapolated from the last known buses
+    (because they could not be fetched from any source)"""
+
+
+class DeltaBus(Bus):
+    key: str
+    """Identifier of the Bus on the deltas: its bus_id and the occurrence of the bus_id on the list of Buses, since
+    the same line & route can arrive more than once (e.g. "<bus_id>:0", "<bus_id>:1")"""
+
+
+class BusesDelta(BaseModel):
+    """Changes on the Buses of a Stop since a previous version of them, known by the client.
+    If the client version is the current one, only 'version' and 'unchanged' are returned.
+    If the client version is unknown (or not given), 'base_version' is not returned, and all the Buses are returned
+    as 'added' (the client must discard the Buses it had)."""
+    version: str
+    base_version: Optional[str]
+    unchanged: Optional[bool]
+    added: Optional[List[DeltaBus]]
+    changed: Optional[List[DeltaBus]]
+    removed: Optional[List[str]]
+    more_buses_available: Optional[bool]
+    source: Optional[str]
+    age: Optional[int]
+
+
+class StopBusesError(BaseModel):
+    status_code: int
+    detail: str
+
+
+class StopBusesResult(BaseModel):
+    """Result of getting the buses of one Stop, as part of a request for multiple Stops.
+    Only one of 'result' (if the buses were fetched) or 'error' (if not) is returned."""
+    stop_id: int
+    result: Optional[BusesResponse]
+    error: Optional[StopBusesError]
 
 
 class Stop(BaseModel):
@@ -74,7 +117,7 @@ class Stop(BaseModel):
         d = self.dict()
         d["_id"] = d.pop("stop_id")
         # Remove source field
-        d.pop("source")
+        d.pop("source", None)
         return d
 
 
@@ -82,3 +125,4 @@ OptionalStop = Optional[Stop]
 StopOrNotExist = Union[Stop, StopNotExist]
 Stops = List[Stop]
 Buses = List[Bus]
+StopsBusesResults = List[StopBusesResult]
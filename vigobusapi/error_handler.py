@@ -3,7 +3,10 @@ Handle exceptions occurred on endpoints
 """
 
 # # Native # #
+import json
+import math
 import asyncio
+from typing import Tuple
 
 # # Installed # #
 from fastapi import status as statuscode
@@ -13,9 +16,10 @@ from requests_async import RequestException, Timeout
 # # Package # #
 from vigobusapi.exceptions import *
 from vigobusapi.vigobus_getters.exceptions import *
+from vigobusapi.settings import settings
 from vigobusapi.logger import logger
 
-__all__ = ("handle_exception",)
+__all__ = ("handle_exception", "handle_exception_as_error", "get_exception_response")
 
 
 class Responses:
@@ -39,33 +43,68 @@ class Responses:
         status_code=statuscode.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "Unknown internal error"}
     )
+    service_overloaded = JSONResponse(
+        status_code=statuscode.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Service overloaded, try again later"},
+        headers={"Retry-After": str(settings.admission_retry_after)}
+    )
+    client_disconnected = JSONResponse(
+        status_code=499,
+        content={"detail": "Client closed request"}
+    )
+    client_rate_limited = JSONResponse(
+        status_code=statuscode.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Too many requests"},
+        headers={
+            "Retry-After": str(math.ceil(1 / settings.admission_client_rate) if settings.admission_client_rate else 1)
+        }
+    )
 
 
 EXCEPTIONS_RESPONSES = {
     StopNotExist: Responses.stop_not_exists,
     Timeout: Responses.external_source_timeout,
     asyncio.TimeoutError: Responses.external_source_timeout,
+    DeadlineExceeded: Responses.external_source_timeout,
     RequestException: Responses.external_source_error,
-    ParseError: Responses.parsing_error
+    ParseError: Responses.parsing_error,
+    ServiceOverloaded: Responses.service_overloaded,
+    ClientRateLimited: Responses.client_rate_limited,
+    ClientDisconnected: Responses.client_disconnected
 }
 """Relation between exceptions and the response to return. Exception class inheritance is supported"""
 
-EXCEPTIONS_NO_ERROR_LOG = (StopNotExist, Timeout, asyncio.TimeoutError)
+EXCEPTIONS_NO_ERROR_LOG = (
+    StopNotExist, Timeout, asyncio.TimeoutError, DeadlineExceeded, ServiceOverloaded, ClientRateLimited,
+    ClientDisconnected
+)
 """Exceptions that will not log an error"""
 
 
-def handle_exception(exception):
+def get_exception_response(exception) -> JSONResponse:
+    """Return the response that corresponds to the given exception, without logging it."""
     try:
-        response = next(
+        return next(
             response for exception_iter, response in EXCEPTIONS_RESPONSES.items()
             if isinstance(exception, exception_iter)
         )
     except StopIteration:
-        response = Responses.generic_error
+        return Responses.generic_error
+
+
+def handle_exception(exception):
+    response = get_exception_response(exception)
 
     try:
         next(exception_iter for exception_iter in EXCEPTIONS_NO_ERROR_LOG if isinstance(exception, exception_iter))
     except StopIteration:
-        logger.exception("Error on request")
+        logger.opt(exception=exception).error("Error on request")
 
     return response
+
+
+def handle_exception_as_error(exception) -> Tuple[int, str]:
+    """Like handle_exception(), but return the status code and detail message of the response, instead of the response.
+    Used for returning errors as part of the response content."""
+    response = handle_exception(exception)
+    return response.status_code, json.loads(response.body)["detail"]
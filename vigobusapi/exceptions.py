@@ -2,7 +2,8 @@
 Exceptions used on the project
 """
 
-__all__ = ("VigoBusAPIException", "StopNotExist", "StopNotFound")
+__all__ = ("VigoBusAPIException", "StopNotExist", "StopNotFound", "ServiceOverloaded", "ClientRateLimited",
+           "DeadlineExceeded", "ClientDisconnected", "FetchCancelled")
 
 
 class VigoBusAPIException(Exception):
@@ -18,3 +19,29 @@ class StopNotExist(VigoBusAPIException):
 class StopNotFound(VigoBusAPIException):
     """The Stop was not found on a local data source, but might physically exist"""
     pass
+
+
+class ServiceOverloaded(VigoBusAPIException):
+    """The request was rejected because too many requests of its class are being processed, and the request could not
+    be admitted in the max queue time"""
+    pass
+
+
+class ClientRateLimited(VigoBusAPIException):
+    """The request was rejected because the client exceeded its requests rate limit"""
+    pass
+
+
+class DeadlineExceeded(VigoBusAPIException):
+    """The deadline of the request was exceeded (or there is not enough time left to perform an operation)"""
+    pass
+
+
+class ClientDisconnected(VigoBusAPIException):
+    """The client of the request disconnected before the response was ready"""
+    pass
+
+
+class FetchCancelled(VigoBusAPIException):
+    """The fetch was cancelled because no request is waiting for its result anymore"""
+    pass
@@ -4,6 +4,9 @@ Logger instance
 
 # # Native # #
 import sys
+import random
+import contextvars
+from typing import TextIO
 
 # # Installed # #
 from loguru import logger
@@ -11,13 +14,58 @@ from loguru import logger
 # # Project # #
 from vigobusapi.settings import settings
 
-__all__ = ("logger",)
+__all__ = ("logger", "lazy_bind", "sample_request_debug", "configure_logger")
 
 LoggerFormat = "<green>{time:YY-MM-DD HH:mm:ss}</green> | " \
                "<level>{level}</level> | " \
                "{function}: <level>{message}</level> | " \
                "{extra} {exception}"
 
+DEBUG_LEVEL_NO = logger.level("DEBUG").no
+
+debug_sampled = contextvars.ContextVar("debug_sampled", default=True)
+"""If False, the debug records logged within the current context (request) are discarded"""
+
+
+def sample_request_debug() -> bool:
+    """Decide if the debug records of the current request will be logged, according to the 'log_debug_sample_rate'
+    setting. Must be called at the beginning of each request. Return the decision."""
+    sampled = random.random() < settings.log_debug_sample_rate
+    debug_sampled.set(sampled)
+    return sampled
+
+
+def _is_sampled(record: dict) -> bool:
+    """Return False if the record is a debug (or lower) record logged within a request not sampled for debug."""
+    return record["level"].no > DEBUG_LEVEL_NO or debug_sampled.get()
+
+
+def lazy_bind(**extra):
+    """Return the logger with the given extra fields bound to the record logged with it.
+    Values given as callables are called to obtain the actual value, but only if the record will be emitted:
+    loguru discards records below the minimum level before applying the patch, and records not sampled are skipped.
+    Use it for payloads that are expensive to compute (e.g. response bodies or dicts of whole entities).
+    """
+    def _patcher(record: dict):
+        if _is_sampled(record):
+            record["extra"].update({k: v() if callable(v) else v for k, v in extra.items()})
+
+    return logger.patch(_patcher)
+
+
+def configure_logger(sink: TextIO = sys.stderr):
+    """Set the custom logger sink. If the 'log_enqueue' setting is enabled, records are written to the sink
+    from a background thread, so the event loop does not block on the writes.
+    """
+    logger.remove()
+    logger.add(
+        sink,
+        level=settings.log_level.upper(),
+        format=LoggerFormat,
+        filter=_is_sampled if settings.log_debug_sample_rate < 1 else None,
+        enqueue=settings.log_enqueue
+    )
+
+
 # Set custom logger
-logger.remove()
-logger.add(sys.stderr, level=settings.log_level.upper(), format=LoggerFormat)
+configure_logger()
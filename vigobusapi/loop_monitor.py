@@ -0,0 +1,182 @@
+"""LOOP MONITOR
+Background task that periodically measures the event loop lag: how late a sleep scheduled on the loop wakes up.
+A high lag means that the loop is busy (or blocked) running other code, delaying all the requests being served.
+The blocking detector finds the callbacks that block the loop for longer than a threshold, logging where they were
+blocked (stack captured by a watchdog thread while the loop is blocked) and the context of the request that ran them.
+"""
+
+# # Native # #
+import sys
+import time
+import signal
+import asyncio
+import threading
+import traceback
+import contextvars
+from asyncio.events import Handle
+from typing import Optional, Tuple
+
+# # Project # #
+from vigobusapi.metrics import LOOP_LAG, LOOP_LAG_LAST, LOOP_BLOCKING_CALLS, LOOP_BLOCKING_ENABLED
+from vigobusapi.settings import settings
+from vigobusapi.logger import logger
+
+__all__ = (
+    "start_loop_monitor", "stop_loop_monitor",
+    "enable_blocking_detector", "disable_blocking_detector", "toggle_blocking_detector", "is_blocking_detector_enabled"
+)
+
+_task: Optional[asyncio.Future] = None
+
+_original_handle_run = Handle._run
+_blocking_threshold: Optional[float] = None
+"""Threshold (seconds) of the blocking detector, or None if disabled"""
+_watchdog_stop: Optional[threading.Event] = None
+_callback_start: Optional[float] = None
+"""Time when the callback being run on the loop started, or None if the loop is not running a callback"""
+_blocked_stack: Optional[Tuple[float, str]] = None
+"""Stack of the last blocked callback, captured by the watchdog: tuple (callback start time, formatted stack)"""
+
+
+async def _monitor_loop_lag():
+    interval = settings.metrics_loop_lag_interval
+    while True:
+        expected_time = time.monotonic() + interval
+        await asyncio.sleep(interval)
+        lag = max(time.monotonic() - expected_time, 0)
+        LOOP_LAG.observe(lag)
+        LOOP_LAG_LAST.set(lag)
+
+
+def _format_stack(frame) -> str:
+    """Format the stack of the given frame, skipping the frames of the loop up to the callback being run."""
+    stack = traceback.extract_stack(frame)
+    for i in range(len(stack) - 1, -1, -1):
+        if stack[i].name == _run_handle.__name__ and stack[i].filename == __file__:
+            stack = stack[i + 2:]  # skip the original Handle._run too
+            break
+    return "".join(traceback.format_list(stack))
+
+
+def _watch_loop(threshold: float, stop: threading.Event, loop_thread_id: int):
+    """Watchdog thread: captures the stack of the loop thread while a callback is running for longer than threshold"""
+    global _blocked_stack
+    while not stop.wait(threshold / 4):
+        start = _callback_start
+        if start is None or time.monotonic() - start < threshold:
+            continue
+        if _blocked_stack is not None and _blocked_stack[0] == start:
+            continue  # already captured
+
+        frame = sys._current_frames().get(loop_thread_id)
+        if frame is not None:
+            _blocked_stack = (start, _format_stack(frame))
+
+
+def _report_blocking(context: contextvars.Context, start: float, duration: float):
+    stack = _blocked_stack[1] if _blocked_stack is not None and _blocked_stack[0] == start else None
+    LOOP_BLOCKING_CALLS.observe(duration)
+
+    # Log from the context of the callback, so the record includes its logger context (e.g. the request_id)
+    context.run(
+        logger.bind(blocking_duration=round(duration, 4), blocking_stack=stack).warning,
+        f"Event loop blocked for {round(duration * 1000)}ms by a callback"
+    )
+
+
+def _run_handle(handle: Handle):
+    """Replacement of asyncio Handle._run while the blocking detector is enabled, measuring each callback."""
+    global _callback_start
+    # The callback may change its context (e.g. leaving a logger.contextualize block), so a copy is kept
+    context = handle._context.copy()
+    start = _callback_start = time.monotonic()
+    try:
+        _original_handle_run(handle)
+    finally:
+        _callback_start = None
+        duration = time.monotonic() - start
+        threshold = _blocking_threshold
+        if threshold is not None and duration >= threshold:
+            _report_blocking(context, start, duration)
+
+
+def is_blocking_detector_enabled() -> bool:
+    return _blocking_threshold is not None
+
+
+def enable_blocking_detector(threshold: Optional[float] = None):
+    """Enable the blocking detector, reporting the callbacks that run for longer than the given threshold (seconds)
+    (by default, the 'metrics_blocking_threshold' setting). Must be called from the event loop.
+    Only supported on asyncio loops (not on uvloop)."""
+    global _blocking_threshold, _watchdog_stop
+    if is_blocking_detector_enabled():
+        return
+    if not isinstance(asyncio.get_event_loop(), asyncio.BaseEventLoop):
+        logger.warning("The blocking detector is not supported on the current event loop (requires api_loop=asyncio)")
+        return
+
+    _blocking_threshold = threshold or settings.metrics_blocking_threshold
+    _watchdog_stop = threading.Event()
+    threading.Thread(
+        target=_watch_loop,
+        args=(_blocking_threshold, _watchdog_stop, threading.get_ident()),
+        name="blocking_detector",
+        daemon=True
+    ).start()
+    Handle._run = _run_handle
+
+    LOOP_BLOCKING_ENABLED.set(1)
+    logger.bind(blocking_threshold=_blocking_threshold).info("Blocking detector enabled")
+
+
+def disable_blocking_detector():
+    global _blocking_threshold, _watchdog_stop, _blocked_stack
+    if not is_blocking_detector_enabled():
+        return
+
+    Handle._run = _original_handle_run
+    _watchdog_stop.set()
+    _blocking_threshold = _watchdog_stop = _blocked_stack = None
+
+    LOOP_BLOCKING_ENABLED.set(0)
+    logger.info("Blocking detector disabled")
+
+
+def toggle_blocking_detector():
+    """Enable the blocking detector if disabled, or disable it if enabled. Runs on SIGUSR1."""
+    if is_blocking_detector_enabled():
+        disable_blocking_detector()
+    else:
+        enable_blocking_detector()
+
+
+def start_loop_monitor():
+    """Start the loop monitor task, if enabled (metrics_loop_lag_interval > 0) and not running,
+    and the blocking detector, if enabled (metrics_blocking_detector).
+    The blocking detector can be toggled at runtime by sending SIGUSR1 to the worker process.
+    Must be called from the event loop."""
+    global _task
+    loop = asyncio.get_event_loop()
+    if hasattr(signal, "SIGUSR1"):
+        loop.add_signal_handler(signal.SIGUSR1, toggle_blocking_detector)
+    LOOP_BLOCKING_ENABLED.set(0)
+    if settings.metrics_blocking_detector:
+        enable_blocking_detector()
+
+    if _task is not None or settings.metrics_loop_lag_interval <= 0:
+        return
+
+    # Run on an empty context, not inheriting the context of the caller
+    _task = contextvars.Context().run(asyncio.ensure_future, _monitor_loop_lag())
+    logger.debug("Loop monitor started")
+
+
+def stop_loop_monitor():
+    global _task
+    disable_blocking_detector()
+    if hasattr(signal, "SIGUSR1"):
+        asyncio.get_event_loop().remove_signal_handler(signal.SIGUSR1)
+
+    if _task is not None:
+        _task.cancel()
+        _task = None
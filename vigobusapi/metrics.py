@@ -0,0 +1,373 @@
+"""METRICS
+Runtime metrics of the API, exposed on the /metrics endpoint using the Prometheus text exposition format.
+Metrics are kept in-process on plain dicts, updated by the instrumented code (request handler, getters, caches,
+HTTP requester, Mongo...). Values that are already tracked elsewhere (cache sizes, subscriptions, admission stats)
+are not duplicated, but read when the metrics are rendered, through the registered collect hooks.
+"""
+
+# # Native # #
+import abc
+import time
+import bisect
+import contextlib
+from typing import Callable, Dict, List, Tuple, Sequence, Iterator
+
+__all__ = (
+    "CONTENT_TYPE", "Counter", "Gauge", "Histogram", "time_histogram", "add_collect_hook", "render_metrics",
+    "REQUEST_DURATION", "GETTER_DURATION",
+    "CACHE_LOOKUPS", "CACHE_EVICTIONS", "CACHE_EXPIRATIONS", "CACHE_ITEMS", "CACHE_BYTES",
+    "UPSTREAM_REQUEST_DURATION", "UPSTREAM_RESPONSES", "UPSTREAM_RETRIES", "HTML_PAGES_FETCHED", "PARSE_MEMO_LOOKUPS",
+    "FETCHES_ABANDONED", "UPSTREAM_WASTED_REQUESTS", "BUSES_DELTAS",
+    "MONGO_OPERATION_DURATION", "LOOP_LAG", "LOOP_LAG_LAST", "LOOP_BLOCKING_CALLS", "LOOP_BLOCKING_ENABLED",
+    "LIVE_POLLERS", "LIVE_SUBSCRIBERS",
+    "ADMISSION_IN_FLIGHT", "ADMISSION_QUEUED", "ADMISSION_REQUESTS", "CLIENTS_RATE_LIMITED",
+    "PREFETCH_REQUESTS", "PREFETCH_TRACKED_STOPS"
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+"""Content type of the rendered metrics (the charset is added by the Response)"""
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+"""Default buckets (seconds) for latency histograms"""
+
+LabelsValues = Tuple[str, ...]
+
+_metrics: List["_Metric"] = list()
+"""Registered metrics, in the order they are rendered"""
+
+_collect_hooks: List[Callable[[], None]] = list()
+"""Functions called before rendering the metrics, to update the metrics whose values are read from other modules"""
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str]) -> str:
+    if not labelnames:
+        return ""
+    labels = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(labelnames, labelvalues)
+    )
+    return "{" + labels + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(abc.ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelsValues, object] = dict()
+        _metrics.append(self)
+
+    @abc.abstractmethod
+    def _new_child(self):
+        pass
+
+    def labels(self, *labelvalues):
+        """Return the child metric for the given label values (given in the same order as the labelnames).
+        Children are created when first used."""
+        child = self._children.get(labelvalues)
+        if child is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"Metric {self.name} requires the labels {self.labelnames}")
+            child = self._children[labelvalues] = self._new_child()
+        return child
+
+    def clear(self):
+        self._children.clear()
+
+    @abc.abstractmethod
+    def _render_samples(self) -> Iterator[str]:
+        pass
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        yield from self._render_samples()
+
+
+class _Value:
+    """Value of a Counter or Gauge. Counters can be set() too, when their value is read from another counter."""
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        """Increment a counter without labels"""
+        self.labels().inc(amount)
+
+    def _render_samples(self):
+        for labelvalues, child in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(child.value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float):
+        """Set the value of a gauge without labels"""
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last item is the +Inf bucket
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        # Counts are kept per bucket (not cumulative), and accumulated when rendered
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name=name, documentation=documentation, labelnames=labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        """Observe a value on a histogram without labels"""
+        self.labels().observe(value)
+
+    def _render_samples(self):
+        labelnames = self.labelnames + ("le",)
+        for labelvalues, child in self._children.items():
+            accumulated = 0
+            for bucket, count in zip(self.buckets + (float("inf"),), child.counts):
+                accumulated += count
+                labels = _format_labels(labelnames, labelvalues + (_format_value(bucket),))
+                yield f"{self.name}_bucket{labels} {accumulated}"
+
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {accumulated}"
+
+
+@contextlib.contextmanager
+def time_histogram(histogram: Histogram, *labelvalues):
+    """Context manager that observes the seconds elapsed within it on the given histogram, with the given labels.
+    The time is observed even if an exception is raised."""
+    child = histogram.labels(*labelvalues)
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        child.observe(time.perf_counter() - start_time)
+
+
+def add_collect_hook(hook: Callable[[], None]):
+    """Register a function to be called before rendering the metrics."""
+    _collect_hooks.append(hook)
+
+
+def render_metrics() -> str:
+    """Run the collect hooks and return all the metrics in the Prometheus text exposition format."""
+    for hook in _collect_hooks:
+        hook()
+
+    lines = list()
+    for metric in _metrics:
+        lines.extend(metric.render())
+    lines.append("")
+    return "\n".join(lines)
+
+
+# # Metrics definitions # #
+
+REQUEST_DURATION = Histogram(
+    "vigobusapi_request_duration_seconds",
+    "Time to process the requests, by endpoint and response status code",
+    labelnames=("endpoint", "status_code")
+)
+
+GETTER_DURATION = Histogram(
+    "vigobusapi_getter_duration_seconds",
+    "Time spent on each Stop/Buses getter, by getter (source) name and result",
+    labelnames=("entity", "getter", "result")
+)
+
+CACHE_LOOKUPS = Counter(
+    "vigobusapi_cache_lookups_total",
+    "Lookups on the local caches, by cache and result (hit/miss)",
+    labelnames=("cache", "result")
+)
+
+CACHE_EVICTIONS = Counter(
+    "vigobusapi_cache_evictions_total",
+    "Items evicted from the local caches before expiring, due to the cache being full",
+    labelnames=("cache",)
+)
+
+CACHE_EXPIRATIONS = Counter(
+    "vigobusapi_cache_expirations_total",
+    "Items removed from the local caches due to their TTL expiring",
+    labelnames=("cache",)
+)
+
+CACHE_ITEMS = Gauge(
+    "vigobusapi_cache_items",
+    "Items currently stored on the local caches",
+    labelnames=("cache",)
+)
+
+CACHE_BYTES = Gauge(
+    "vigobusapi_cache_bytes",
+    "Approximate memory used by the items currently stored on the local caches",
+    labelnames=("cache",)
+)
+
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "vigobusapi_upstream_request_duration_seconds",
+    "Time of each HTTP request attempt to the external data sources, by host",
+    labelnames=("host",)
+)
+
+UPSTREAM_RESPONSES = Counter(
+    "vigobusapi_upstream_responses_total",
+    "HTTP request attempts to the external data sources, by host and status code ('error' if no response received)",
+    labelnames=("host", "status_code")
+)
+
+UPSTREAM_RETRIES = Counter(
+    "vigobusapi_upstream_retries_total",
+    "HTTP requests to the external data sources retried after a failed attempt, by host",
+    labelnames=("host",)
+)
+
+HTML_PAGES_FETCHED = Histogram(
+    "vigobusapi_html_pages_fetched",
+    "HTML pages fetched for each request of Buses to the HTML data source",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10)
+)
+
+FETCHES_ABANDONED = Counter(
+    "vigobusapi_fetches_abandoned_total",
+    "Fetches of Buses from the external data sources cancelled because no request waited for them anymore "
+    "(their clients disconnected or timed out)"
+)
+
+UPSTREAM_WASTED_REQUESTS = Counter(
+    "vigobusapi_upstream_wasted_requests_total",
+    "Requests to the external data sources performed by fetches that were cancelled"
+)
+
+BUSES_DELTAS = Counter(
+    "vigobusapi_buses_deltas_total",
+    "Delta responses of Buses, by result (unchanged: the client had the current version; delta: changes since the "
+    "client version; full: the client version was unknown)",
+    labelnames=("result",)
+)
+
+PARSE_MEMO_LOOKUPS = Counter(
+    "vigobusapi_parse_memo_lookups_total",
+    "Lookups on the memo of parsed upstream responses, by data source and result (hit: same body as the last "
+    "response for the same Stop, so its parsing was skipped; miss)",
+    labelnames=("source", "result")
+)
+
+MONGO_OPERATION_DURATION = Histogram(
+    "vigobusapi_mongo_operation_duration_seconds",
+    "Time of the MongoDB operations, by operation",
+    labelnames=("operation",)
+)
+
+LOOP_LAG = Histogram(
+    "vigobusapi_event_loop_lag_seconds",
+    "Delay of the event loop to run a callback scheduled on time, measured periodically",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+LOOP_LAG_LAST = Gauge(
+    "vigobusapi_event_loop_lag_last_seconds",
+    "Last measured delay of the event loop"
+)
+
+LOOP_BLOCKING_CALLS = Histogram(
+    "vigobusapi_event_loop_blocking_calls_seconds",
+    "Duration of the callbacks that blocked the event loop longer than the blocking detector threshold",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+LOOP_BLOCKING_ENABLED = Gauge(
+    "vigobusapi_event_loop_blocking_detector_enabled",
+    "1 if the blocking detector is enabled, 0 if not"
+)
+
+LIVE_POLLERS = Gauge(
+    "vigobusapi_live_pollers",
+    "Running pollers of live Buses subscriptions (one per Stop watched)"
+)
+
+LIVE_SUBSCRIBERS = Gauge(
+    "vigobusapi_live_subscribers",
+    "Clients subscribed to live Buses"
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "vigobusapi_admission_in_flight",
+    "Admitted requests in flight, by class of request",
+    labelnames=("request_class",)
+)
+
+ADMISSION_QUEUED = Gauge(
+    "vigobusapi_admission_queued",
+    "Requests waiting to be admitted, by class of request",
+    labelnames=("request_class",)
+)
+
+ADMISSION_REQUESTS = Counter(
+    "vigobusapi_admission_requests_total",
+    "Requests admitted or rejected by the admission control, by class of request and result",
+    labelnames=("request_class", "result")
+)
+
+CLIENTS_RATE_LIMITED = Counter(
+    "vigobusapi_clients_rate_limited_total",
+    "Requests rejected due to client rate limits"
+)
+
+PREFETCH_REQUESTS = Counter(
+    "vigobusapi_prefetch_requests_total",
+    "Buses refreshes of popular Stops performed by the prefetch, or not performed (deferred due to requests waiting "
+    "for upstream, or over the budget), by result",
+    labelnames=("result",)
+)
+
+PREFETCH_TRACKED_STOPS = Gauge(
+    "vigobusapi_prefetch_tracked_stops",
+    "Stops whose popularity is tracked by the prefetch"
+)
@@ -0,0 +1,169 @@
+"""PREFETCH
+Background refresh of the Buses of the most requested Stops, so their requests are always served from the cache.
+The popularity of each Stop is tracked with a counter of requests decaying over time (exponentially, with the
+'prefetch_half_life' setting). Periodically, the Buses of the top 'prefetch_top_stops' Stops are fetched again when
+they are about to expire from the cache (or are not cached), limited to 'prefetch_budget' upstream requests per minute
+(each refresh can perform several upstream requests, like retries or extra pages; all of them are charged).
+The upstream requests are charged by fetch (see auto_getters.buses_fetches), to the refresh or request that started it:
+a refresh joining a fetch started by a request costs nothing (its token is refunded), while the requests joining a
+fetch started by a refresh do not cost anything to them, since the refresh is charged for the whole fetch.
+Prefetching has low priority: up to 'prefetch_concurrency' Stops are refreshed at the same time, and only while no
+requests are waiting to be admitted to query the external data sources.
+"""
+
+# # Native # #
+import math
+import time
+import heapq
+import asyncio
+import contextvars
+from typing import Dict, List, Tuple, Optional
+
+# # Project # #
+from vigobusapi.vigobus_getters import get_buses, cache, peers
+from vigobusapi.admission import TokenBucket, limiters, CLASS_UPSTREAM
+from vigobusapi.deadline import start_deadline
+from vigobusapi.cancellation import upstream_request_hook
+from vigobusapi.settings import settings
+from vigobusapi.metrics import add_collect_hook, PREFETCH_REQUESTS, PREFETCH_TRACKED_STOPS
+from vigobusapi.logger import logger
+
+__all__ = ("StopsPopularity", "popularity", "record_request", "start_prefetch", "stop_prefetch")
+
+PopularityKey = Tuple[int, bool]
+"""Key of the popularity counters: tuple (Stop ID, bool GetAllBuses?)"""
+
+
+class StopsPopularity:
+    """Counters of requests per Stop, decaying exponentially over time with the given half-life (seconds).
+    When more than max_size Stops are tracked, the least popular half of them are discarded."""
+
+    def __init__(self, half_life: float, max_size: int):
+        self.decay_rate = math.log(2) / half_life
+        self.max_size = max_size
+        self._counters: Dict[PopularityKey, Tuple[float, float]] = dict()
+        """Counters by key: tuple (score, time when the score was updated)"""
+
+    def _get_score(self, key: PopularityKey, now: float) -> float:
+        score, last_time = self._counters.get(key, (0, now))
+        return score * math.exp(-self.decay_rate * (now - last_time))
+
+    def record(self, stop_id: int, get_all_buses: bool):
+        now = time.monotonic()
+        key = (stop_id, get_all_buses)
+        self._counters[key] = (self._get_score(key, now) + 1, now)
+        if len(self._counters) > self.max_size:
+            for discarded_key in self.get_top(len(self._counters))[self.max_size // 2:]:
+                self._counters.pop(discarded_key)
+
+    def get_top(self, n: int) -> List[PopularityKey]:
+        """Return the keys of the n most popular Stops, by popularity descending."""
+        now = time.monotonic()
+        return heapq.nlargest(n, self._counters.keys(), key=lambda key: self._get_score(key, now))
+
+    def __len__(self):
+        return len(self._counters)
+
+
+popularity = StopsPopularity(half_life=settings.prefetch_half_life, max_size=settings.prefetch_max_tracked_stops)
+
+_task: Optional[asyncio.Future] = None
+
+
+def record_request(stop_id: int, get_all_buses: bool):
+    """Record a request for the Buses of a Stop. Must be called from the endpoints serving Buses to the clients."""
+    if settings.prefetch_top_stops > 0:
+        popularity.record(stop_id, get_all_buses)
+
+
+def _needs_refresh(stop_id: int, get_all_buses: bool) -> bool:
+    ttl = cache.get_buses_ttl(stop_id, get_all_buses)
+    if ttl is not None and ttl > settings.prefetch_margin:
+        return False
+    # On peer mode, the Stop is refreshed by its owner node
+    return not peers.is_peer_mode() or peers.get_owner_node(stop_id) == settings.peers_self.rstrip("/")
+
+
+async def _refresh(stop_id: int, get_all_buses: bool, budget: TokenBucket):
+    """Refresh the Buses of the Stop. A token of the budget must be consumed before, for the first upstream request
+    of the refresh; the next upstream requests are charged to the budget as they are performed. The token is refunded
+    if the refresh performed no upstream requests (e.g. it joined a fetch started by a request)."""
+    upstream_requests = 0
+
+    def _charge_upstream_request():
+        nonlocal upstream_requests
+        upstream_requests += 1
+        if upstream_requests > 1:
+            budget.charge()
+
+    # Each refresh runs on its own task, so the hook only applies to it and the fetch it starts (the fetch runs on a
+    #  copy of the context of the refresh, even if requests join it); not to the fetches it joins
+    upstream_request_hook.set(_charge_upstream_request)
+    with logger.contextualize(stop_id=stop_id, get_all_buses=get_all_buses, prefetch=True), \
+            start_deadline(settings.endpoint_timeout):
+        # noinspection PyBroadException
+        try:
+            await get_buses(stop_id, get_all_buses=get_all_buses, skip_caches=True)
+            PREFETCH_REQUESTS.labels("refreshed").inc()
+        except asyncio.CancelledError:
+            # Subclass of Exception on Python < 3.8: the prefetch is being stopped
+            raise
+        except Exception:
+            PREFETCH_REQUESTS.labels("error").inc()
+            logger.opt(exception=True).debug("Error prefetching buses")
+        finally:
+            if upstream_requests == 0:
+                budget.refund()
+
+
+async def _prefetch():
+    budget = TokenBucket(rate=settings.prefetch_budget / 60, burst=max(settings.prefetch_budget // 6, 1))
+    upstream_limiter = limiters[CLASS_UPSTREAM]
+    semaphore = asyncio.Semaphore(settings.prefetch_concurrency)
+
+    async def _refresh_limited(_stop_id: int, _get_all_buses: bool):
+        async with semaphore:
+            await _refresh(_stop_id, _get_all_buses, budget)
+
+    while True:
+        await asyncio.sleep(settings.prefetch_interval)
+        refreshes = list()
+        for stop_id, get_all_buses in popularity.get_top(settings.prefetch_top_stops):
+            if upstream_limiter.queued > 0:
+                # Requests waiting to query the external data sources have priority
+                PREFETCH_REQUESTS.labels("deferred").inc()
+                break
+            if not _needs_refresh(stop_id, get_all_buses):
+                continue
+            if not budget.consume():
+                PREFETCH_REQUESTS.labels("over_budget").inc()
+                break
+            refreshes.append(_refresh_limited(stop_id, get_all_buses))
+
+        await asyncio.gather(*refreshes)
+
+
+def start_prefetch():
+    """Start the prefetch task, if enabled (prefetch_top_stops > 0) and not running. Must be called from the event loop.
+    """
+    global _task
+    if _task is not None or settings.prefetch_top_stops <= 0:
+        return
+
+    # Run on an empty context, not inheriting the context of the caller
+    _task = contextvars.Context().run(asyncio.ensure_future, _prefetch())
+    logger.debug("Prefetch started")
+
+
+def stop_prefetch():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
+
+
+def _collect_metrics():
+    PREFETCH_TRACKED_STOPS.set(len(popularity))
+
+
+add_collect_hook(_collect_metrics)
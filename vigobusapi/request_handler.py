@@ -12,8 +12,19 @@ from fastapi import Request, Response
 
 # # Project # #
 from vigobusapi.error_handler import handle_exception
+from vigobusapi.admission import admit_request
 from vigobusapi.settings import settings
-from vigobusapi.logger import logger
+from vigobusapi.metrics import REQUEST_DURATION
+from vigobusapi.tracing import start_trace, span
+from vigobusapi.deadline import start_deadline
+from vigobusapi.logger import logger, sample_request_debug
+
+
+def _get_endpoint_name(request: Request) -> str:
+    """Return the name of the endpoint function that handled the request (set on the scope by the router),
+    or "none" if the request was not routed (not found, or rejected before reaching the router)."""
+    endpoint = request.scope.get("endpoint")
+    return endpoint.__name__ if endpoint is not None else "none"
 
 
 async def request_handler(request: Request, call_next):
@@ -23,21 +34,40 @@ async def request_handler(request: Request, call_next):
     if url.endswith("/favicon.ico"):
         return Response(status_code=404)
 
-    request_id = str(uuid4())
-    with logger.contextualize(request_id=request_id, url=url):
+    request_uuid = uuid4()
+    request_id = str(request_uuid)
+    with logger.contextualize(request_id=request_id, url=url), \
+            start_trace(request_uuid.hex, "request", method=request.method, path=request.url.path) as trace:
+        sample_request_debug()
         start_time = time.time()
+        limiter = None
+        response = None
 
         # noinspection PyBroadException
         try:
             logger.info("Request started")
-            return await asyncio.wait_for(
-                call_next(request),
-                timeout=settings.endpoint_timeout
-            )
+            with span("admission"):
+                limiter = await admit_request(request)
+            # The deadline is propagated to the getters, so they do not start operations that can not finish in time
+            with start_deadline(settings.endpoint_timeout):
+                response = await asyncio.wait_for(
+                    call_next(request),
+                    timeout=settings.endpoint_timeout
+                )
+            if trace is not None:
+                response.headers["Server-Timing"] = trace.get_server_timing()
+            return response
 
         except Exception as exception:
-            return handle_exception(exception)
+            response = handle_exception(exception)
+            return response
 
         finally:
+            if limiter is not None:
+                limiter.release()
             process_time = round(time.time() - start_time, ndigits=5)
             logger.bind(last_record=True, process_time=process_time).info(f"Request ended in {process_time} seconds")
+            REQUEST_DURATION.labels(
+                _get_endpoint_name(request),
+                str(response.status_code) if response is not None else "none"
+            ).observe(process_time)
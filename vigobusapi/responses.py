@@ -0,0 +1,111 @@
+"""RESPONSES
+Response classes and helpers used by the endpoints to return their data
+"""
+
+# # Native # #
+import hashlib
+import weakref
+from typing import Any, Callable, Optional, Dict
+
+# # Installed # #
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+# # Project # #
+from vigobusapi.entities import BaseModel
+from vigobusapi.settings import settings
+
+__all__ = ("FastJSONResponse", "json_response", "get_content_hash", "get_etag", "conditional_json_response")
+
+ETAG_EXCLUDED_FIELDS = {"source"}
+"""Fields of the entities not used for computing their ETag, since they do not change the semantics of the content"""
+
+_entities_hashes: Dict[int, str] = dict()
+"""Memoized content hashes of the entities, by their id(). Cached entities are reused, so their hash is only computed
+once. Entries are removed when the entities are garbage collected (entities are not hashable for a WeakKeyDictionary)"""
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that encodes the content using orjson instead of the stdlib json module.
+    The content must be already composed of JSON-compatible native types (e.g. the output of the entities dict()),
+    since no conversion is performed before encoding (datetimes are supported natively by orjson).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+def json_response(content: Any, response: Optional[Response] = None, headers: Optional[dict] = None) -> Any:
+    """Prepare the content returned by an endpoint. If the 'api_fast_json' setting is enabled,
+    the content is returned already encoded as a FastJSONResponse, so FastAPI will not validate it again
+    against the endpoint response_model (which is still used for the OpenAPI schema).
+    Otherwise, the content is returned as-is, to be validated & encoded by FastAPI.
+    :param content: content to return
+    :param response: the Response object injected by FastAPI on the endpoint; required if headers are given
+    :param headers: additional headers for the response
+    """
+    if settings.api_fast_json:
+        return FastJSONResponse(content=content, headers=headers)
+    if headers:
+        response.headers.update(headers)
+    return content
+
+
+def get_content_hash(entity: BaseModel) -> str:
+    """Return a hash of the content of the given entity (memoized, see get_etag())."""
+    entity_id = id(entity)
+    entity_hash = _entities_hashes.get(entity_id)
+    if entity_hash is None:
+        content = orjson.dumps(entity.dict(exclude=ETAG_EXCLUDED_FIELDS), option=orjson.OPT_SORT_KEYS)
+        entity_hash = _entities_hashes[entity_id] = hashlib.md5(content).hexdigest()
+        weakref.finalize(entity, _entities_hashes.pop, entity_id, None)
+    return entity_hash
+
+
+def get_etag(*entities: BaseModel) -> str:
+    """Return a weak ETag for the given entity or entities, computed as a hash of their content.
+    The hash of each entity is memoized, assuming that entities are not modified once returned by the getters."""
+    if len(entities) == 1:
+        digest = get_content_hash(entities[0])
+    else:
+        digest = hashlib.md5("".join(get_content_hash(entity) for entity in entities).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Return True if the given (weak) ETag matches any of the ETags on the If-None-Match request header."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque_tag = etag[2:]  # remove the W/ prefix: If-None-Match uses weak comparison
+    return any(tag.strip().replace("W/", "", 1) == opaque_tag for tag in if_none_match.split(","))
+
+
+def conditional_json_response(
+        request: Request,
+        response: Response,
+        etag: str,
+        max_age: Optional[float],
+        content_getter: Callable[[], Any]
+) -> Any:
+    """Prepare the content returned by an endpoint (like json_response()), with ETag and Cache-Control headers.
+    If the ETag matches the If-None-Match request header, return a 304 Not Modified response instead,
+    without building the content.
+    :param request: the Request object injected by FastAPI on the endpoint
+    :param response: the Response object injected by FastAPI on the endpoint
+    :param etag: ETag of the content (from get_etag())
+    :param max_age: seconds the content can be cached by clients (None or negative = 0)
+    :param content_getter: function that returns the content to return
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max(int(max_age or 0), 0)}"
+    }
+
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return json_response(content_getter(), response=response, headers=headers)
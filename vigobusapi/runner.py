@@ -0,0 +1,66 @@
+"""RUNNER
+Run the API server with Uvicorn, in a single process or with multiple worker processes, as set on the settings.
+With multiple workers, the socket is bound by the parent process (supervisor) and shared by the workers, each one
+running its own event loop and local caches. Sending SIGHUP to the supervisor restarts the workers one by one
+(graceful reload), while SIGINT/SIGTERM stop all of them gracefully.
+"""
+
+# # Native # #
+import os
+import asyncio
+
+# # Project # #
+from vigobusapi.vigobus_getters.cache import estimate_caches_max_memory
+from vigobusapi.settings import settings
+from vigobusapi.logger import logger
+
+__all__ = ("run_server", "log_worker_started")
+
+APP_IMPORT_STRING = "vigobusapi.app:app"
+"""The app must be given as import string to Uvicorn, for running it on workers processes or with reload"""
+
+
+def run_server():
+    """Run the API server with Uvicorn, using the settings for the server and the workers.
+    """
+    # Imported on first use (only needed when running the API server)
+    import uvicorn
+    from uvicorn.supervisors import ChangeReload
+    from vigobusapi.server import GracefulServer, WorkersSupervisor
+
+    config = uvicorn.Config(
+        APP_IMPORT_STRING,
+        host=settings.api_host,
+        port=settings.api_port,
+        log_level=settings.api_log_level,
+        workers=settings.api_workers,
+        loop=settings.api_loop,
+        http=settings.api_http,
+        reload=settings.api_reload
+    )
+    server = GracefulServer(config=config)
+    logger.bind(workers=config.workers, loop=config.loop, http=config.http).info("Running the app with uvicorn")
+
+    if config.should_reload:
+        sockets = [config.bind_socket()]
+        ChangeReload(config, target=server.run, sockets=sockets).run()
+    elif config.workers > 1:
+        sockets = [config.bind_socket()]
+        WorkersSupervisor(config, target=server.run, sockets=sockets).run()
+    else:
+        server.run()
+
+
+def log_worker_started():
+    """Log the worker process that started (on multi-worker mode, each worker calls it), including the event loop
+    in use, and the estimated memory that the local caches of the worker will use when full."""
+    caches_max_memory = estimate_caches_max_memory()
+    worker_caches_max_memory = sum(caches_max_memory.values())
+
+    logger.bind(
+        pid=os.getpid(),
+        workers=settings.api_workers,
+        loop=type(asyncio.get_event_loop()).__module__,
+        caches_max_memory=caches_max_memory,
+        workers_caches_max_memory=worker_caches_max_memory * settings.api_workers
+    ).info(f"Worker started; its local caches will use up to {round(worker_caches_max_memory / 1024 ** 2, 2)} MB")
@@ -0,0 +1,79 @@
+"""SERVER
+Uvicorn Server and workers supervisor used by the runner. Only imported when running the API server, so uvicorn is not
+loaded when importing the app (e.g. when served by other ASGI servers, or on the tests).
+"""
+
+# # Native # #
+import signal
+import asyncio
+
+# # Installed # #
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+from uvicorn.subprocess import get_subprocess
+
+# # Project # #
+from vigobusapi.subscriptions import close_subscriptions
+from vigobusapi.settings import settings
+from vigobusapi.logger import logger
+
+__all__ = ("GracefulServer", "WorkersSupervisor")
+
+
+class GracefulServer(uvicorn.Server):
+    """Uvicorn Server that, when shutting down, closes the live subscriptions (which otherwise would keep their
+    connections open forever), and forces the exit if connections or tasks are still running after the
+    'api_shutdown_timeout' setting."""
+
+    def _force_exit(self):
+        logger.warning("Shutdown timeout exceeded, forcing exit")
+        self.force_exit = True
+
+    async def shutdown(self, sockets=None):
+        close_subscriptions()
+        force_exit_handle = asyncio.get_event_loop().call_later(settings.api_shutdown_timeout, self._force_exit)
+        try:
+            await super().shutdown(sockets=sockets)
+        finally:
+            force_exit_handle.cancel()
+
+
+class WorkersSupervisor(Multiprocess):
+    """Uvicorn Multiprocess supervisor that restarts the workers one by one when receiving SIGHUP.
+    Each old worker is stopped (gracefully) after its replacement is started, so the socket is always being served."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.should_reload = False
+
+    def signal_handler(self, sig, frame):
+        if sig == getattr(signal, "SIGHUP", None):
+            self.should_reload = True
+        self.should_exit.set()
+
+    def reload_workers(self):
+        logger.info("Reloading workers")
+        for i, old_process in enumerate(self.processes):
+            process = get_subprocess(config=self.config, target=self.target, sockets=self.sockets)
+            process.start()
+            self.processes[i] = process
+
+            old_process.terminate()
+            old_process.join()
+            logger.bind(old_pid=old_process.pid, new_pid=process.pid).info("Worker reloaded")
+
+    def run(self):
+        self.startup()
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self.signal_handler)
+
+        while True:
+            self.should_exit.wait()
+            if not self.should_reload:
+                break
+
+            self.should_reload = False
+            self.should_exit.clear()
+            self.reload_workers()
+
+        self.shutdown()
@@ -1,2 +1,3 @@
 from .http_requester import http_request
 from .mongo import MongoDB
+from .parse_executor import run_parser, shutdown_parse_executor
@@ -5,13 +5,19 @@ Functions to perform HTTP requests
 # # Native # #
 import time
 from typing import *
+from urllib.parse import urlsplit
 
 # # Installed # #
 from requests_async import request, Response, RequestException
 
 # # Project # #
 from vigobusapi.settings import settings
-from vigobusapi.logger import logger
+from vigobusapi.exceptions import DeadlineExceeded
+from vigobusapi.deadline import clamp_timeout
+from vigobusapi.cancellation import check_cancelled, record_upstream_request
+from vigobusapi.metrics import UPSTREAM_REQUEST_DURATION, UPSTREAM_RESPONSES, UPSTREAM_RETRIES
+from vigobusapi.tracing import span
+from vigobusapi.logger import logger, lazy_bind
 
 __all__ = ("http_request",)
 
@@ -25,9 +31,13 @@ async def http_request(
         timeout: float = settings.http_timeout,
         retries: int = settings.http_retries,
         raise_for_status: bool = True,
-        not_retry_400_errors: bool = True
+        not_retry_400_errors: bool = True,
+        upstream: bool = True
 ) -> Response:
-    """Async function to perform a generic HTTP request, supporting retries
+    """Async function to perform a generic HTTP request, supporting retries.
+    The timeout of each retry is limited to the time left until the deadline of the current request (if any);
+    once exceeded, no more retries are performed. No more retries are performed either if the fetch running the
+    request was cancelled.
 
     :param url: URL to request
     :param method: HTTP method (default=GET)
@@ -38,13 +48,27 @@ async def http_request(
     :param retries: how many times to retry the request if it fails (default=from settings)
     :param raise_for_status: if True, raise HTTPError if response is not successful (default=True)
     :param not_retry_400_errors: if True, do not retry requests failed with a ~400 status code (default=True)
+    :param upstream: if True, the request is to an external data source, and each attempt is counted on the upstream
+                     requests of the current fetch; False for requests to other nodes of the API (default=True)
     :return: the Response object
-    :raises: requests_async.RequestTimeout | requests_async.RequestException
+    :raises: requests_async.RequestTimeout | requests_async.RequestException | exceptions.DeadlineExceeded |
+             exceptions.FetchCancelled
     """
     last_error = None
     last_status_code = None
+    host = urlsplit(url).netloc
 
     for i in range(retries):
+        check_cancelled()
+        try:
+            attempt_timeout = clamp_timeout(timeout)
+        except DeadlineExceeded:
+            logger.bind(request_url=url).warning("Request deadline exceeded, not going to retry")
+            break
+
+        if i > 0:
+            UPSTREAM_RETRIES.labels(host).inc()
+
         with logger.contextualize(
             request_url=url,
             request_method=method,
@@ -53,27 +77,34 @@ async def http_request(
             request_params=params,
             request_body=body,
             request_headers=headers,
-            request_timeout=timeout
-        ):
+            request_timeout=attempt_timeout
+        ), span("http_request", host=host, method=method, attempt=i+1) as request_span:
             logger.debug("Requesting URL...")
+            if upstream:
+                record_upstream_request()
 
+            last_status_code = None
+            start_time = time.time()
             try:
-                start_time = time.time()
                 response: Response = await request(
                     method=method,
                     url=url,
                     params=params,
                     data=body,
                     headers=headers,
-                    timeout=timeout
+                    timeout=attempt_timeout
                 )
 
                 response_time = round(time.time() - start_time, 4)
                 last_status_code = response.status_code
-                logger.bind(
+                UPSTREAM_REQUEST_DURATION.labels(host).observe(response_time)
+                UPSTREAM_RESPONSES.labels(host, str(last_status_code)).inc()
+                if request_span is not None:
+                    request_span.set_tag("status_code", last_status_code)
+                lazy_bind(
                     response_elapsed_time=response_time,
                     response_status_code=last_status_code,
-                    response_body=response.text
+                    response_body=lambda: response.text
                 ).debug("Response received")
 
                 if raise_for_status:
@@ -81,11 +112,16 @@ async def http_request(
                 return response
 
             except RequestException as ex:
+                last_error = ex
+                if last_status_code is None:
+                    # No response received (e.g. connection error or timeout)
+                    UPSTREAM_REQUEST_DURATION.labels(host).observe(time.time() - start_time)
+                    UPSTREAM_RESPONSES.labels(host, "error").inc()
+
                 if not_retry_400_errors and last_status_code and 400 <= last_status_code < 500:
                     logger.warning("Request failed due to 400 error, not going to retry")
                     break
 
                 logger.warning("Request failed")
-                last_error = ex
 
-    raise last_error
+    raise last_error or DeadlineExceeded()
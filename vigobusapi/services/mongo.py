@@ -1,18 +1,22 @@
-# # Installed # #
-from motor import motor_asyncio
-from pymongo import TEXT
+# # Native # #
+import asyncio
+from typing import Optional, TYPE_CHECKING
 
 # # Project # #
 from vigobusapi.settings import settings
+from vigobusapi.metrics import MONGO_OPERATION_DURATION, time_histogram
 from vigobusapi.logger import logger
 
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
 
 class MongoDB:
     _mongodb_instance = None  # Singleton instance of the class
-    _client = motor_asyncio.AsyncIOMotorClient
 
     def __init__(self):
-        self._client = None
+        self._client: Optional["AsyncIOMotorClient"] = None
+        self._indexes_task: Optional[asyncio.Future] = None
 
     @property
     def client(self):
@@ -31,25 +35,49 @@ class MongoDB:
         """Singleton initialization of MongoDB. Must run before the API server starts. Performs the following:
         - Create a new MongoDB() instance and assign it to class (can be acquired through get_mongo() class method).
         - Create and assign the AsyncIOMotorClient.
-        - Perform initial actions required for setup of collection.
+        - Perform initial actions required for setup of collection (see ensure_indexes()). If the
+          'mongo_init_background' setting is enabled, these run on background, so the server can start accepting
+          requests without waiting for MongoDB.
         """
         if cls._mongodb_instance is not None:
             return
 
+        # Motor (and PyMongo) are imported here, so they are not imported until the API server starts
+        from motor.motor_asyncio import AsyncIOMotorClient
+
         logger.info("Initializing MongoDB...")
         mongo = MongoDB()
         cls._mongodb_instance = mongo
-        mongo._client = motor_asyncio.AsyncIOMotorClient(settings.mongo_uri)
+        mongo._client = AsyncIOMotorClient(settings.mongo_uri)
+
+        if settings.mongo_init_background:
+            mongo._indexes_task = asyncio.ensure_future(mongo.ensure_indexes(catch_errors=True))
+            logger.info("MongoDB initialized! (creating indexes on background)")
+        else:
+            await mongo.ensure_indexes()
+            logger.info("MongoDB initialized!")
+
+    async def ensure_indexes(self, catch_errors: bool = False):
+        """Create the indexes required on the Stops collection, if they do not exist.
+        :param catch_errors: if True, log errors and avoid raising them (useful when called as async background task)
+        """
+        from pymongo import TEXT
 
-        # Create a Text Index on stop name, for search
-        # https://docs.mongodb.com/manual/core/index-text/#create-text-index
-        await mongo.get_stops_collection().create_index(
-            [("name", TEXT)],
-            background=True,
-            default_language="spanish"
-        )
+        try:
+            # Create a Text Index on stop name, for search
+            # https://docs.mongodb.com/manual/core/index-text/#create-text-index
+            with time_histogram(MONGO_OPERATION_DURATION, "create_index"):
+                await self.get_stops_collection().create_index(
+                    [("name", TEXT)],
+                    background=True,
+                    default_language="spanish"
+                )
+            logger.debug("MongoDB indexes created")
 
-        logger.info("MongoDB initialized!")
+        except Exception as ex:
+            if not catch_errors:
+                raise ex
+            logger.opt(exception=True).error("Error while creating the MongoDB indexes")
 
     @classmethod
     def get_mongo(cls) -> "MongoDB":
@@ -0,0 +1,64 @@
+"""PARSE EXECUTOR
+Run the CPU-bound parsing of the data returned by the external data sources (including the string fixes) on a pool of
+threads or processes, instead of on the event loop, so the rest of requests are not blocked while parsing.
+"""
+
+# # Native # #
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional, Callable, TypeVar, Dict, Type
+
+# # Project # #
+from vigobusapi.settings import settings
+from vigobusapi.tracing import span
+from vigobusapi.logger import logger
+
+__all__ = ("run_parser", "shutdown_parse_executor")
+
+T = TypeVar("T")
+
+EXECUTORS: Dict[str, Type[Executor]] = {
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor
+}
+"""Available executors, by the name used on the 'parse_executor' setting"""
+
+_executor: Optional[Executor] = None
+
+
+def _get_executor() -> Optional[Executor]:
+    """Return the executor set on the 'parse_executor' setting (created on first call), or None if disabled."""
+    global _executor
+    if _executor is None and settings.parse_executor:
+        _executor = EXECUTORS[settings.parse_executor](max_workers=settings.parse_executor_workers or None)
+        logger.bind(parse_executor=settings.parse_executor).debug("Parse executor started")
+    return _executor
+
+
+async def run_parser(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run the given parsing function with the given args, on the parse executor if enabled, or directly otherwise.
+    On the thread executor, the function runs on a copy of the current context, keeping the logger context and
+    recording its spans on the current trace. The process executor requires the function, args and returned value
+    to be picklable; the spans of the function are not recorded, so the whole call is measured as a single span.
+    """
+    executor = _get_executor()
+    if executor is None:
+        return func(*args, **kwargs)
+
+    call = functools.partial(func, *args, **kwargs)
+    loop = asyncio.get_event_loop()
+    if isinstance(executor, ThreadPoolExecutor):
+        return await loop.run_in_executor(executor, contextvars.copy_context().run, call)
+
+    with span("parse_process", function=func.__name__):
+        return await loop.run_in_executor(executor, call)
+
+
+def shutdown_parse_executor():
+    """Stop the parse executor (if started), without waiting for the pending parsings."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
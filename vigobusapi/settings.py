@@ -2,6 +2,9 @@
 Declaration of the Settings class and instance that can be used to get any setting required
 """
 
+# # Native # #
+from typing import Optional
+
 # # Installed # #
 from pydantic import BaseSettings
 
@@ -12,22 +15,77 @@ __all__ = ("settings",)
 
 class Settings(BaseSettings):
     endpoint_timeout: float = 30
+    admission_cache_concurrency: int = 200
+    admission_upstream_concurrency: int = 20
+    admission_queue_timeout: float = 2
+    admission_retry_after: int = 5
+    admission_client_rate: float = 0
+    admission_client_burst: int = 20
+    admission_client_header: Optional[str] = None
+    admission_clients_maxsize: int = 10000
     http_timeout: float = 5
     http_retries: int = 2
     stops_cache_maxsize: int = 500
     stops_cache_ttl: float = 3600
+    stops_cache_maxbytes: Optional[int] = None
     buses_cache_maxsize: int = 300
     buses_cache_ttl: float = 15
+    buses_cache_maxbytes: Optional[int] = None
+    buses_last_known_maxsize: int = 2000
+    buses_last_known_ttl: float = 900
+    buses_last_known_maxbytes: Optional[int] = None
+    buses_source_affinity_maxsize: int = 10000
+    buses_source_affinity_ttl: float = 1800
+    buses_versions_maxsize: int = 5000
+    buses_versions_ttl: float = 600
+    shared_cache_backend: Optional[str] = None
+    shared_cache_path: Optional[str] = None
+    shared_cache_mmap_size: int = 64 * 1024 * 1024
+    peers: Optional[str] = None
+    peers_self: Optional[str] = None
+    peers_key: Optional[str] = None
+    peers_timeout: float = 1
+    peers_vnodes: int = 100
+    peers_down_time: float = 10
     buses_normal_limit: int = 5
     buses_pages_async: bool = True
+    buses_batch_max_stops: int = 20
+    buses_batch_concurrency: int = 5
+    parse_executor: Optional[str] = None
+    parse_executor_workers: int = 0
+    parse_memo_maxsize: int = 2000
+    subscriptions_keepalive: float = 20
+    prefetch_top_stops: int = 0
+    prefetch_budget: int = 60
+    prefetch_concurrency: int = 2
+    prefetch_margin: float = 5
+    prefetch_interval: float = 1
+    prefetch_half_life: float = 600
+    prefetch_max_tracked_stops: int = 10000
     mongo_uri = "mongodb://localhost:27017"
     mongo_stops_db = "vigobusapi"
     mongo_stops_collection = "stops"
+    mongo_init_background: bool = False
     api_host = "0.0.0.0"
     api_port: int = 5000
     api_name = "VigoBusAPI"
     api_log_level = "info"
+    api_workers: int = 1
+    api_loop = "auto"
+    api_http = "auto"
+    api_reload: bool = False
+    api_shutdown_timeout: float = 10
+    api_fast_json: bool = True
+    admin_key: Optional[str] = None
     log_level = "info"
+    log_enqueue: bool = False
+    log_debug_sample_rate: float = 1
+    metrics_loop_lag_interval: float = 1
+    metrics_blocking_detector: bool = False
+    metrics_blocking_threshold: float = 0.1
+    tracing_server_timing: bool = False
+    tracing_sample_rate: float = 0
+    tracing_export_file: Optional[str] = None
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,200 @@
+"""SUBSCRIPTIONS
+Live subscriptions to the Buses coming to a Stop, streamed to the clients as Server-Sent Events.
+A single poller task is kept for each watched Stop (and get_all_buses flag), shared by all its subscribers.
+The poller gets the buses through the getters chain when the buses cached for the Stop expire, and pushes them to the
+subscribers only when they changed. The poller is stopped when its last subscriber leaves.
+"""
+
+# # Native # #
+import asyncio
+import contextvars
+from typing import Dict, Tuple, Set, Optional, AsyncIterator
+
+# # Installed # #
+import orjson
+
+# # Project # #
+from vigobusapi.vigobus_getters import get_buses
+from vigobusapi.vigobus_getters.cache import get_buses_ttl
+from vigobusapi.error_handler import handle_exception_as_error
+from vigobusapi.settings import settings
+from vigobusapi.metrics import add_collect_hook, LIVE_POLLERS, LIVE_SUBSCRIBERS
+from vigobusapi.logger import logger
+
+__all__ = ("stream_buses", "close_subscriptions", "get_subscriptions_stats")
+
+Event = Tuple[str, dict]
+"""Event pushed to the subscribers, as tuple (event name, data). None is pushed to end the subscription."""
+
+PollerKey = Tuple[int, bool]
+"""Key of a poller: tuple (Stop ID, bool GetAllBuses?)"""
+
+POLL_MIN_INTERVAL = 1
+"""Min seconds between the polls of a poller (e.g. when the buses cached are about to expire)"""
+POLL_EXPIRATION_MARGIN = 0.05
+"""Seconds waited after the buses cached expire, so the next poll does not find them cached yet"""
+
+
+class BusesPoller:
+    def __init__(self, stop_id: int, get_all_buses: bool):
+        self.stop_id = stop_id
+        self.get_all_buses = get_all_buses
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.last_event: Optional[Event] = None
+        self.last_event_content: Optional[dict] = None
+        self._task: Optional[asyncio.Future] = None
+
+    def start(self):
+        # Run on an empty context, not inheriting the context of the request that started the poller
+        self._task = contextvars.Context().run(asyncio.ensure_future, self._poll())
+
+    def stop(self):
+        self._task.cancel()
+
+    def add_subscriber(self) -> asyncio.Queue:
+        """Create and return the queue where the events will be pushed for a new subscriber.
+        The last event is pushed right away, so the new subscriber does not have to wait for the next change."""
+        queue = asyncio.Queue(maxsize=1)
+        self.subscribers.add(queue)
+        if self.last_event is not None:
+            queue.put_nowait(self.last_event)
+        return queue
+
+    def remove_subscriber(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def close(self):
+        """Stop the poller and end the subscriptions of all its subscribers."""
+        self.stop()
+        self._publish(None)
+
+    def _publish(self, event: Optional[Event]):
+        if event is not None:
+            self.last_event = event
+        for queue in self.subscribers:
+            # Only the latest event is relevant for subscribers that did not consume the previous one yet
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _fetch(self) -> Tuple[Event, dict]:
+        """Get the buses and return the event to push, and its content without the fields that do not
+        represent a change on the list of buses (source)."""
+        # noinspection PyBroadException
+        try:
+            buses_result = await get_buses(self.stop_id, get_all_buses=self.get_all_buses)
+            data = buses_result.dict()
+            return ("buses", data), {k: v for k, v in data.items() if k != "source"}
+
+        except asyncio.CancelledError:
+            # Subclass of Exception on Python < 3.8: the poller is being stopped
+            raise
+
+        except Exception as ex:
+            status_code, detail = handle_exception_as_error(ex)
+            data = {"status_code": status_code, "detail": detail}
+            return ("error", data), data
+
+    def _get_poll_interval(self) -> float:
+        """Return the seconds to wait until the next poll: until the buses cached for the Stop expire, or
+        buses_cache_ttl if they are not cached (e.g. they could not be fetched)."""
+        ttl = get_buses_ttl(self.stop_id, self.get_all_buses)
+        if ttl is None:
+            return settings.buses_cache_ttl
+        return max(ttl + POLL_EXPIRATION_MARGIN, POLL_MIN_INTERVAL)
+
+    async def _poll(self):
+        with logger.contextualize(poller_stop_id=self.stop_id, poller_get_all_buses=self.get_all_buses):
+            logger.debug("Buses poller started")
+            try:
+                while True:
+                    event, event_content = await self._fetch()
+                    if event_content != self.last_event_content:
+                        self.last_event_content = event_content
+                        self._publish(event)
+                    await asyncio.sleep(self._get_poll_interval())
+
+            finally:
+                logger.debug("Buses poller stopped")
+
+
+_pollers: Dict[PollerKey, BusesPoller] = dict()
+"""Running pollers"""
+
+
+def subscribe(stop_id: int, get_all_buses: bool) -> asyncio.Queue:
+    """Subscribe to the buses of a Stop, starting its poller if not running. Return the queue where the events
+    are pushed to. unsubscribe() must be called with the returned queue when the subscriber leaves."""
+    key = (stop_id, get_all_buses)
+    poller = _pollers.get(key)
+    if poller is None:
+        poller = _pollers[key] = BusesPoller(stop_id=stop_id, get_all_buses=get_all_buses)
+        poller.start()
+    return poller.add_subscriber()
+
+
+def unsubscribe(stop_id: int, get_all_buses: bool, queue: asyncio.Queue):
+    """Remove a subscriber from the buses of a Stop, stopping the poller if it was the last subscriber."""
+    key = (stop_id, get_all_buses)
+    poller = _pollers.get(key)
+    if poller is None:
+        return
+
+    poller.remove_subscriber(queue)
+    if not poller.subscribers:
+        poller.stop()
+        _pollers.pop(key)
+
+
+def encode_event(event: Event) -> str:
+    name, data = event
+    return f"event: {name}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+async def stream_buses(stop_id: int, get_all_buses: bool) -> AsyncIterator[str]:
+    """Async generator that subscribes to the buses of a Stop and yields the events as Server-Sent Events.
+    A comment line is yielded if no events were pushed during subscriptions_keepalive seconds, to keep the
+    connection alive. The subscription is removed when the generator is closed (e.g. when the client disconnects).
+    """
+    queue = subscribe(stop_id, get_all_buses)
+    logger.debug("Subscribed to buses")
+
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.subscriptions_keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+            else:
+                if event is None:
+                    break
+                yield encode_event(event)
+
+    finally:
+        unsubscribe(stop_id, get_all_buses, queue)
+        logger.debug("Unsubscribed from buses")
+
+
+def close_subscriptions():
+    """Stop all the pollers and end the streams of all the subscribers (e.g. when the server is shutting down)."""
+    for poller in _pollers.values():
+        poller.close()
+    _pollers.clear()
+    logger.info("Closed all the live subscriptions")
+
+
+def get_subscriptions_stats() -> dict:
+    """Return the current count of running pollers and subscribers."""
+    return {
+        "pollers": len(_pollers),
+        "subscribers": sum(len(poller.subscribers) for poller in _pollers.values())
+    }
+
+
+def _collect_metrics():
+    stats = get_subscriptions_stats()
+    LIVE_POLLERS.set(stats["pollers"])
+    LIVE_SUBSCRIBERS.set(stats["subscribers"])
+
+
+add_collect_hook(_collect_metrics)
@@ -0,0 +1,166 @@
+"""TRACING
+Lightweight tracing of the requests: spans measure the time spent on each step of a request (getters, HTTP requests,
+parsing, Mongo operations...). The spans of each request can be summarized on the Server-Timing response header
+(if enabled, for debugging), and the traces of a sampled ratio of the requests are exported to a file, as Zipkin v2
+JSON (one trace per line), which can be posted as-is to a Zipkin-compatible collector.
+Spans are only recorded while a trace is started for the current context (request); otherwise span() does nothing.
+"""
+
+# # Native # #
+import time
+import random
+import asyncio
+import functools
+import threading
+import contextlib
+import contextvars
+from collections import OrderedDict
+from typing import Optional, List, Dict
+
+# # Installed # #
+import orjson
+
+# # Project # #
+from vigobusapi.settings import settings
+from vigobusapi.logger import logger
+
+__all__ = ("Trace", "start_trace", "span", "traced")
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_time", "duration", "tags")
+
+    def __init__(self, name: str, parent_id: Optional[str], tags: dict):
+        self.name = name
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.start_time = time.time()
+        self.duration: Optional[float] = None
+        self.tags = tags
+
+    def set_tag(self, key: str, value):
+        self.tags[key] = value
+
+    def to_zipkin(self, trace_id: str) -> dict:
+        span = {
+            "traceId": trace_id,
+            "id": self.span_id,
+            "name": self.name,
+            "timestamp": int(self.start_time * 1_000_000),
+            "duration": int((self.duration or 0) * 1_000_000),
+            "localEndpoint": {"serviceName": settings.api_name},
+            "tags": {k: str(v) for k, v in self.tags.items()}
+        }
+        if self.parent_id:
+            span["parentId"] = self.parent_id
+        return span
+
+
+class Trace:
+    def __init__(self, trace_id: str, exported: bool):
+        self.trace_id = trace_id
+        self.exported = exported
+        self.finished = False
+        self.spans: List[Span] = list()
+
+    def get_server_timing(self) -> str:
+        """Return the Server-Timing header value, summarizing the duration of the spans by name (in milliseconds).
+        Spans with the same name are added, including the count on their description."""
+        durations: Dict[str, List[float]] = OrderedDict()
+        for _span in self.spans:
+            if _span.duration is not None:
+                durations.setdefault(_span.name, []).append(_span.duration)
+
+        metrics = list()
+        for name, name_durations in durations.items():
+            metric = f"{name};dur={round(sum(name_durations) * 1000, 2)}"
+            if len(name_durations) > 1:
+                metric += f';desc="x{len(name_durations)}"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+"""Trace of the current context (request), if started"""
+
+current_span_id = contextvars.ContextVar("current_span_id", default=None)
+"""ID of the current span, used as parent of the spans started within it"""
+
+_export_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def span(name: str, **tags):
+    """Context manager that measures the code within it as a span of the current trace, if any.
+    Yields the Span (to add tags to it with set_tag()), or None if no trace is started for the current context.
+    Spans started within a span are recorded as its children."""
+    trace = current_trace.get()
+    if trace is None or trace.finished:
+        yield None
+        return
+
+    _span = Span(name=name, parent_id=current_span_id.get(), tags=tags)
+    token = current_span_id.set(_span.span_id)
+    start_time = time.perf_counter()
+    try:
+        yield _span
+    except BaseException as ex:
+        _span.set_tag("error", type(ex).__name__)
+        raise
+    finally:
+        _span.duration = time.perf_counter() - start_time
+        current_span_id.reset(token)
+        if not trace.finished:
+            trace.spans.append(_span)
+
+
+def traced(name: str):
+    """Decorator for sync functions, to run them within a span with the given name."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _write_trace(line: bytes):
+    # noinspection PyBroadException
+    try:
+        with _export_lock:
+            with open(settings.tracing_export_file, "ab") as file:
+                file.write(line)
+    except Exception:
+        logger.opt(exception=True).error("Error exporting trace")
+
+
+def _export_trace(trace: Trace):
+    """Write the trace to the export file from a thread, without blocking the event loop."""
+    line = orjson.dumps([_span.to_zipkin(trace.trace_id) for _span in trace.spans]) + b"\n"
+    asyncio.get_event_loop().run_in_executor(None, _write_trace, line)
+
+
+@contextlib.contextmanager
+def start_trace(trace_id: str, root_span_name: str, **tags):
+    """Context manager that starts a trace for the code within it (a request), with a root span.
+    The trace is sampled for exporting according to the 'tracing_sample_rate' setting (and if an export file is set).
+    If the trace is neither exported nor used for the Server-Timing header ('tracing_server_timing' setting),
+    spans are not recorded. Yields the Trace, or None if not recording spans."""
+    exported = bool(settings.tracing_export_file) and random.random() < settings.tracing_sample_rate
+    if not exported and not settings.tracing_server_timing:
+        yield None
+        return
+
+    trace = Trace(trace_id=trace_id, exported=exported)
+    trace_token = current_trace.set(trace)
+    span_token = current_span_id.set(None)
+    try:
+        with span(root_span_name, **tags):
+            yield trace
+    finally:
+        trace.finished = True
+        current_trace.reset(trace_token)
+        current_span_id.reset(span_token)
+        if trace.exported:
+            _export_trace(trace)
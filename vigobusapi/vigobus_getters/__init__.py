@@ -7,5 +7,5 @@ unless the client specifies otherwise when performing a request.
 from .html import get_stop as html_get_stop
 from .html import get_buses as html_get_buses
 from .mongo import search_stops
-from .auto_getters import get_stop, get_stops, get_buses
+from .auto_getters import get_stop, get_stops, get_buses, get_buses_multiple
 from .exceptions import ParseError
@@ -4,43 +4,157 @@ depending on the availability.
 """
 
 # # Native # #
+import time
 import asyncio
-import inspect
 from typing import *
 
+# # Installed # #
+from cachetools import TTLCache
+
 # # Project # #
-from vigobusapi.vigobus_getters import http, html, cache, mongo
+from vigobusapi.vigobus_getters import http, html, cache, shared_cache, peers, mongo
 from vigobusapi.vigobus_getters.helpers import *
+from vigobusapi.vigobus_getters.pipeline import *
 from vigobusapi.entities import *
 from vigobusapi.exceptions import *
+from vigobusapi.settings import settings
+from vigobusapi.metrics import GETTER_DURATION
+from vigobusapi.tracing import span
+from vigobusapi.deadline import has_time_for
+from vigobusapi.cancellation import SingleFlight, check_cancelled
 from vigobusapi.logger import logger
 
-__all__ = ("get_stop", "get_stop_or_none", "get_stops", "get_buses")
+__all__ = ("get_stop", "get_stop_or_none", "get_stops", "get_buses", "get_buses_multiple", "stop_tier", "bus_tier")
+
+
+def _save_stop_caches(_stop_id: int, stop: Stop):
+    cache.save_stop(stop)
+    shared_cache.save_stop(stop)  # non-blocking
+
+
+async def _save_stop_database(_stop_id: int, stop: Stop):
+    add_stop_created_timestamp(stop)  # Add "created" field
+    await mongo.save_stop(stop)  # non-blocking
+
+
+def _save_buses_caches(stop_id: int, get_all_buses: bool, buses_result: BusesResponse):
+    cache.save_buses(stop_id, get_all_buses, buses_result)
+    shared_cache.save_buses(stop_id, get_all_buses, buses_result)  # non-blocking
+    cache.save_last_known_buses(stop_id, get_all_buses, buses_result)
+
+
+def _save_buses_last_known(stop_id: int, get_all_buses: bool, buses_result: BusesResponse):
+    cache.save_last_known_buses(stop_id, get_all_buses, buses_result)
+
 
-STOP_GETTERS = (
-    cache.get_stop,
-    mongo.get_stop,
-    html.get_stop
+STOP_WRITE_BACK = {
+    KIND_CACHE: (),
+    KIND_DATABASE: (_save_stop_caches,),
+    KIND_EXTERNAL: (_save_stop_caches, _save_stop_database)
+}
+"""Write-back policy of the Stop tiers, by kind: Stops found by a tier are saved on the caches (if not found by a cache)
+and on MongoDB (if not found by a local storage)"""
+
+BUS_WRITE_BACK = {
+    KIND_CACHE: (),
+    KIND_PEER: (_save_buses_last_known,),
+    KIND_EXTERNAL: (_save_buses_caches,)
+}
+"""Write-back policy of the Bus tiers, by kind: Buses found by a tier are saved on the caches (if not found by a
+cache). Buses found on the owner node are only saved as last known Buses: the peers getter saves them on the local
+cache for the TTL they have left, and the owner node saves them on the shared cache."""
+
+
+def stop_tier(getter: Callable, kind: str, name: Optional[str] = None) -> GetterTier:
+    """Build a tier for STOP_TIERS, with the write-back policy of its kind."""
+    return GetterTier(getter, kind, name=name, write_back=STOP_WRITE_BACK[kind])
+
+
+def bus_tier(getter: Callable, kind: str, name: Optional[str] = None) -> GetterTier:
+    """Build a tier for BUS_TIERS, with the write-back policy of its kind."""
+    return GetterTier(getter, kind, name=name, write_back=BUS_WRITE_BACK[kind])
+
+
+STOP_TIERS = (
+    stop_tier(cache.get_stop, KIND_CACHE),
+    stop_tier(shared_cache.get_stop, KIND_CACHE),
+    stop_tier(mongo.get_stop, KIND_DATABASE),
+    stop_tier(html.get_stop, KIND_EXTERNAL)
 )
-"""List of Stop Getter functions. 
-The first function always is a local Cache storage. 
-The second function always is a local Database storage.
-Next functions are external data sources.
+"""Pipeline of Stop getters, called in order.
+The first tier always is a local Cache storage, followed by the Shared Cache storage (if enabled).
+The next tier always is a local Database storage.
+Next tiers are external data sources.
 """
 
-BUS_GETTERS = (
-    cache.get_buses,
-    http.get_buses,
-    html.get_buses
+BUS_TIERS = (
+    bus_tier(cache.get_buses, KIND_CACHE),
+    bus_tier(shared_cache.get_buses, KIND_CACHE),
+    bus_tier(peers.get_buses, KIND_PEER),
+    bus_tier(http.get_buses, KIND_EXTERNAL),
+    bus_tier(html.get_buses, KIND_EXTERNAL)
 )
-"""List of Bus Getter functions.
-The first function always is a local Cache storage.
-Next functions are external data sources.
+"""Pipeline of Bus getters, called in order.
+The first tier always is a local Cache storage, followed by the Shared Cache storage (if enabled).
+The next tier gets the Buses from the node owning the Stop (if running in peer mode).
+Next tiers are external data sources.
 """
 
+buses_sources_affinity = TTLCache(
+    maxsize=settings.buses_source_affinity_maxsize,
+    ttl=settings.buses_source_affinity_ttl
+)
+"""External data source that last returned the Buses of each Stop. Key: Stop ID.
+Value: tuple (GetterTier, seconds it took)"""
+
+buses_fetches = SingleFlight()
+"""Fetches of Buses in progress (from the tiers after the caches). Key: tuple (Stop ID, get_all_buses)"""
+
+GETTERS_DURATION_SMOOTHING = 0.2
+"""Weight of the last call duration on the estimated duration of each getter (exponential moving average)"""
+
+
+async def _call_getter(entity: str, tier: GetterTier, *args):
+    """Call the getter of the given Stop or Bus tier with the given args, and return its result.
+    The time spent on the getter is observed on the metrics, by entity (stop/buses), tier name and result;
+    and measured as a span of the current trace.
+    The getter is skipped if its estimated duration (average of its previous calls) exceeds the time left until the
+    deadline of the current request.
+    :raises: exceptions.DeadlineExceeded (if the getter is skipped)
+    """
+    estimated_duration = tier.estimated_duration
+    if estimated_duration is not None and not has_time_for(estimated_duration):
+        GETTER_DURATION.labels(entity, tier.name, "skipped").observe(0)
+        logger.bind(getter_estimated_duration=estimated_duration).debug("Not enough time left for the getter")
+        raise DeadlineExceeded()
+
+    result = "error"
+    start_time = time.perf_counter()
+    with span(f"getter.{tier.name}", entity=entity) as getter_span:
+        try:
+            value = await tier.call(*args)
+
+            if isinstance(value, StopNotExist):
+                result = "stop_not_exist"
+            else:
+                result = "found" if value is not None else "not_found"
+            return value
+
+        except StopNotExist:
+            result = "stop_not_exist"
+            raise
+
+        finally:
+            duration = time.perf_counter() - start_time
+            GETTER_DURATION.labels(entity, tier.name, result).observe(duration)
+            tier.estimated_duration = duration if estimated_duration is None else \
+                estimated_duration + GETTERS_DURATION_SMOOTHING * (duration - estimated_duration)
+            if getter_span is not None:
+                getter_span.set_tag("result", result)
+
 
 async def get_stop(stop_id: int) -> Stop:
-    """Async function to get information of a Stop, using the STOP_GETTERS in order
+    """Async function to get information of a Stop, using the STOP_TIERS in order
     :param stop_id: Stop ID
     :raises: requests_async.Timeout | requests_async.RequestException |
              exceptions.StopNotExist | exceptions.ParseError
@@ -48,22 +162,18 @@ async def get_stop(stop_id: int) -> Stop:
     last_exception = None
     logger.debug(f"Getting stop {stop_id}")
 
-    stop_getter: Callable
-    for stop_getter in STOP_GETTERS:
+    for tier in STOP_TIERS:
         try:
-            if inspect.iscoroutinefunction(stop_getter):
-                stop: Stop = await stop_getter(stop_id)
-            else:
-                stop: StopOrNotExist = stop_getter(stop_id)
-
+            stop: StopOrNotExist = await _call_getter("stop", tier, stop_id)
             if isinstance(stop, Exception):
                 raise stop
 
         except StopNotExist as ex:
             last_exception = ex
-            # Save the StopNotExist status in cache, if not found by the cache
-            if STOP_GETTERS.index(stop_getter) > 0:
+            # Save the StopNotExist status in caches, if not found by the caches
+            if tier.kind != KIND_CACHE:
                 cache.save_stop_not_exist(stop_id)
+                shared_cache.save_stop_not_exist(stop_id)
             break
 
         except Exception as ex:
@@ -71,17 +181,11 @@ async def get_stop(stop_id: int) -> Stop:
 
         else:
             if stop is not None:
-                # Save the Stop on local data storages
-                if STOP_GETTERS.index(stop_getter) > 0:
-                    # Save the Stop in cache if not found by the cache
-                    cache.save_stop(stop)
-                if STOP_GETTERS.index(stop_getter) > 1:
-                    # Save the Stop in MongoDB if not found by Mongo
-                    add_stop_created_timestamp(stop)  # Add "created" field
-                    await mongo.save_stop(stop)  # non-blocking
+                # Save the Stop on local data storages, according to the tier write-back policy
+                await tier.save(stop_id, stop)
 
                 # Add the Source to the returned data
-                stop.source = get_package(stop_getter)
+                stop.source = tier.name
 
                 return stop
 
@@ -105,48 +209,173 @@ async def get_stops(stops_ids: Iterable[int]) -> List[Stop]:
     return [r for r in results if r is not None]  # noqa
 
 
-async def get_buses(stop_id: int, get_all_buses: bool) -> BusesResponse:
-    """Async function to get information of a Stop, using the BUS_GETTERS in order
-    :param stop_id: Stop ID
-    :param get_all_buses: if True, fetch all the available buses
-    :raises: requests_async.Timeout | requests_async.RequestException |
-             exceptions.StopNotExist | exceptions.ParseError
+def _get_bus_tiers(stop_id: int) -> Sequence[GetterTier]:
+    """Return the BUS_TIERS in the order they must be called for the given Stop: the external data source that
+    last returned its Buses (if any) is moved before the other sources."""
+    affinity = buses_sources_affinity.get(stop_id)
+    if affinity is None or affinity[0] not in BUS_TIERS:
+        return BUS_TIERS
+
+    preferred_tier, duration = affinity
+    tiers = [tier for tier in BUS_TIERS if tier is not preferred_tier]
+    first_source_index = next((i for i, tier in enumerate(tiers) if tier.kind == KIND_EXTERNAL), len(tiers))
+    tiers.insert(first_source_index, preferred_tier)
+    logger.bind(buses_preferred_getter=preferred_tier.name, buses_preferred_getter_duration=duration)\
+        .debug("Using the last successful source of the stop first")
+    return tiers
+
+
+def _forget_source_affinity(stop_id: int, tier: GetterTier):
+    """Forget the given Bus tier as the preferred source of the Stop, if it was."""
+    affinity = buses_sources_affinity.get(stop_id)
+    if affinity is not None and affinity[0] is tier:
+        buses_sources_affinity.pop(stop_id, None)
+
+
+async def _save_found_buses(
+        stop_id: int,
+        get_all_buses: bool,
+        tier: GetterTier,
+        buses_result: BusesResponse
+) -> BusesResponse:
+    # Save the Buses on other tiers, according to the tier write-back policy
+    await tier.save(stop_id, get_all_buses, buses_result)
+
+    # Add the source to the returned data
+    buses_result.source = tier.name
+    return buses_result
+
+
+async def _get_buses_from_tiers(
+        stop_id: int,
+        get_all_buses: bool,
+        tiers: Sequence[GetterTier]
+) -> Tuple[Optional[BusesResponse], Optional[Exception]]:
+    """Call the given Bus tiers in order, until one returns the Buses of the Stop (saved on other tiers according
+    to its write-back policy). Return the Buses found (or None) and the last exception raised by the tiers (or None).
+    An external data source returning an empty list of Buses is not trusted while the next sources may return some
+    (some sources return no Buses for Stops they do not serve properly): the empty list is returned only if no other
+    source returned any Buses.
+    :raises: exceptions.FetchCancelled (the fetch running the tiers was cancelled)
     """
     last_exception = None
+    empty_result: Optional[Tuple[GetterTier, BusesResponse]] = None
 
-    # Lookup the Stop in cache; if available, verify that it exists
-    cached_stop = cache.get_stop(stop_id)
-    if isinstance(cached_stop, StopNotExist):
-        raise cached_stop
-
-    for bus_getter in BUS_GETTERS:
-        getter_name = get_package(bus_getter)
+    for tier in tiers:
+        check_cancelled()
+        is_source = tier.kind == KIND_EXTERNAL
+        start_time = time.perf_counter()
 
-        with logger.contextualize(buses_getter_name=getter_name):
+        with logger.contextualize(buses_getter_name=tier.name):
             try:
-                if inspect.iscoroutinefunction(bus_getter):
-                    buses_result: Optional[BusesResponse] = await bus_getter(stop_id, get_all_buses)
-                else:
-                    buses_result: Optional[BusesResponse] = bus_getter(stop_id, get_all_buses)
+                buses_result: Optional[BusesResponse] = await _call_getter("buses", tier, stop_id, get_all_buses)
 
             except StopNotExist as ex:
                 last_exception = ex
                 break
 
+            except FetchCancelled:
+                raise
+
+            except DeadlineExceeded as ex:
+                last_exception = ex
+
             except Exception as ex:
                 logger.opt(exception=True).warning("Error on Buses getter")
                 last_exception = ex
+                if is_source:
+                    _forget_source_affinity(stop_id, tier)
 
             else:
+                if is_source and (buses_result is None or not buses_result.buses):
+                    _forget_source_affinity(stop_id, tier)
+                    if buses_result is not None:
+                        logger.debug("Buses getter returned no buses, trying the next getters")
+                        empty_result = empty_result or (tier, buses_result)
+                        continue
+
                 if buses_result is not None:
-                    if BUS_GETTERS.index(bus_getter) > 0:
-                        # Save the Buses in cache if bus list not found by the cache itself
-                        cache.save_buses(stop_id, get_all_buses, buses_result)
+                    if is_source:
+                        # Remember the source, to be called first on the next requests for this Stop
+                        buses_sources_affinity[stop_id] = (tier, time.perf_counter() - start_time)
+
+                    return await _save_found_buses(stop_id, get_all_buses, tier, buses_result), None
 
-                    # Add the source to the returned data
-                    buses_result.source = getter_name
+    if empty_result is not None and not isinstance(last_exception, StopNotExist):
+        return await _save_found_buses(stop_id, get_all_buses, *empty_result), None
+    return None, last_exception
 
-                    return buses_result
+
+async def get_buses(stop_id: int, get_all_buses: bool, skip_caches: bool = False) -> BusesResponse:
+    """Async function to get information of a Stop, using the BUS_TIERS in order; except that the external data
+    source that last returned the Buses of the Stop is called before the other sources.
+    The tiers after the caches are called on a single fetch for all the concurrent requests of the same Buses
+    (buses_fetches). If every request waiting for the fetch leaves (their clients disconnected or timed out), the fetch
+    is cancelled before calling the next tier or retrying an upstream request.
+    If no getter returned the Buses, the last known Buses of the Stop are returned, extrapolated to the current time
+    (source "extrapolated"), unless the Stop does not exist or skip_caches=True.
+    :param stop_id: Stop ID
+    :param get_all_buses: if True, fetch all the available buses
+    :param skip_caches: if True, do not lookup the Buses on the caches (used to refresh them)
+    :raises: requests_async.Timeout | requests_async.RequestException |
+             exceptions.StopNotExist | exceptions.ParseError | exceptions.ClientDisconnected
+    """
+    # Lookup the Stop in cache; if available, verify that it exists
+    cached_stop = cache.get_stop(stop_id)
+    if isinstance(cached_stop, StopNotExist):
+        raise cached_stop
+
+    tiers = _get_bus_tiers(stop_id)
+    cache_tiers = [tier for tier in tiers if tier.kind == KIND_CACHE] if not skip_caches else []
+    buses_result, last_exception = await _get_buses_from_tiers(stop_id, get_all_buses, cache_tiers)
+
+    if buses_result is None and not isinstance(last_exception, StopNotExist):
+        fetch_tiers = [tier for tier in tiers if tier.kind != KIND_CACHE]
+        buses_result, last_exception = await buses_fetches.run(
+            (stop_id, get_all_buses),
+            lambda: _get_buses_from_tiers(stop_id, get_all_buses, fetch_tiers)
+        )
+
+    if buses_result is not None:
+        return buses_result
+
+    # If Buses not returned by any getter (but the Stop may exist), return the last known Buses (degraded mode)
+    if not skip_caches and not isinstance(last_exception, StopNotExist):
+        buses_result = cache.get_last_known_buses(stop_id, get_all_buses)
+        if buses_result is not None:
+            return buses_result
 
     # If Buses not returned, raise the Last Exception
     raise last_exception
+
+
+async def get_buses_multiple(
+        stops_ids: Iterable[int],
+        get_all_buses: bool
+) -> Dict[int, Union[BusesResponse, Exception]]:
+    """Async function to get the buses of multiple Stops at the same time, calling get_buses() for each Stop.
+    Duplicated Stop IDs are requested once. Stops with their buses cached are resolved first, while the rest
+    are fetched concurrently, with up to 'buses_batch_concurrency' Stops being fetched at the same time.
+    :param stops_ids: Stops IDs
+    :param get_all_buses: if True, fetch all the available buses
+    :return: dict with the Stop IDs as keys, and the BusesResponse or the exception raised for each Stop as values,
+             in the same order as the given Stop IDs
+    """
+    stops_ids = list(dict.fromkeys(stops_ids))
+    cached_stops_ids = [stop_id for stop_id in stops_ids if cache.get_buses_ttl(stop_id, get_all_buses) is not None]
+    uncached_stops_ids = [stop_id for stop_id in stops_ids if stop_id not in cached_stops_ids]
+    semaphore = asyncio.Semaphore(settings.buses_batch_concurrency)
+
+    async def _get_buses_limited(stop_id: int) -> BusesResponse:
+        async with semaphore:
+            return await get_buses(stop_id, get_all_buses=get_all_buses)
+
+    logger.debug(f"Getting buses for {len(cached_stops_ids)} cached and {len(uncached_stops_ids)} uncached stops")
+    results = await asyncio.gather(
+        *[get_buses(stop_id, get_all_buses=get_all_buses) for stop_id in cached_stops_ids],
+        *[_get_buses_limited(stop_id) for stop_id in uncached_stops_ids],
+        return_exceptions=True
+    )
+
+    results_by_stop_id = dict(zip(cached_stops_ids + uncached_stops_ids, results))
+    return {stop_id: results_by_stop_id[stop_id] for stop_id in stops_ids}
@@ -2,5 +2,25 @@
 Cache local storage for Stops and Buses
 """
 
+# # Project # #
+from vigobusapi.metrics import add_collect_hook, CACHE_EVICTIONS, CACHE_EXPIRATIONS, CACHE_ITEMS, CACHE_BYTES
+
+# # Package # #
 from .stop_cache import *
 from .bus_cache import *
+from .last_known_cache import *
+from .memory import *
+
+
+def _collect_metrics():
+    for cache_name, cache in (
+            ("stops", stops_cache), ("buses", buses_cache), ("last_known_buses", last_known_buses_cache)
+    ):
+        cache.expire()
+        CACHE_EVICTIONS.labels(cache_name).set(cache.evictions)
+        CACHE_EXPIRATIONS.labels(cache_name).set(cache.expirations)
+        CACHE_ITEMS.labels(cache_name).set(len(cache))
+        CACHE_BYTES.labels(cache_name).set(cache.currsize)
+
+
+add_collect_hook(_collect_metrics)
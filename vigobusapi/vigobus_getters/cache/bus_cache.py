@@ -5,28 +5,44 @@ Cached local storages with TTL for Stops and Buses
 # # Native # #
 from typing import Optional
 
-# # Installed # #
-from cachetools import TTLCache
+# # Package # #
+from .ttl_cache import ExtendedTTLCache
 
 # # Project # #
 from vigobusapi.settings import settings
 from vigobusapi.entities import BusesResponse
+from vigobusapi.metrics import CACHE_LOOKUPS
 from vigobusapi.logger import logger
 
-__all__ = ("buses_cache", "save_buses", "get_buses")
+__all__ = ("buses_cache", "save_buses", "limit_buses", "get_buses", "get_buses_ttl")
 
-buses_cache = TTLCache(maxsize=settings.buses_cache_maxsize, ttl=settings.buses_cache_ttl)
+buses_cache = ExtendedTTLCache(
+    maxsize=settings.buses_cache_maxsize,
+    ttl=settings.buses_cache_ttl,
+    maxbytes=settings.buses_cache_maxbytes
+)
 """Buses Cache. Key: tuple (Stop ID, bool GetAllBuses?). Value: BusesResponse"""
 
 
-def save_buses(stop_id: int, get_all_buses: bool, buses_result: BusesResponse):
+def save_buses(stop_id: int, get_all_buses: bool, buses_result: BusesResponse, ttl: Optional[float] = None):
     """This function must be executed whenever a List of Buses for a Stop is found by any getter,
-    other than the Stops Cache
+    other than the Stops Cache.
+    A ttl lower than the cache TTL can be given, for Buses that were already cached elsewhere.
     """
-    buses_cache[(stop_id, get_all_buses)] = buses_result
+    buses_cache.set((stop_id, get_all_buses), buses_result, ttl=ttl)
     logger.debug(f"Saved buses on local cache")
 
 
+def limit_buses(buses_result: BusesResponse) -> BusesResponse:
+    """Return the given BusesResponse (from a get_all_buses=True request) limited to the normal limit of buses.
+    If the buses exceed the limit, a limited copy is returned."""
+    if len(buses_result.buses) > settings.buses_normal_limit:
+        buses_result = buses_result.copy()
+        buses_result.buses = buses_result.buses[:settings.buses_normal_limit]
+        buses_result.more_buses_available = True
+    return buses_result
+
+
 def get_buses(stop_id: int, get_all_buses: bool) -> Optional[BusesResponse]:
     """Get List of Buses from the Buses Cache, by Stop ID and All Buses wanted (True/False).
     If the list of buses for the given Stop ID is not cached, None is returned.
@@ -38,10 +54,20 @@ def get_buses(stop_id: int, get_all_buses: bool) -> Optional[BusesResponse]:
         # If NOT All Buses are requested, and a Not All Buses query is not cached, but an All Buses query is cached,
         #  return it, since it is still valid - but limit the results
         buses_result = buses_cache.get((stop_id, True))
-        if buses_result and len(buses_result.buses) > settings.buses_normal_limit:
-            buses_result = buses_result.copy()
-            buses_result.buses = buses_result.buses[:settings.buses_normal_limit]
-            buses_result.more_buses_available = True
+        if buses_result:
+            buses_result = limit_buses(buses_result)
             logger.debug(f"Buses from a getAllBuses=True request found on local cache, valid for this request")
 
+    CACHE_LOOKUPS.labels("buses", "hit" if buses_result is not None else "miss").inc()
     return buses_result
+
+
+def get_buses_ttl(stop_id: int, get_all_buses: bool) -> Optional[float]:
+    """Get the seconds left until the List of Buses cached for the given Stop ID and All Buses wanted (True/False)
+    expires. Like get_buses(), if NOT All Buses are requested, the All Buses entry is used if the other is not cached.
+    If the list of buses is not cached, None is returned.
+    """
+    ttl = buses_cache.get_remaining_ttl((stop_id, get_all_buses))
+    if ttl is None and not get_all_buses:
+        ttl = buses_cache.get_remaining_ttl((stop_id, True))
+    return ttl
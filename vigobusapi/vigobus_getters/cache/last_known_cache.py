@@ -0,0 +1,78 @@
+"""LAST KNOWN CACHE
+Longer-lived storage of the last List of Buses fetched for each Stop, used when all the Bus getters fail.
+The stored Buses are extrapolated to the current time: their remaining time is decreased by the time elapsed since they
+were fetched, and the buses that should have already arrived are removed.
+"""
+
+# # Native # #
+import time
+from typing import Optional, Tuple
+
+# # Package # #
+from .ttl_cache import ExtendedTTLCache
+from .bus_cache import limit_buses
+
+# # Project # #
+from vigobusapi.settings import settings
+from vigobusapi.entities import BusesResponse
+from vigobusapi.metrics import CACHE_LOOKUPS
+from vigobusapi.logger import logger
+
+__all__ = ("last_known_buses_cache", "save_last_known_buses", "get_last_known_buses", "EXTRAPOLATED_SOURCE")
+
+EXTRAPOLATED_SOURCE = "extrapolated"
+"""Source of the BusesResponse returned by get_last_known_buses()"""
+
+last_known_buses_cache = ExtendedTTLCache(
+    maxsize=settings.buses_last_known_maxsize,
+    ttl=settings.buses_last_known_ttl,
+    maxbytes=settings.buses_last_known_maxbytes
+)
+"""Last Known Buses Cache. Key: tuple (Stop ID, bool GetAllBuses?).
+Value: tuple (BusesResponse, time.time() when fetched)"""
+
+
+def save_last_known_buses(stop_id: int, get_all_buses: bool, buses_result: BusesResponse):
+    """This function must be executed whenever a List of Buses for a Stop is found by a getter other than the caches.
+    Buses larger than the 'buses_last_known_maxbytes' budget are not saved.
+    """
+    last_known_buses_cache.set((stop_id, get_all_buses), (buses_result, time.time()))
+
+
+def _extrapolate(buses_result: BusesResponse, fetched_time: float) -> BusesResponse:
+    age = max(time.time() - fetched_time, 0)
+    elapsed_minutes = int(age // 60)
+    buses = [
+        bus.copy(update={"time": bus.time - elapsed_minutes})
+        for bus in buses_result.buses
+        if bus.time - elapsed_minutes >= 0
+    ]
+    return BusesResponse(
+        buses=buses,
+        more_buses_available=buses_result.more_buses_available,
+        source=EXTRAPOLATED_SOURCE,
+        age=round(age)
+    )
+
+
+def get_last_known_buses(stop_id: int, get_all_buses: bool) -> Optional[BusesResponse]:
+    """Get the last List of Buses fetched for the given Stop ID and All Buses wanted (True/False), extrapolated to the
+    current time. Like the Buses Cache, if NOT All Buses are requested, the All Buses entry is valid too.
+    If no Buses were fetched for the Stop (within the 'buses_last_known_ttl' setting), None is returned.
+    """
+    cached: Optional[Tuple[BusesResponse, float]] = last_known_buses_cache.get((stop_id, get_all_buses))
+    limit = False
+    if cached is None and not get_all_buses:
+        cached = last_known_buses_cache.get((stop_id, True))
+        limit = True
+
+    CACHE_LOOKUPS.labels("last_known_buses", "hit" if cached is not None else "miss").inc()
+    if cached is None:
+        logger.debug("Buses not found on last known cache")
+        return None
+
+    buses_result = _extrapolate(*cached)
+    if limit:
+        buses_result = limit_buses(buses_result)
+    logger.bind(buses_age=buses_result.age).warning("Returning last known buses, extrapolated")
+    return buses_result
@@ -0,0 +1,69 @@
+"""CACHE MEMORY
+Functions to measure the memory used by the cached entities.
+"""
+
+# # Native # #
+import sys
+from typing import Dict, Optional
+
+# # Installed # #
+import pydantic
+
+# # Project # #
+from vigobusapi.entities import Stop, Bus, BusesResponse
+from vigobusapi.settings import settings
+
+__all__ = ("get_deep_size", "estimate_caches_max_memory")
+
+
+def get_deep_size(obj, _seen=None) -> int:
+    """Return the approximate size in bytes of the given object, including the objects referenced by it
+    (items of containers, and fields of entities). Objects referenced multiple times are only counted once."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, pydantic.BaseModel):
+        size += get_deep_size(obj.__dict__, _seen) + get_deep_size(obj.__fields_set__, _seen)
+    elif isinstance(obj, dict):
+        size += sum(get_deep_size(k, _seen) + get_deep_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(get_deep_size(item, _seen) for item in obj)
+    return size
+
+
+def _sample_stop() -> Stop:
+    return Stop(stop_id=12345, name="X" * 30, original_name="X" * 30, lat=42.2, lon=-8.7)
+
+
+def _sample_buses_response(buses_count: int) -> BusesResponse:
+    return BusesResponse(
+        buses=[Bus(line=str(i), route="X" * 30, time=i) for i in range(buses_count)],
+        more_buses_available=False
+    )
+
+
+def _estimate_cache_max_memory(item_size: int, maxsize: int, maxbytes: Optional[int]) -> int:
+    max_memory = item_size * maxsize
+    return min(max_memory, maxbytes) if maxbytes else max_memory
+
+
+def estimate_caches_max_memory() -> Dict[str, int]:
+    """Return the estimated memory (bytes) used by each local cache when full, using sample entities of typical size
+    (a Stop with 30 characters names, and BusesResponses with 'buses_normal_limit' * 2 buses).
+    Caches limited by bytes (*_maxbytes settings) use up to that limit."""
+    # Keys are created for every item too; (stop_id, get_all_buses) tuples on the buses caches
+    stop_size = get_deep_size(_sample_stop()) + sys.getsizeof(12345)
+    buses_size = get_deep_size(_sample_buses_response(settings.buses_normal_limit * 2)) + get_deep_size((12345, True))
+    return {
+        "stops": _estimate_cache_max_memory(stop_size, settings.stops_cache_maxsize, settings.stops_cache_maxbytes),
+        "buses": _estimate_cache_max_memory(buses_size, settings.buses_cache_maxsize, settings.buses_cache_maxbytes),
+        "last_known_buses": _estimate_cache_max_memory(
+            # values are (BusesResponse, timestamp) tuples
+            buses_size + get_deep_size((None, 0.0)),
+            settings.buses_last_known_maxsize, settings.buses_last_known_maxbytes
+        )
+    }
@@ -5,32 +5,38 @@ Cached local storages with TTL for Stops and Buses
 # # Native # #
 from typing import Optional
 
-# # Installed # #
-from cachetools import TTLCache
+# # Package # #
+from .ttl_cache import ExtendedTTLCache
 
 # # Project # #
 from vigobusapi.settings import settings
 from vigobusapi.exceptions import StopNotExist
 from vigobusapi.entities import Stop, StopOrNotExist
+from vigobusapi.metrics import CACHE_LOOKUPS
 from vigobusapi.logger import logger
 
 __all__ = ("stops_cache", "save_stop", "save_stop_not_exist", "get_stop")
 
-stops_cache = TTLCache(maxsize=settings.stops_cache_maxsize, ttl=settings.stops_cache_ttl)
+stops_cache = ExtendedTTLCache(
+    maxsize=settings.stops_cache_maxsize,
+    ttl=settings.stops_cache_ttl,
+    maxbytes=settings.stops_cache_maxbytes
+)
 """Stops Cache. Key: Stop ID. Value: Stop object OR StopNotExist exception object."""
 
 
-def save_stop(stop: Stop):
-    """This function must be executed whenever a Stop is found by any getter, other than the Stops Cache
+def save_stop(stop: Stop, ttl: Optional[float] = None):
+    """This function must be executed whenever a Stop is found by any getter, other than the Stops Cache.
+    A ttl lower than the cache TTL can be given, for Stops that were already cached elsewhere.
     """
-    stops_cache[stop.stop_id] = stop
+    stops_cache.set(stop.stop_id, stop, ttl=ttl)
     logger.debug("Saved stop on local cache")
 
 
-def save_stop_not_exist(stop_id: int):
+def save_stop_not_exist(stop_id: int, ttl: Optional[float] = None):
     """This function must be executed whenever an external data source reports that a Stop Not Exists
     """
-    stops_cache[stop_id] = StopNotExist()
+    stops_cache.set(stop_id, StopNotExist(), ttl=ttl)
     logger.debug("Saved stop as non existing on local cache")
 
 
@@ -40,5 +46,6 @@ def get_stop(stop_id: int) -> Optional[StopOrNotExist]:
     If the Stop is not cached, None is returned.
     """
     stop = stops_cache.get(stop_id)
+    CACHE_LOOKUPS.labels("stops", "hit" if stop is not None else "miss").inc()
     logger.debug(f"Stop {'found' if stop else 'not found'} on local cache")
     return stop
@@ -0,0 +1,109 @@
+"""TTL CACHE
+TTLCache class used for the local caches, extending the cachetools TTLCache with additional features.
+"""
+
+# # Native # #
+import math
+from typing import Optional, Hashable
+
+# # Installed # #
+import cachetools
+
+# # Package # #
+from .memory import get_deep_size
+
+__all__ = ("ExtendedTTLCache",)
+
+
+class ExtendedTTLCache(cachetools.TTLCache):
+    """TTLCache limited by count of items (maxsize) and optionally by their approximate size in bytes (maxbytes).
+    When any limit is exceeded, the least recently used items are evicted.
+    The size of each item (get_deep_size of the value) is measured when set, and the total is available on currsize.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, maxbytes: Optional[int] = None, **kwargs):
+        # cachetools limits the sum of item sizes; the count of items is limited on __setitem__
+        super().__init__(maxsize=maxbytes or math.inf, ttl=ttl, getsizeof=get_deep_size, **kwargs)
+        self.maxitems = maxsize
+        """Max count of items"""
+        self.maxbytes = maxbytes
+        """Max sum of the approximate size of the items in bytes, if limited"""
+        self.evictions = 0
+        """Count of items removed before expiring, due to the cache being full"""
+        self.expirations = 0
+        """Count of items removed due to their TTL expiring"""
+
+    def get_remaining_ttl(self, key: Hashable) -> Optional[float]:
+        """Return the seconds left until the given key expires. If the key is not cached (or expired), return None."""
+        # cachetools (pinned version) does not expose the expiration of each key, so use its private links
+        # noinspection PyUnresolvedReferences
+        link = self._TTLCache__links.get(key)
+        if link is None:
+            return None
+
+        remaining = link.expire - self.timer()
+        return remaining if remaining > 0 else None
+
+    @property
+    def maxsize(self) -> int:
+        return self.maxitems
+
+    def __setitem__(self, key: Hashable, value):
+        with self.timer as time:
+            self.expire(time)
+            if key not in self:
+                while len(self) >= self.maxitems:
+                    self.popitem()
+            super().__setitem__(key, value)
+
+    def set(self, key: Hashable, value, ttl: Optional[float] = None):
+        """Set an item on the cache. If ttl is given and it is lower than the TTL of the cache, the item expires
+        after the given seconds instead (e.g. when the item was already cached elsewhere for some time).
+        Items larger than maxbytes are not cached."""
+        try:
+            self[key] = value
+        except ValueError:
+            # raised by cachetools for items larger than the cache size
+            return
+        if ttl is not None and ttl < self.ttl:
+            # Expired items are not returned, although they are removed from memory in insertion order
+            # noinspection PyUnresolvedReferences
+            self._TTLCache__links[key].expire = self.timer() + ttl
+
+    def resize(self, maxsize: Optional[int] = None, maxbytes: Optional[int] = None):
+        """Change the max count of items and/or max bytes (0 = unlimited bytes) of the cache, keeping the items.
+        If the cache exceeds the new limits, the least recently used items are evicted."""
+        if maxsize is not None:
+            self.maxitems = maxsize
+        if maxbytes is not None:
+            self.maxbytes = maxbytes or None
+            # noinspection PyUnresolvedReferences
+            self._Cache__maxsize = maxbytes or math.inf
+
+        self.expire()
+        while len(self) > self.maxitems or (self.maxbytes and self.currsize > self.maxbytes):
+            self.popitem()
+
+    def set_ttl(self, ttl: float):
+        """Change the TTL of the cache, keeping the items. The expiration of the cached items is moved by the
+        difference between the new and the old TTL, as if they were cached with the new TTL."""
+        # noinspection PyUnresolvedReferences
+        difference = ttl - self._TTLCache__ttl
+        # noinspection PyUnresolvedReferences
+        for link in self._TTLCache__links.values():
+            link.expire += difference
+        self._TTLCache__ttl = ttl
+        self.expire()
+
+    def expire(self, time=None):
+        # noinspection PyUnresolvedReferences
+        links = self._TTLCache__links
+        length = len(links)
+        super().expire(time)
+        self.expirations += length - len(links)
+
+    def popitem(self):
+        # popitem() is only called by the cache itself when full, to make room for new items
+        item = super().popitem()
+        self.evictions += 1
+        return item
@@ -3,23 +3,87 @@ Async functions to fetch data from the HTML external data source and parse them
 """
 
 # # Native # #
+import time
 import asyncio
-from typing import List
+from typing import List, Tuple, Dict
 
 # # Installed # #
 from requests_async import RequestException
 
 # # Project # #
 from vigobusapi.vigobus_getters.html.html_request import request_html
-from vigobusapi.vigobus_getters.html.html_parser import *
 from vigobusapi.vigobus_getters.exceptions import ParsingExceptions
 from vigobusapi.vigobus_getters.helpers import sort_buses
+from vigobusapi.vigobus_getters.parse_memo import ParseMemo
+from vigobusapi.services import run_parser
+from vigobusapi.exceptions import DeadlineExceeded, FetchCancelled
+from vigobusapi.deadline import has_time_for
 from vigobusapi.settings import settings
-from vigobusapi.entities import Stop, BusesResponse
-from vigobusapi.logger import logger
+from vigobusapi.entities import Stop, Bus, BusesResponse
+from vigobusapi.metrics import HTML_PAGES_FETCHED
+from vigobusapi.logger import logger, lazy_bind
 
 __all__ = ("get_stop", "get_buses")
 
+parse_memo = ParseMemo("html")
+"""Memo of the results parsed from each page. Key: tuple (Stop ID, page).
+Value: tuple (tuple of Buses, pages available) for the first page, or tuple of Buses for the next pages.
+The extra parameters parsed from the first page are memoized with the key (Stop ID, "extra_parameters")"""
+
+
+def _get_parser():
+    """Return the html_parser module, imported on first use: BeautifulSoup takes a while to import, and the HTML
+    data source is not needed while the Stops and Buses are found on the previous getters."""
+    from vigobusapi.vigobus_getters.html import html_parser
+    return html_parser
+
+
+async def _parse_first_page(stop_id: int, html_source: str) -> Tuple[List[Bus], int]:
+    """Parse the Buses and the count of extra pages available from the first page of Buses of a Stop,
+    reusing the previous result if the page did not change."""
+    memo_key = (stop_id, 1)
+    digest = parse_memo.get_digest(html_source)
+    memo = parse_memo.get(memo_key, digest)
+    if memo is not None:
+        buses, pages_available = memo
+        return list(buses), pages_available
+
+    parser = _get_parser()
+    buses = await run_parser(parser.parse_buses, html_source)
+    _, pages_available = await run_parser(parser.parse_pages, html_source)
+    parse_memo.set(memo_key, digest, (tuple(buses), pages_available))
+    return buses, pages_available
+
+
+async def _parse_extra_parameters(stop_id: int, html_source: str) -> Dict:
+    """Parse the extra parameters required to request the extra pages from the first page of Buses of a Stop,
+    reusing the previous result if the page did not change."""
+    memo_key = (stop_id, "extra_parameters")
+    digest = parse_memo.get_digest(html_source)
+    memo = parse_memo.get(memo_key, digest)
+    if memo is None:
+        memo = await run_parser(_get_parser().parse_extra_parameters, html_source)
+        parse_memo.set(memo_key, digest, memo)
+
+    # request_html() modifies the extra parameters
+    return dict(memo)
+
+
+async def _parse_extra_page(stop_id: int, page: int, html_source: str) -> List[Bus]:
+    """Verify the page number and parse the Buses from an extra page of Buses of a Stop,
+    reusing the previous result if the page did not change."""
+    memo_key = (stop_id, page)
+    digest = parse_memo.get_digest(html_source)
+    memo = parse_memo.get(memo_key, digest)
+    if memo is not None:
+        return list(memo)
+
+    parser = _get_parser()
+    await run_parser(parser.assert_page_number, html_source, expected_current_page=page)
+    buses = await run_parser(parser.parse_buses, html_source)
+    parse_memo.set(memo_key, digest, tuple(buses))
+    return buses
+
 
 async def get_stop(stop_id: int) -> Stop:
     """Async function to get information of a Stop (only name) from the HTML data source.
@@ -29,23 +93,29 @@ async def get_stop(stop_id: int) -> Stop:
     """
     logger.debug("Searching stop on external HTML data source")
     html_source = await request_html(stop_id)
-    return parse_stop(html_source)
+    return await run_parser(_get_parser().parse_stop, html_source)
 
 
 async def get_buses(stop_id: int, get_all_buses: bool = False) -> BusesResponse:
     """Async function to get the buses incoming to a Stop from the HTML data source.
     Return the List of Buses AND True if more bus pages available, False if the current bus list was the only page.
     :param stop_id: Stop ID
-    :param get_all_buses: if True, get all Buses through all the HTML pages available
+    :param get_all_buses: if True, get all Buses through all the HTML pages available. The extra pages are not fetched
+                          if they are not expected to be fetched before the deadline of the current request, judging by
+                          the time taken to fetch the first page (more_buses_available=True is returned instead);
+                          nor the pages left when the fetch is cancelled (the Buses already fetched are returned)
     :raises: requests_async.RequestTimeout | requests_async.RequestException |
              exceptions.StopNotExist | exceptions.exceptions.ParseError
     """
     logger.debug("Searching buses on first page of external HTML data source...")
 
+    start_time = time.monotonic()
     html_source = await request_html(stop_id)
+    first_page_time = time.monotonic() - start_time
+    pages_fetched = 1
+    parser = _get_parser()
 
-    buses = parse_buses(html_source)
-    _, pages_available = parse_pages(html_source)
+    buses, pages_available = await _parse_first_page(stop_id, html_source)
     more_buses_available = bool(pages_available)
 
     logger.bind(
@@ -54,11 +124,18 @@ async def get_buses(stop_id: int, get_all_buses: bool = False) -> BusesResponse:
         more_buses_available=more_buses_available
     ).debug(f"Parsed {len(buses)} buses on the first page")
 
+    # Pages are requested one by one (sync) or all at once (async)
+    extra_pages_time = first_page_time * (pages_available if not settings.buses_pages_async else 1)
+    if get_all_buses and more_buses_available and not has_time_for(extra_pages_time):
+        logger.bind(extra_pages_estimated_time=extra_pages_time).warning(
+            "Not enough time left to fetch the extra pages before the deadline"
+        )
+
     # Try to parse extra pages available, if any
-    if get_all_buses and more_buses_available:
+    elif get_all_buses and more_buses_available:
         logger.debug("Searching for more buses on next pages")
         # Get and Parse extra pages available
-        extra_parameters = parse_extra_parameters(html_source)
+        extra_parameters = await _parse_extra_parameters(stop_id, html_source)
 
         try:
             if not settings.buses_pages_async:
@@ -66,10 +143,10 @@ async def get_buses(stop_id: int, get_all_buses: bool = False) -> BusesResponse:
                     with logger.contextualize(current_page=page, pages_available=pages_available):
                         logger.debug(f"Searching buses synchronously on page {page}")
                         html_source = await request_html(stop_id, page=page, extra_params=extra_parameters)
+                        pages_fetched += 1
 
-                        assert_page_number(html_source, page)
-                        more_buses = parse_buses(html_source)
-                        logger.bind(buses=more_buses).debug(f"Parsed {len(more_buses)} buses on page {page}")
+                        more_buses = await _parse_extra_page(stop_id, page, html_source)
+                        lazy_bind(buses=more_buses).debug(f"Parsed {len(more_buses)} buses on page {page}")
 
                         buses.extend(more_buses)
 
@@ -80,18 +157,21 @@ async def get_buses(stop_id: int, get_all_buses: bool = False) -> BusesResponse:
                 ]
 
                 logger.debug(f"Searching buses asynchronously on {len(extra_pages_coros)} more pages")
+                pages_fetched += len(extra_pages_coros)
                 extra_pages_html_source: List[str] = await asyncio.gather(*extra_pages_coros)
 
                 for page, page_html_source in enumerate(extra_pages_html_source, 2):
                     logger.debug(f"Parsing buses on page {page}")
-                    assert_page_number(html_source=page_html_source, expected_current_page=page)
-
-                    page_buses = parse_buses(page_html_source)
-                    logger.bind(buses=page_buses).debug(f"Parsed {len(page_buses)} buses on page {page}")
+                    page_buses = await _parse_extra_page(stop_id, page, page_html_source)
+                    lazy_bind(buses=page_buses).debug(f"Parsed {len(page_buses)} buses on page {page}")
 
                     buses.extend(page_buses)
 
-        except (RequestException, *ParsingExceptions):
+        except FetchCancelled:
+            # Nobody waits for the Buses anymore, but return the ones already fetched, so they get cached
+            logger.debug("Fetch cancelled, not requesting more pages")
+
+        except (RequestException, DeadlineExceeded, *ParsingExceptions):
             # Ignore exceptions while iterating the pages
             # Keep & return the buses that could be fetched
             logger.opt(exception=True).error("Error while iterating pages")
@@ -99,7 +179,8 @@ async def get_buses(stop_id: int, get_all_buses: bool = False) -> BusesResponse:
         else:
             more_buses_available = False
 
-    clear_duplicated_buses(buses)
+    HTML_PAGES_FETCHED.observe(pages_fetched)
+    parser.clear_duplicated_buses(buses)
     sort_buses(buses)
 
     response = BusesResponse(
@@ -107,5 +188,5 @@ async def get_buses(stop_id: int, get_all_buses: bool = False) -> BusesResponse:
         more_buses_available=more_buses_available
     )
 
-    logger.bind(buses_response_data=response.dict()).debug("Generated BusesResponse")
+    lazy_bind(buses_response_data=response.dict).debug("Generated BusesResponse")
     return response
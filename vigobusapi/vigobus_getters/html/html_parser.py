@@ -17,7 +17,8 @@ from vigobusapi.vigobus_getters.string_fixes import fix_bus, fix_stop_name
 from vigobusapi.vigobus_getters.exceptions import ParseError, ParsingExceptions
 from vigobusapi.entities import Stop, Bus, Buses
 from vigobusapi.exceptions import StopNotExist
-from vigobusapi.logger import logger
+from vigobusapi.tracing import traced
+from vigobusapi.logger import logger, lazy_bind
 
 __all__ = (
     "parse_stop", "parse_buses", "parse_pages", "parse_extra_parameters",
@@ -36,6 +37,7 @@ def parsing():
         raise ParseError(ex)
 
 
+@traced("parse.html_stop")
 def parse_stop(html_source: str) -> Stop:
     """Parse the HTML content returned after requesting the HTML data source,
     parsing parse the Stop info and returning a Stop object.
@@ -58,10 +60,11 @@ def parse_stop(html_source: str) -> Stop:
             name=stop_name,
             original_name=stop_original_name
         )
-        logger.bind(stop_data=stop.dict()).debug("Parsed stop")
+        lazy_bind(stop_data=stop.dict).debug("Parsed stop")
         return stop
 
 
+@traced("parse.html_buses")
 def parse_buses(html_source: str) -> Buses:
     """Parse the HTML content returned after requesting the HTML data source, and parse the Stop info and List of buses.
     :param html_source: HTML source code as string
@@ -94,7 +97,7 @@ def parse_buses(html_source: str) -> Buses:
                         time=time
                     ))
 
-        logger.bind(buses=buses).debug(f"Parsed {len(buses)} buses")
+        lazy_bind(buses=buses).debug(f"Parsed {len(buses)} buses")
         return buses
 
 
@@ -118,6 +121,7 @@ def parse_stop_exists(html_source: str, raise_exception: bool = True) -> bool:
     return exists
 
 
+@traced("parse.html_extra_parameters")
 def parse_extra_parameters(html_source: str) -> Dict:
     """Parse the Extra parameters (__VIEWSTATE, __VIEWSTATEGENERATOR, __EVENTVALIDATION)
     required to fetch more pages, and return them as a Dict.
@@ -138,6 +142,7 @@ def parse_extra_parameters(html_source: str) -> Dict:
         return params
 
 
+@traced("parse.html_pages")
 def parse_pages(html_source: str) -> Tuple[int, int]:
     """Parse the pages on the current page, returning the current page number, and how many pages
     are available after the current one.
@@ -203,19 +208,18 @@ def clear_duplicated_buses(buses: Buses) -> Buses:
 
     Duplicated bus/es are removed from the list in-place, so the same object is returned.
     """
-    with logger.contextualize(buses=buses):
-        buses_start = len(buses)
-        buses_ids_times = Counter()
-        """Counter with tuples (bus_id, time)"""
-        for bus in buses:
-            buses_ids_times[(bus.bus_id, bus.time)] += 1
+    buses_start = len(buses)
+    buses_ids_times = Counter()
+    """Counter with tuples (bus_id, time)"""
+    for bus in buses:
+        buses_ids_times[(bus.bus_id, bus.time)] += 1
 
-        for bus_id, time in [tup for tup, count in buses_ids_times.items() if count > 1]:
-            for i, repeated_bus in enumerate([bus for bus in buses if bus.bus_id == bus_id and bus.time == time]):
-                if i > 0:
-                    buses.remove(repeated_bus)
+    for bus_id, time in [tup for tup, count in buses_ids_times.items() if count > 1]:
+        for i, repeated_bus in enumerate([bus for bus in buses if bus.bus_id == bus_id and bus.time == time]):
+            if i > 0:
+                buses.remove(repeated_bus)
 
-        buses_diff = buses_start - len(buses)
-        logger.bind(buses_diff=buses_diff).debug(f"Cleared {buses_diff} duplicated buses")
+    buses_diff = buses_start - len(buses)
+    lazy_bind(buses_diff=buses_diff, buses=buses).debug(f"Cleared {buses_diff} duplicated buses")
 
-        return buses
+    return buses
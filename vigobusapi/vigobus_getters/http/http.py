@@ -3,9 +3,10 @@ Async functions to fetch data from the HTTP external data source and parse them
 """
 
 # # Project # #
-from vigobusapi.services import http_request
+from vigobusapi.vigobus_getters.parse_memo import ParseMemo
+from vigobusapi.services import http_request, run_parser
 from vigobusapi.entities import BusesResponse
-from vigobusapi.logger import logger
+from vigobusapi.logger import logger, lazy_bind
 
 # # Package # #
 from .http_parser import parse_http_response
@@ -14,6 +15,9 @@ __all__ = ("get_buses",)
 
 ENDPOINT_URL = "https://datos.vigo.org/vci_api_app/api2.jsp"
 
+parse_memo = ParseMemo("http")
+"""Memo of the BusesResponse parsed for each tuple (Stop ID, get_all_buses)"""
+
 
 async def get_buses(stop_id: int, get_all_buses: bool = False) -> BusesResponse:
     """Async function to get the buses incoming to a Stop from the HTML data source.
@@ -27,7 +31,19 @@ async def get_buses(stop_id: int, get_all_buses: bool = False) -> BusesResponse:
         params=params
     )
 
-    buses_response = parse_http_response(data=response.json(), get_all_buses=get_all_buses, verify_stop_exists=False)
-    logger.bind(buses_response_data=buses_response.dict()).debug("Generated BusesResponse")
+    memo_key = (stop_id, get_all_buses)
+    digest = parse_memo.get_digest(response.content)
+    buses_response: BusesResponse = parse_memo.get(memo_key, digest)
+    if buses_response is None:
+        buses_response = await run_parser(
+            parse_http_response, data=response.json(), get_all_buses=get_all_buses, verify_stop_exists=False
+        )
+        parse_memo.set(memo_key, digest, buses_response)
+    else:
+        logger.debug("Response identical to the previous one, reusing its parsed buses")
+
+    # The memoized BusesResponse is kept unmodified (e.g. the source is set on the returned BusesResponse)
+    buses_response = buses_response.copy(update={"buses": list(buses_response.buses)})
+    lazy_bind(buses_response_data=buses_response.dict).debug("Generated BusesResponse")
 
     return buses_response
@@ -7,11 +7,13 @@ from vigobusapi.entities import Bus, Buses, BusesResponse
 from vigobusapi.vigobus_getters.string_fixes import fix_bus
 from vigobusapi.vigobus_getters.helpers import sort_buses
 from vigobusapi.exceptions import StopNotExist
+from vigobusapi.tracing import traced
 from vigobusapi.settings import settings
 
 __all__ = ("parse_http_response",)
 
 
+@traced("parse.http_buses")
 def parse_http_response(data: dict, get_all_buses: bool, verify_stop_exists: bool = True) -> BusesResponse:
     if verify_stop_exists and not data["parada"]:
         raise StopNotExist()
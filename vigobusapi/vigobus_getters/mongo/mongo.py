@@ -7,10 +7,10 @@ import asyncio
 
 # # Project # #
 from vigobusapi.vigobus_getters.mongo.mongo_read import read_stop, search_stops
-from vigobusapi.vigobus_getters.mongo.mongo_write import insert_stops
+from vigobusapi.vigobus_getters.mongo.mongo_write import insert_stops, upsert_stops
 from vigobusapi.entities import Stop, OptionalStop
 
-__all__ = ("get_stop", "search_stops", "save_stop", "save_stops", "insert_stops")
+__all__ = ("get_stop", "search_stops", "save_stop", "save_stops", "insert_stops", "upsert_stops")
 
 
 async def get_stop(stop_id: int) -> OptionalStop:
@@ -3,23 +3,26 @@ Functions to async access and read Mongo data
 """
 
 # # Native # #
-from typing import Optional
-
-# # Installed # #
-# noinspection PyProtectedMember
-from motor.motor_asyncio import AsyncIOMotorCursor
+from typing import Optional, TYPE_CHECKING
 
 # # Project # #
 from vigobusapi.services import MongoDB
 from vigobusapi.entities import Stop, Stops, OptionalStop
-from vigobusapi.logger import logger
+from vigobusapi.metrics import MONGO_OPERATION_DURATION, time_histogram
+from vigobusapi.tracing import span
+from vigobusapi.logger import logger, lazy_bind
+
+if TYPE_CHECKING:
+    # noinspection PyProtectedMember
+    from motor.motor_asyncio import AsyncIOMotorCursor
 
 
 async def read_stop(stop_id: int) -> OptionalStop:
-    document = await MongoDB.get_mongo().get_stops_collection().find_one({"_id": stop_id})
+    with time_histogram(MONGO_OPERATION_DURATION, "read_stop"), span("mongo.read_stop"):
+        document = await MongoDB.get_mongo().get_stops_collection().find_one({"_id": stop_id})
 
     if document:
-        logger.bind(mongo_read_document_data=document).debug("Read document from Mongo")
+        lazy_bind(mongo_read_document_data=document).debug("Read document from Mongo")
         return Stop(**document)
     else:
         logger.debug("No document found in Mongo")
@@ -27,7 +30,7 @@ async def read_stop(stop_id: int) -> OptionalStop:
 
 async def search_stops(stop_name: str, limit: Optional[int] = None) -> Stops:
     documents = list()
-    cursor: AsyncIOMotorCursor = MongoDB.get_mongo().get_stops_collection().find({
+    cursor: "AsyncIOMotorCursor" = MongoDB.get_mongo().get_stops_collection().find({
         "$text": {
             "$search": stop_name
         }
@@ -36,8 +39,9 @@ async def search_stops(stop_name: str, limit: Optional[int] = None) -> Stops:
     if limit is not None:
         cursor = cursor.limit(limit)
 
-    async for document in cursor:
-        documents.append(document)
+    with time_histogram(MONGO_OPERATION_DURATION, "search_stops"), span("mongo.search_stops"):
+        async for document in cursor:
+            documents.append(document)
 
-    logger.bind(mongo_read_documents_data=documents).debug(f"Search in Mongo returned {len(documents)} documents")
+    lazy_bind(mongo_read_documents_data=documents).debug(f"Search in Mongo returned {len(documents)} documents")
     return [Stop(**document) for document in documents]
@@ -2,33 +2,64 @@
 Functions to async write Mongo data
 """
 
-# # Installed # #
-from pymongo.results import InsertManyResult
+# # Native # #
+from typing import TYPE_CHECKING
 
 # # Project # #
 from vigobusapi.services import MongoDB
 from vigobusapi.entities import Stop
-from vigobusapi.logger import logger
+from vigobusapi.metrics import MONGO_OPERATION_DURATION, time_histogram
+from vigobusapi.tracing import span
+from vigobusapi.logger import logger, lazy_bind
 
-__all__ = ("insert_stops",)
+if TYPE_CHECKING:
+    from pymongo.results import InsertManyResult, BulkWriteResult
 
+__all__ = ("insert_stops", "upsert_stops")
 
-async def insert_stops(*stops: Stop, catch_errors: bool = False) -> InsertManyResult:
+
+async def insert_stops(*stops: Stop, catch_errors: bool = False) -> "InsertManyResult":
     """Insert one or multiple Stops in Mongo, provided as a single object or multiple args (comma separated).
     Return the Mongo Result on completion.
     :param catch_errors: if True, log errors and avoid raising them (useful when called as async background task)
     """
     try:
         insert_data = [stop.get_mongo_dict() for stop in stops]
+        lazy_bind(mongo_insert_data=insert_data).debug(f"Inserting {len(insert_data)} stops in Mongo")
 
-        with logger.contextualize(mongo_insert_data=insert_data):
-            logger.debug("Inserting stops in Mongo")
-            result: InsertManyResult = await MongoDB.get_mongo().get_stops_collection().insert_many(insert_data)
-
-            logger.bind(mongo_inserted_ids=result.inserted_ids).debug("Inserted stops in Mongo")
-            return result
+        with time_histogram(MONGO_OPERATION_DURATION, "insert_stops"), span("mongo.insert_stops"):
+            result: "InsertManyResult" = await MongoDB.get_mongo().get_stops_collection().insert_many(insert_data)
+        lazy_bind(mongo_inserted_ids=result.inserted_ids).debug("Inserted stops in Mongo")
+        return result
 
     except Exception as ex:
         if not catch_errors:
             raise ex
         logger.opt(exception=True).bind(stops=stops).error("Error while saving stop/s in MongoDB")
+
+
+async def upsert_stops(*stops: Stop) -> "BulkWriteResult":
+    """Insert or update one or multiple Stops in Mongo, provided as a single object or multiple args (comma separated),
+    with a single bulk write. The fields of existing Stops are only updated with the non-empty fields of the given
+    Stops, and their 'created' field is kept. Return the Mongo Result on completion.
+    """
+    from pymongo import UpdateOne
+
+    operations = list()
+    for stop in stops:
+        stop_data = stop.get_mongo_dict()
+        stop_id = stop_data.pop("_id")
+        created = stop_data.pop("created", None)
+        update = {"$set": {k: v for k, v in stop_data.items() if v is not None}}
+        if created is not None:
+            update["$setOnInsert"] = {"created": created}
+        operations.append(UpdateOne({"_id": stop_id}, update, upsert=True))
+
+    logger.debug(f"Upserting {len(operations)} stops in Mongo")
+    with time_histogram(MONGO_OPERATION_DURATION, "upsert_stops"), span("mongo.upsert_stops"):
+        result: "BulkWriteResult" = await MongoDB.get_mongo().get_stops_collection().bulk_write(
+            operations, ordered=False
+        )
+    logger.bind(mongo_upserted_count=result.upserted_count, mongo_modified_count=result.modified_count)\
+        .debug("Upserted stops in Mongo")
+    return result
@@ -0,0 +1,58 @@
+"""PARSE MEMO
+Memo of the last result parsed from the upstream responses of each Stop (and page), by hash of the raw response body.
+When the external data sources return the same body as the previous request for the same Stop (usual between
+refreshes), the previous result is reused, skipping the parsing.
+"""
+
+# # Native # #
+import hashlib
+from typing import Any, Hashable, Optional, Union
+
+# # Installed # #
+from cachetools import LRUCache
+
+# # Project # #
+from vigobusapi.settings import settings
+from vigobusapi.metrics import PARSE_MEMO_LOOKUPS
+
+__all__ = ("ParseMemo",)
+
+
+class ParseMemo:
+    """Memo of parse results for one data source. Keys are given by the data source (e.g. Stop ID and page), and only
+    the last result parsed for each key is kept (up to 'parse_memo_maxsize' keys; 0 = disabled).
+    Results are shared by every lookup hitting them, so they must not be modified (e.g. store tuples instead of lists).
+    """
+
+    def __init__(self, source: str, maxsize: int = settings.parse_memo_maxsize):
+        self.source = source
+        self._memo = LRUCache(maxsize=maxsize) if maxsize > 0 else None
+
+    @staticmethod
+    def get_digest(body: Union[str, bytes]) -> bytes:
+        if isinstance(body, str):
+            body = body.encode()
+        return hashlib.blake2b(body, digest_size=16).digest()
+
+    def get(self, key: Hashable, digest: bytes) -> Optional[Any]:
+        """Return the result parsed for the given key, if the body it was parsed from had the given digest.
+        Otherwise return None."""
+        if self._memo is None:
+            return None
+
+        memo = self._memo.get(key)
+        if memo is not None and memo[0] == digest:
+            PARSE_MEMO_LOOKUPS.labels(self.source, "hit").inc()
+            return memo[1]
+
+        PARSE_MEMO_LOOKUPS.labels(self.source, "miss").inc()
+        return None
+
+    def set(self, key: Hashable, digest: bytes, result: Any):
+        """Save the result parsed for the given key, from a body with the given digest."""
+        if self._memo is not None:
+            self._memo[key] = (digest, result)
+
+    def clear(self):
+        if self._memo is not None:
+            self._memo.clear()
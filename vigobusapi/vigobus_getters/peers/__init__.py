@@ -0,0 +1,8 @@
+"""PEERS DATA SOURCE
+When running multiple API nodes (peer mode), each Stop has an owner node, chosen by consistent hashing of the Stop ID
+between all the nodes. Nodes that do not own a Stop get its Buses from the owner node (which will have them cached
+when requested frequently), instead of requesting the external data sources themselves.
+If the owner node is not available, the Buses are fetched from the next getters (external data sources) as usual.
+"""
+
+from .peers import *
@@ -0,0 +1,33 @@
+"""HASH RING
+Consistent hashing ring, to distribute keys between nodes. Each node is placed on multiple points of the ring
+(virtual nodes), so the keys are evenly distributed, and only the keys of a node are moved when it is added/removed.
+"""
+
+# # Native # #
+import bisect
+import hashlib
+from typing import Iterable, List, Tuple
+
+__all__ = ("HashRing",)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, nodes: Iterable[str], vnodes: int = 100):
+        points: List[Tuple[int, str]] = sorted(
+            (_hash(f"{node}#{i}"), node)
+            for node in set(nodes)
+            for i in range(vnodes)
+        )
+        self._hashes = [point[0] for point in points]
+        self._nodes = [point[1] for point in points]
+
+    def get_node(self, key) -> str:
+        """Return the node owning the given key: the first node found on the ring clockwise from the key hash."""
+        if not self._nodes:
+            raise ValueError("The ring has no nodes")
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._nodes[index]
@@ -0,0 +1,129 @@
+"""PEERS
+Async functions to get the Buses of a Stop from its owner node, when running in peer mode.
+Buses found on the owner node are saved on the local cache, for the TTL they have left on the owner node cache.
+"""
+
+# # Native # #
+import re
+import time
+import contextvars
+from typing import Optional, List, Dict
+
+# # Installed # #
+from requests_async import RequestException
+
+# # Package # #
+from .hash_ring import HashRing
+
+# # Project # #
+from vigobusapi.vigobus_getters import cache
+from vigobusapi.services import http_request
+from vigobusapi.entities import BusesResponse
+from vigobusapi.exceptions import StopNotExist
+from vigobusapi.settings import settings
+from vigobusapi.logger import logger
+
+__all__ = ("get_buses", "get_owner_node", "is_peer_mode", "serving_peer", "PEERS_KEY_HEADER")
+
+INTERNAL_BUSES_PATH = "/internal/buses/{stop_id}"
+"""Path of the internal endpoint used by the nodes to get the Buses from their owner node"""
+
+PEERS_KEY_HEADER = "X-Peers-Key"
+"""Header used to send the 'peers_key' setting to the internal endpoint"""
+
+serving_peer = contextvars.ContextVar("serving_peer", default=False)
+"""Set to True while serving a request from another node, so the Buses are never requested to other nodes again"""
+
+MAX_AGE_REGEX = re.compile(r"max-age=(\d+)")
+
+_ring: Optional[HashRing] = None
+_peers_down_until: Dict[str, float] = dict()
+"""Nodes that failed to respond, and the time until they are not requested again"""
+
+
+def _get_nodes() -> List[str]:
+    return [node.strip().rstrip("/") for node in (settings.peers or "").split(",") if node.strip()]
+
+
+def is_peer_mode() -> bool:
+    return bool(settings.peers and settings.peers_self)
+
+
+def get_owner_node(stop_id: int) -> str:
+    """Return the URL of the node owning the given Stop."""
+    global _ring
+    if _ring is None:
+        _ring = HashRing(_get_nodes(), vnodes=settings.peers_vnodes)
+    return _ring.get_node(stop_id)
+
+
+def _is_down(node: str) -> bool:
+    down_until = _peers_down_until.get(node)
+    if down_until is None:
+        return False
+    if time.monotonic() >= down_until:
+        _peers_down_until.pop(node, None)
+        return False
+    return True
+
+
+def _get_max_age(response) -> int:
+    """Return the max-age of the Cache-Control header of the given response (0 if not given or invalid)."""
+    match = MAX_AGE_REGEX.search(response.headers.get("Cache-Control", ""))
+    return int(match.group(1)) if match else 0
+
+
+def _set_down(node: str):
+    _peers_down_until[node] = time.monotonic() + settings.peers_down_time
+    logger.bind(peer_node=node).warning(f"Peer node not available for the next {settings.peers_down_time} seconds")
+
+
+async def get_buses(stop_id: int, get_all_buses: bool) -> Optional[BusesResponse]:
+    """Get the List of Buses of a Stop from its owner node, if running on peer mode and the current node is not the
+    owner. Return None if the Buses must be fetched by the current node instead (not in peer mode, the current node
+    is the owner, the request comes from another node, or the owner node is not available).
+    :raises: exceptions.StopNotExist
+    """
+    if not is_peer_mode() or serving_peer.get():
+        return None
+
+    node = get_owner_node(stop_id)
+    if node == settings.peers_self.rstrip("/") or _is_down(node):
+        return None
+
+    logger.bind(peer_node=node).debug("Requesting buses to the owner node")
+    try:
+        response = await http_request(
+            url=node + INTERNAL_BUSES_PATH.format(stop_id=stop_id),
+            params={"get_all_buses": str(get_all_buses).lower()},
+            headers={PEERS_KEY_HEADER: settings.peers_key or ""},
+            timeout=settings.peers_timeout,
+            retries=1,
+            raise_for_status=False,
+            upstream=False
+        )
+    except RequestException:
+        _set_down(node)
+        return None
+
+    if response.status_code == 404:
+        raise StopNotExist()
+    if response.status_code != 200:
+        # The owner node could not get the buses either (or rejected the request); try to get them from this node
+        logger.bind(peer_node=node, peer_status_code=response.status_code).warning("Owner node returned an error")
+        if response.status_code == 503:
+            # Owner node overloaded
+            _set_down(node)
+        return None
+
+    buses_result = BusesResponse(**response.json())
+    if buses_result.age is not None:
+        # The owner node could not fetch the buses either, and returned its last known buses; try this node instead
+        logger.bind(peer_node=node).debug("Owner node returned extrapolated buses")
+        return None
+
+    # Buses not cached by the owner node (max-age=0) are not cached by this node either
+    ttl = _get_max_age(response)
+    if ttl > 0:
+        cache.save_buses(stop_id, get_all_buses, buses_result, ttl=ttl)
+    return buses_result
@@ -0,0 +1,64 @@
+"""PIPELINE
+Tiers of the Stop and Bus getters chains used by auto_getters.
+Each tier wraps a getter function, and is built once (when declared) with everything required to call the getter and
+handle its results, so nothing has to be inspected on each call.
+"""
+
+# # Native # #
+import inspect
+from typing import *
+
+# # Package # #
+from .helpers import get_package
+
+__all__ = ("GetterTier", "KIND_CACHE", "KIND_DATABASE", "KIND_PEER", "KIND_EXTERNAL")
+
+KIND_CACHE = "cache"
+"""Local or shared cache. Data found by other tiers is saved on the caches"""
+KIND_DATABASE = "database"
+"""Local database (MongoDB)"""
+KIND_PEER = "peer"
+"""Another node of the API (peer mode)"""
+KIND_EXTERNAL = "external"
+"""External data source"""
+
+WriteBackHook = Callable[..., Optional[Awaitable]]
+
+
+class GetterTier:
+    """A getter of a pipeline (STOP_TIERS/BUS_TIERS), with:
+    - getter: the function (sync or async) called with the pipeline args (e.g. Stop ID)
+    - kind: one of KIND_CACHE, KIND_DATABASE, KIND_PEER, KIND_EXTERNAL
+    - name: used on metrics, logs, traces and as source of the returned data (default: the getter module name)
+    - write_back: hooks (sync or async) called with the pipeline args and the value found by this tier, to save it on
+      other tiers
+    - estimated_duration: seconds the getter is expected to take (moving average of its previous calls), or None
+    """
+    __slots__ = ("getter", "kind", "name", "write_back", "estimated_duration", "_is_async", "_write_back_async")
+
+    def __init__(self, getter: Callable, kind: str, name: Optional[str] = None,
+                 write_back: Iterable[WriteBackHook] = ()):
+        self.getter = getter
+        self.kind = kind
+        self.name = name or get_package(getter)
+        self.write_back = tuple(write_back)
+        self.estimated_duration: Optional[float] = None
+        self._is_async = inspect.iscoroutinefunction(getter)
+        self._write_back_async = tuple(inspect.iscoroutinefunction(hook) for hook in self.write_back)
+
+    async def call(self, *args):
+        """Call the getter with the given args and return its result."""
+        if self._is_async:
+            return await self.getter(*args)
+        return self.getter(*args)
+
+    async def save(self, *args):
+        """Call the write-back hooks with the given args (pipeline args followed by the value found)."""
+        for hook, is_async in zip(self.write_back, self._write_back_async):
+            if is_async:
+                await hook(*args)
+            else:
+                hook(*args)
+
+    def __repr__(self):
+        return f"GetterTier({self.name}, {self.kind})"
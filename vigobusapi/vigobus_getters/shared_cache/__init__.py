@@ -0,0 +1,7 @@
+"""SHARED CACHE
+Second level cache local storage for Stops and Buses, shared by all the worker processes running in the same host.
+Used after the local (per-process) cache, so the data fetched by any worker is available for the rest of them.
+The storage backend is pluggable, and chosen by the 'shared_cache_backend' setting (disabled by default).
+"""
+
+from .shared_cache import *
@@ -0,0 +1,111 @@
+"""SHARED CACHE BACKENDS
+Storage backends for the shared cache. Values are stored as bytes with a TTL.
+"""
+
+# # Native # #
+import os
+import abc
+import time
+import asyncio
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, Dict, Type
+
+# # Project # #
+from vigobusapi.settings import settings
+from vigobusapi.logger import logger
+
+__all__ = ("SharedCacheBackend", "SQLiteSharedCache", "BACKENDS", "get_backend")
+
+CachedValue = Tuple[bytes, float]
+"""Value returned by the backends: tuple (value, remaining TTL in seconds)"""
+
+
+class SharedCacheBackend(abc.ABC):
+    """Base class of the shared cache backends"""
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[CachedValue]:
+        """Return the value of the given key and its remaining TTL, or None if not cached or expired."""
+        pass
+
+    @abc.abstractmethod
+    def set(self, key: str, value: bytes, ttl: float):
+        """Save the value of the given key, expiring after ttl seconds. The value is saved on background."""
+        pass
+
+
+class SQLiteSharedCache(SharedCacheBackend):
+    """Shared cache stored on a SQLite database file, accessed concurrently by all the processes using it.
+    The database uses WAL mode (readers do not block the writer) and is memory-mapped, so lookups are served from the
+    OS page cache. The queries run on a dedicated thread, not blocking the event loop if the database is locked.
+    Expired rows are removed periodically, every PURGE_EVERY_WRITES writes."""
+
+    PURGE_EVERY_WRITES = 500
+
+    def __init__(self, path: Optional[str] = None, mmap_size: int = settings.shared_cache_mmap_size):
+        self.path = path or os.path.join(tempfile.gettempdir(), "vigobusapi_cache.sqlite3")
+        self.mmap_size = mmap_size
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared_cache")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # Only called from the executor thread, which owns the connection
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)"
+            )
+            self._connection = connection
+            logger.bind(shared_cache_path=self.path).debug("Connected to the SQLite shared cache")
+        return self._connection
+
+    def _get(self, key: str) -> Optional[CachedValue]:
+        now = time.time()
+        row = self._get_connection().execute(
+            "SELECT value, expires FROM cache WHERE key = ? AND expires > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1] - now
+
+    def _set(self, key: str, value: bytes, ttl: float):
+        # noinspection PyBroadException
+        try:
+            connection = self._get_connection()
+            now = time.time()
+            connection.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (key, value, now + ttl))
+
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY_WRITES == 0:
+                connection.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+
+        except Exception:
+            logger.opt(exception=True).bind(shared_cache_key=key).error("Error saving on the SQLite shared cache")
+
+    async def get(self, key: str) -> Optional[CachedValue]:
+        return await asyncio.get_event_loop().run_in_executor(self._executor, self._get, key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._executor.submit(self._set, key, value, ttl)
+
+
+BACKENDS: Dict[str, Type[SharedCacheBackend]] = {
+    "sqlite": SQLiteSharedCache
+}
+"""Available backends, by the name used on the 'shared_cache_backend' setting"""
+
+_backend: Optional[SharedCacheBackend] = None
+
+
+def get_backend() -> Optional[SharedCacheBackend]:
+    """Return the backend set on the 'shared_cache_backend' setting (created on first call), or None if disabled."""
+    global _backend
+    if _backend is None and settings.shared_cache_backend:
+        _backend = BACKENDS[settings.shared_cache_backend](path=settings.shared_cache_path)
+    return _backend
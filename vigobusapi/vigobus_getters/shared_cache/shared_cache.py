@@ -0,0 +1,120 @@
+"""SHARED CACHE DATA SOURCE
+Async functions to get and save Stops and Buses on the shared cache.
+Entities found on the shared cache are saved on the local cache too, for the TTL they have left on the shared cache.
+"""
+
+# # Native # #
+from typing import Optional
+
+# # Installed # #
+import orjson
+
+# # Package # #
+from .backends import get_backend
+
+# # Project # #
+from vigobusapi.vigobus_getters import cache
+from vigobusapi.entities import Stop, StopOrNotExist, BusesResponse
+from vigobusapi.exceptions import StopNotExist
+from vigobusapi.metrics import CACHE_LOOKUPS
+from vigobusapi.settings import settings
+from vigobusapi.logger import logger
+
+__all__ = ("get_stop", "get_buses", "save_stop", "save_stop_not_exist", "save_buses")
+
+STOP_NOT_EXIST_VALUE = b""
+"""Value saved for Stops that do not exist"""
+
+EXCLUDED_FIELDS = {"source"}
+"""Fields of the entities not saved on the shared cache"""
+
+
+def _stop_key(stop_id: int) -> str:
+    return f"stop:{stop_id}"
+
+
+def _buses_key(stop_id: int, get_all_buses: bool) -> str:
+    return f"buses:{stop_id}:{int(get_all_buses)}"
+
+
+async def get_stop(stop_id: int) -> Optional[StopOrNotExist]:
+    """Get a Stop from the shared cache. Like the local cache, if the Stop does not exist and this was cached,
+    StopNotExist exception is returned (not raised). If the Stop is not cached (or the shared cache is disabled),
+    None is returned.
+    """
+    backend = get_backend()
+    if backend is None:
+        return None
+
+    cached = await backend.get(_stop_key(stop_id))
+    CACHE_LOOKUPS.labels("shared_stops", "hit" if cached is not None else "miss").inc()
+    if cached is None:
+        logger.debug("Stop not found on shared cache")
+        return None
+
+    value, ttl = cached
+    if value == STOP_NOT_EXIST_VALUE:
+        cache.save_stop_not_exist(stop_id, ttl=ttl)
+        return StopNotExist()
+
+    stop = Stop(**orjson.loads(value))
+    cache.save_stop(stop, ttl=ttl)
+    logger.debug("Stop found on shared cache")
+    return stop
+
+
+async def get_buses(stop_id: int, get_all_buses: bool) -> Optional[BusesResponse]:
+    """Get List of Buses from the shared cache, by Stop ID and All Buses wanted (True/False).
+    Like the local cache, if NOT All Buses are requested, an All Buses entry is valid too.
+    If the list of buses for the given Stop ID is not cached (or the shared cache is disabled), None is returned.
+    """
+    backend = get_backend()
+    if backend is None:
+        return None
+
+    cached = await backend.get(_buses_key(stop_id, get_all_buses))
+    cached_get_all_buses = get_all_buses
+    if cached is None and not get_all_buses:
+        cached = await backend.get(_buses_key(stop_id, True))
+        cached_get_all_buses = True
+
+    CACHE_LOOKUPS.labels("shared_buses", "hit" if cached is not None else "miss").inc()
+    if cached is None:
+        logger.debug("Buses not found on shared cache")
+        return None
+
+    value, ttl = cached
+    buses_result = BusesResponse(**orjson.loads(value))
+    cache.save_buses(stop_id, cached_get_all_buses, buses_result, ttl=ttl)
+    logger.debug("Buses found on shared cache")
+
+    if cached_get_all_buses != get_all_buses:
+        buses_result = cache.limit_buses(buses_result)
+    return buses_result
+
+
+def save_stop(stop: Stop):
+    """This function must be executed whenever a Stop is found by any getter, other than the caches.
+    The Stop is saved on background."""
+    backend = get_backend()
+    if backend is not None:
+        backend.set(_stop_key(stop.stop_id), orjson.dumps(stop.dict(exclude=EXCLUDED_FIELDS)), settings.stops_cache_ttl)
+
+
+def save_stop_not_exist(stop_id: int):
+    """This function must be executed whenever an external data source reports that a Stop Not Exists"""
+    backend = get_backend()
+    if backend is not None:
+        backend.set(_stop_key(stop_id), STOP_NOT_EXIST_VALUE, settings.stops_cache_ttl)
+
+
+def save_buses(stop_id: int, get_all_buses: bool, buses_result: BusesResponse):
+    """This function must be executed whenever a List of Buses for a Stop is found by any getter,
+    other than the caches. The Buses are saved on background."""
+    backend = get_backend()
+    if backend is not None:
+        backend.set(
+            _buses_key(stop_id, get_all_buses),
+            orjson.dumps(buses_result.dict(exclude=EXCLUDED_FIELDS)),
+            settings.buses_cache_ttl
+        )